@@ -0,0 +1,66 @@
+import random
+import sys
+import time
+
+import rrt_pygame_dyn as m
+from broadphase import CrowdGrid, StaticGrid
+from rrt_planner import is_inside_obstacle
+
+# Linear loops against the broad-phase grids for people-vs-node, people-vs-edge and
+# people-vs-static queries, at increasing crowd sizes.
+# Usage: python bench_broadphase.py [crowd sizes...]
+queries = 1000
+
+def segment_distance2(px, py, x0, y0, x1, y1):
+    dx, dy = x1 - x0, y1 - y0
+    length2 = dx * dx + dy * dy
+    t = 0.0 if length2 == 0 else min(1.0, max(0.0, ((px - x0) * dx + (py - y0) * dy) / length2))
+    return (px - x0 - t * dx) ** 2 + (py - y0 - t * dy) ** 2
+
+def timed(fn):
+    start_time = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start_time, result
+
+def main(sizes):
+    rng = random.Random(0)
+    random.seed(0)
+    nodes = [(rng.random()*m.width, rng.random()*m.height) for _ in range(queries)]
+    edges = [((x, y), (x + rng.uniform(-20, 20), y + rng.uniform(-20, 20))) for x, y in nodes]
+    crowd = CrowdGrid(m.width, m.height)
+
+    print("%8s %-14s %14s %14s %8s" % ("agents", "query", "linear (us)", "grid (us)", "speedup"))
+    for n in sizes:
+        people = [m.Person() for _ in range(n)]
+        radius = people[0].size
+
+        t, _ = timed(lambda: crowd.rebuild_from(people))
+        print("%8d %-14s %14s %14.1f %8s" % (n, "rebuild/tick", "-", t * 1e6, "-"))
+
+        t_lin, lin = timed(lambda: [any(p.collides((x, y, 5, 5)) for p in people) for x, y in nodes])
+        t_grid, grid = timed(lambda: [any(people[j].collides((x, y, 5, 5)) for j in crowd.near_rect(x, y, 5, 5))
+                                      for x, y in nodes])
+        assert lin == grid
+        print("%8d %-14s %14.1f %14.1f %7.1fx" % (n, "people-vs-node", t_lin / queries * 1e6,
+                                                 t_grid / queries * 1e6, t_lin / t_grid))
+
+        t_lin, lin = timed(lambda: [any(segment_distance2(p.x, p.y, a[0], a[1], b[0], b[1]) <= radius * radius
+                                        for p in people) for a, b in edges])
+        t_grid, grid = timed(lambda: [len(crowd.near_segment(a, b, radius)) > 0 for a, b in edges])
+        assert lin == grid
+        print("%8d %-14s %14.1f %14.1f %7.1fx" % (n, "people-vs-edge", t_lin / queries * 1e6,
+                                                 t_grid / queries * 1e6, t_lin / t_grid))
+
+    # People-vs-static depends on the map size rather than the crowd: the station map and a denser one
+    points = [(p.x, p.y) for p in people] if sizes else nodes
+    dense = [(rng.random()*m.width, rng.random()*m.height, rng.uniform(2, 15), rng.uniform(2, 15)) for _ in range(1000)]
+    for name, obstacles in (("station", m.obstacles), ("1k obstacles", dense)):
+        grid = StaticGrid(obstacles, m.width, m.height)
+        t_lin, lin = timed(lambda: [any(is_inside_obstacle(pt, o) for o in obstacles) for pt in points])
+        t_grid, res = timed(lambda: [grid.point_inside(pt) for pt in points])
+        assert lin == res
+        print("%8s %-14s %14.2f %14.2f %7.1fx" % (name, "people-vs-static", t_lin / len(points) * 1e6,
+                                                 t_grid / len(points) * 1e6, t_lin / t_grid))
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [15, 1000, 10000])
@@ -0,0 +1,56 @@
+import math
+import random
+import statistics
+import sys
+import time
+
+import rrt_pygame
+import rrt_pygame_dyn
+from rrt_connect import RRTConnectPlanner
+from rrt_planner import Node, RRTPlanner, extract_path
+
+# Single-tree RRT against bidirectional RRT-Connect on the static and dynamic station maps, headless.
+# Usage: python bench_connect.py [runs]
+planners = [("rrt", RRTPlanner), ("rrt-connect", RRTConnectPlanner)]
+
+def path_length(path):
+    return sum(math.dist(a, b) for a, b in zip(path, path[1:]))
+
+def run(planner_cls, scenario, seed):
+    random.seed(seed)
+    on_iteration = node_valid = None
+    if scenario == "static":
+        m = rrt_pygame
+    else:
+        m = rrt_pygame_dyn
+        people = [m.Person() for _ in range(15)]
+
+        def on_iteration(planner):
+            for person in people:
+                person.move()
+
+        def node_valid(nn, newnode):
+            return not any(person.collides((newnode.x, newnode.y, 5, 5)) for person in people)
+
+    planner = planner_cls(m.obstacles, m.width, m.height, stepSize=20, FinalProx=20, seed=seed)
+    start_time = time.perf_counter()
+    newnode = planner.plan(Node(*m.station.start), Node(*m.station.goal), max_iterations=200000,
+                           node_valid=node_valid, on_iteration=on_iteration)
+    elapsed = time.perf_counter() - start_time
+    length = path_length(extract_path(newnode)) if newnode else math.nan
+    return elapsed, planner.iterations, len(planner.nodes), length
+
+def main(runs):
+    print("%-8s %-12s %12s %12s %12s %10s %12s" % (
+        "map", "planner", "median (s)", "mean (s)", "iterations", "nodes", "path length"))
+    for scenario in ("static", "dynamic"):
+        for name, planner_cls in planners:
+            results = [run(planner_cls, scenario, seed) for seed in range(runs)]
+            times = [r[0] for r in results]
+            print("%-8s %-12s %12.4f %12.4f %12.0f %10.0f %12.1f" % (
+                scenario, name, statistics.median(times), statistics.mean(times),
+                statistics.mean(r[1] for r in results), statistics.mean(r[2] for r in results),
+                statistics.mean(r[3] for r in results)))
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
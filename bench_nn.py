@@ -0,0 +1,52 @@
+import random
+import sys
+import time
+
+from nn_index import make_index
+
+# Comparing the nearest-neighbour indexes against the original linear scan.
+# Usage: python bench_nn.py [tree sizes...]
+width, height = 800, 600
+queries = 200
+radius = 40
+
+def bench(kind, points, query_points):
+    index = make_index(kind)
+    start_time = time.perf_counter()
+    for i, (x, y) in enumerate(points):
+        index.insert(x, y, i)
+    insert_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    nearest = [index.nearest(x, y) for x, y in query_points]
+    nearest_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    near = [index.radius(x, y, radius) for x, y in query_points]
+    radius_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    batch = index.nearest_batch(query_points)
+    batch_time = time.perf_counter() - start_time
+    if batch != nearest:
+        print("  %s nearest_batch disagrees with nearest" % kind)
+    return insert_time, nearest_time, radius_time, batch_time, nearest, near
+
+def main(sizes):
+    rng = random.Random(0)
+    print("%-8s %8s %12s %14s %14s %14s" % ("index", "nodes", "insert (s)", "nearest (us)", "radius (us)", "batched (us)"))
+    for n in sizes:
+        points = [(rng.random()*width, rng.random()*height) for _ in range(n)]
+        query_points = [(rng.random()*width, rng.random()*height) for _ in range(queries)]
+        reference = None
+        for kind in ("linear", "grid", "kdtree"):
+            insert_time, nearest_time, radius_time, batch_time, nearest, near = bench(kind, points, query_points)
+            if reference is None:
+                reference = (nearest, near)
+            elif (nearest, near) != reference:
+                print("  %s disagrees with the linear scan" % kind)
+            print("%-8s %8d %12.4f %14.2f %14.2f %14.2f" % (kind, n, insert_time, nearest_time / queries * 1e6,
+                                                         radius_time / queries * 1e6, batch_time / queries * 1e6))
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 50000])
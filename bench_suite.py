@@ -0,0 +1,163 @@
+import argparse
+import json
+import math
+import platform
+import random
+import subprocess
+import time
+
+import numpy as np
+
+import rrt_pygame
+from obstacle_tree import ObstacleTree
+from crowd import Crowd
+from rrt_connect import RRTConnectPlanner
+from rrt_planner import Node, RRTPlanner, extract_path
+
+# Seeded, headless benchmark matrix: planners x scenarios x crowd sizes x seeds, written to JSON
+# so runs can be diffed between versions.
+# Usage: python bench_suite.py --seeds 20 --crowd 15 200 --out bench.json
+
+planners = {
+    "rrt": lambda obstacles, width, height, collision, seed: RRTPlanner(
+        obstacles, width, height, collision=collision, seed=seed),
+    "rrt-batch8": lambda obstacles, width, height, collision, seed: RRTPlanner(
+        obstacles, width, height, collision=collision, seed=seed, batch_size=8),
+    "rrt-array": lambda obstacles, width, height, collision, seed: RRTPlanner(
+        obstacles, width, height, collision=collision, seed=seed, tree="array"),
+    "rrt-connect": lambda obstacles, width, height, collision, seed: RRTConnectPlanner(
+        obstacles, width, height, collision=collision, seed=seed),
+}
+
+class CountingChecker:
+    """
+    Wrapping a collision backend to count the segments it checks.
+    """
+    def __init__(self, checker):
+        self.checker = checker
+        self.checks = 0
+
+    def segment_clear(self, start, end):
+        self.checks += 1
+        return self.checker.segment_clear(start, end)
+
+    def segments_clear(self, starts, ends):
+        self.checks += len(starts)
+        return self.checker.segments_clear(starts, ends)
+
+def path_length(path):
+    return sum(math.dist(a, b) for a, b in zip(path, path[1:]))
+
+def run_once(planner_name, scenario, crowd_size, seed, max_iterations):
+    m = rrt_pygame
+    random.seed(seed)
+    checker = CountingChecker(ObstacleTree(m.obstacles))
+    planner = planners[planner_name](m.obstacles, m.width, m.height, checker, seed)
+
+    on_iteration = node_valid = None
+    if scenario == "dynamic" and crowd_size:
+        crowd = Crowd.random_people(crowd_size, m.obstacles, m.width, m.height, seed=seed)
+
+        def on_iteration(planner):
+            crowd.step()
+
+        def node_valid(nn, newnode):
+            return not crowd.collides((newnode.x, newnode.y, 5, 5)).any()
+
+    start_time = time.perf_counter()
+    newnode = planner.plan(Node(*m.station.start), Node(*m.station.goal), max_iterations=max_iterations,
+                           node_valid=node_valid, on_iteration=on_iteration)
+    elapsed = time.perf_counter() - start_time
+    path = extract_path(newnode) if newnode is not None else []
+    return {
+        "planner": planner_name,
+        "scenario": scenario,
+        "crowd": crowd_size,
+        "seed": seed,
+        "success": newnode is not None,
+        "time": elapsed,
+        "iterations": planner.iterations,
+        "nodes": len(planner.nodes),
+        "collision_checks": checker.checks,
+        "path_length": path_length(path) if path else None,
+        "waypoints": len(path),
+    }
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else None
+
+def summarize(runs):
+    ok = [r for r in runs if r["success"]]
+    times = [r["time"] for r in ok]
+    total_time = sum(r["time"] for r in runs)
+    return {
+        "planner": runs[0]["planner"],
+        "scenario": runs[0]["scenario"],
+        "crowd": runs[0]["crowd"],
+        "runs": len(runs),
+        "success_rate": len(ok) / len(runs),
+        "time_p50": percentile(times, 50),
+        "time_p95": percentile(times, 95),
+        "time_p99": percentile(times, 99),
+        "nodes_per_s": sum(r["nodes"] for r in runs) / total_time if total_time else None,
+        "collision_checks_per_s": sum(r["collision_checks"] for r in runs) / total_time if total_time else None,
+        "path_length_mean": float(np.mean([r["path_length"] for r in ok])) if ok else None,
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless planner benchmark matrix")
+    parser.add_argument("--seeds", type=int, default=20, help="runs per cell, seeded 0..N-1")
+    parser.add_argument("--planners", nargs="+", default=list(planners), choices=list(planners))
+    parser.add_argument("--scenarios", nargs="+", default=["static", "dynamic"], choices=["static", "dynamic"])
+    parser.add_argument("--crowd", nargs="+", type=int, default=[15, 200], help="crowd sizes for the dynamic map")
+    parser.add_argument("--max-iterations", type=int, default=20000, help="samples before a run counts as failed")
+    parser.add_argument("--out", default="bench.json", help="JSON output path")
+    args = parser.parse_args()
+
+    cells = []
+    for scenario in args.scenarios:
+        for crowd_size in (args.crowd if scenario == "dynamic" else [0]):
+            for planner_name in args.planners:
+                cells.append((planner_name, scenario, crowd_size))
+
+    runs = []
+    summary = []
+    print("%-12s %-8s %6s %8s %10s %10s %10s %12s %12s %10s" % (
+        "planner", "scenario", "crowd", "success", "p50 (s)", "p95 (s)", "p99 (s)", "nodes/s", "checks/s", "length"))
+    for planner_name, scenario, crowd_size in cells:
+        cell_runs = [run_once(planner_name, scenario, crowd_size, seed, args.max_iterations)
+                     for seed in range(args.seeds)]
+        runs.extend(cell_runs)
+        s = summarize(cell_runs)
+        summary.append(s)
+        print("%-12s %-8s %6d %7.0f%% %10s %10s %10s %12.0f %12.0f %10s" % (
+            planner_name, scenario, crowd_size, s["success_rate"] * 100,
+            *("%.4f" % s[k] if s[k] is not None else "-" for k in ("time_p50", "time_p95", "time_p99")),
+            s["nodes_per_s"], s["collision_checks_per_s"],
+            "%.1f" % s["path_length_mean"] if s["path_length_mean"] is not None else "-"))
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seeds": args.seeds,
+            "max_iterations": args.max_iterations,
+        },
+        "summary": summary,
+        "runs": runs,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", args.out)
+
+if __name__ == "__main__":
+    main()
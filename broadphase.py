@@ -0,0 +1,128 @@
+import math
+
+import numpy as np
+
+from rrt_planner import is_inside_obstacle
+
+class CrowdGrid:
+    """
+    Broad phase for moving people: a uniform grid rebuilt from scratch every tick. Agents are
+    bucketed with one counting sort into a row-major cell array, so every row of cells a query
+    touches is one contiguous slice of agent indices. Queries return candidate indices; the
+    callers run their exact test (Person.collides, ...) on those only.
+    :param width: float, map width
+    :param height: float, map height
+    :param cell_size: float, side of a grid cell, around the typical query size works best
+    """
+    def __init__(self, width, height, cell_size=20):
+        self.cell_size = float(cell_size)
+        self.cols = max(1, int(math.ceil(width / self.cell_size)))
+        self.rows = max(1, int(math.ceil(height / self.cell_size)))
+        self.rebuild(np.empty(0), np.empty(0))
+
+    def rebuild(self, xs, ys):
+        """
+        Re-bucketing every agent.
+        :param xs: array-like (N,), agent x coordinates
+        :param ys: array-like (N,), agent y coordinates
+        """
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        cx = np.clip((self.xs // self.cell_size).astype(np.int64), 0, self.cols - 1)
+        cy = np.clip((self.ys // self.cell_size).astype(np.int64), 0, self.rows - 1)
+        cell = cy * self.cols + cx
+        self.order = np.argsort(cell, kind="stable")
+        self.offsets = np.zeros(self.cols * self.rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cell, minlength=self.cols * self.rows), out=self.offsets[1:])
+
+    def rebuild_from(self, people):
+        self.rebuild([p.x for p in people], [p.y for p in people])
+
+    def __len__(self):
+        return len(self.xs)
+
+    def cell_range(self, lo, hi, count):
+        return (max(0, min(int(lo // self.cell_size), count - 1)),
+                max(0, min(int(hi // self.cell_size), count - 1)))
+
+    def in_box(self, x0, y0, x1, y1):
+        """
+        Indices of agents in the cells overlapping the box, a superset of the agents inside it.
+        """
+        c0, c1 = self.cell_range(x0, x1, self.cols)
+        r0, r1 = self.cell_range(y0, y1, self.rows)
+        slices = [self.order[self.offsets[r * self.cols + c0]:self.offsets[r * self.cols + c1 + 1]]
+                  for r in range(r0, r1 + 1)]
+        return np.concatenate(slices) if len(slices) > 1 else slices[0]
+
+    def near_rect(self, x, y, w, h):
+        """
+        Indices of agents whose position lies in the closed rectangle (x, y, w, h).
+        """
+        idx = self.in_box(x, y, x + w, y + h)
+        px, py = self.xs[idx], self.ys[idx]
+        return idx[(px >= x) & (px <= x + w) & (py >= y) & (py <= y + h)]
+
+    def near_point(self, x, y, r):
+        """
+        Indices of agents within distance r of (x, y).
+        """
+        idx = self.in_box(x - r, y - r, x + r, y + r)
+        return idx[(self.xs[idx] - x) ** 2 + (self.ys[idx] - y) ** 2 <= r * r]
+
+    def near_segment(self, start, end, r):
+        """
+        Indices of agents within distance r of the segment from start to end.
+        """
+        (x0, y0), (x1, y1) = start, end
+        idx = self.in_box(min(x0, x1) - r, min(y0, y1) - r, max(x0, x1) + r, max(y0, y1) + r)
+        dx, dy = x1 - x0, y1 - y0
+        length2 = dx * dx + dy * dy
+        px, py = self.xs[idx] - x0, self.ys[idx] - y0
+        t = np.clip((px * dx + py * dy) / length2, 0.0, 1.0) if length2 > 0 else 0.0
+        return idx[(px - t * dx) ** 2 + (py - t * dy) ** 2 <= r * r]
+
+class StaticGrid:
+    """
+    Uniform grid over the static obstacles, built once per map: every cell lists the obstacles
+    overlapping it, so a point test only looks at the handful of rectangles in its own cell.
+    Points outside the map fall back to scanning all obstacles.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param width: float, map width
+    :param height: float, map height
+    :param cell_size: float, side of a grid cell
+    """
+    def __init__(self, obstacles, width, height, cell_size=20):
+        self.obstacles = obstacles
+        self.width = width
+        self.height = height
+        self.cell_size = float(cell_size)
+        self.cols = max(1, int(math.ceil(width / self.cell_size)))
+        self.rows = max(1, int(math.ceil(height / self.cell_size)))
+        self.cells = {}
+        for i, (x, y, w, h) in enumerate(obstacles):
+            x0, x1 = sorted((x, x + w))
+            y0, y1 = sorted((y, y + h))
+            if x1 < 0 or y1 < 0 or x0 > width or y0 > height:
+                continue
+            for cy in range(self.cell(y0, self.rows), self.cell(y1, self.rows) + 1):
+                for cx in range(self.cell(x0, self.cols), self.cell(x1, self.cols) + 1):
+                    self.cells.setdefault((cx, cy), []).append(i)
+
+    def cell(self, v, count):
+        return max(0, min(int(v // self.cell_size), count - 1))
+
+    def candidates(self, point):
+        x, y = point
+        if not (0 <= x <= self.width and 0 <= y <= self.height):
+            return range(len(self.obstacles))
+        return self.cells.get((self.cell(x, self.cols), self.cell(y, self.rows)), ())
+
+    def point_inside(self, point):
+        """
+        Same answer as any(is_inside_obstacle(point, obstacle) for obstacle in obstacles).
+        """
+        for i in self.candidates(point):
+            if is_inside_obstacle(point, self.obstacles[i]):
+                return True
+        return False
@@ -0,0 +1,104 @@
+import numpy as np
+
+def segment_box_overlap(px, py, qx, qy, bounds):
+    """
+    Liang-Barsky (slab) test of segments against closed boxes, interior included. All arguments
+    broadcast against each other.
+    :param px, py, qx, qy: arrays, segment start and end coordinates
+    :param bounds: array (4, ...), x_min, y_min, x_max, y_max of the boxes
+    :return: boolean array, True where the segment meets the box
+    """
+    x_min, y_min, x_max, y_max = bounds
+    dx = qx - px
+    dy = qy - py
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ta = (x_min - px) / dx
+        tb = (x_max - px) / dx
+        sa = (y_min - py) / dy
+        sb = (y_max - py) / dy
+    # Segments parallel to an axis have no slab entry on it: either always inside or never
+    inside_x = (px >= x_min) & (px <= x_max)
+    inside_y = (py >= y_min) & (py <= y_max)
+    flat_x = dx == 0
+    flat_y = dy == 0
+    t0 = np.maximum(np.where(flat_x, 0.0, np.minimum(ta, tb)), np.where(flat_y, 0.0, np.minimum(sa, sb)))
+    t1 = np.minimum(np.where(flat_x, 1.0, np.maximum(ta, tb)), np.where(flat_y, 1.0, np.maximum(sa, sb)))
+    return (np.maximum(t0, 0.0) <= np.minimum(t1, 1.0)) & (~flat_x | inside_x) & (~flat_y | inside_y)
+
+class ObstacleArray:
+    """
+    Static rectangles kept as contiguous arrays so a segment can be tested against all of them
+    in one vectorized Liang-Barsky (slab) pass. Answers match is_path_clear: a segment is
+    blocked when it touches the boundary of any rectangle, touching corners and running along
+    an edge included. A segment lying strictly inside a rectangle never meets its boundary and
+    is clear, exactly as with do_intersect.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    """
+    # Rectangles tested per chunk in segments_clear, keeps the (segments x rectangles) temporaries small
+    chunk = 1 << 20
+
+    def __init__(self, obstacles):
+        rects = np.asarray(obstacles, dtype=np.float64).reshape(-1, 4)
+        x_a = rects[:, 0]
+        x_b = rects[:, 0] + rects[:, 2]
+        y_a = rects[:, 1]
+        y_b = rects[:, 1] + rects[:, 3]
+        self.bounds = np.ascontiguousarray(np.stack([np.minimum(x_a, x_b), np.minimum(y_a, y_b),
+                                                     np.maximum(x_a, x_b), np.maximum(y_a, y_b)]))
+
+    @classmethod
+    def from_bounds(cls, bounds):
+        """
+        Wrapping an existing (4, N) bounds array without copying it, e.g. one living in shared memory.
+        """
+        arr = cls.__new__(cls)
+        arr.bounds = bounds
+        return arr
+
+    def __len__(self):
+        return self.bounds.shape[1]
+
+    def hits(self, px, py, qx, qy, bounds):
+        """
+        Testing segments against rectangles. All arguments broadcast against each other.
+        :param px, py, qx, qy: arrays, segment start and end coordinates
+        :param bounds: array (4, ...), x_min, y_min, x_max, y_max of the rectangles
+        :return: boolean array, True where the segment touches the rectangle's boundary
+        """
+        x_min, y_min, x_max, y_max = bounds
+        touches = segment_box_overlap(px, py, qx, qy, bounds)
+
+        # Segments with both ends strictly inside never reach the boundary
+        p_inside = (px > x_min) & (px < x_max) & (py > y_min) & (py < y_max)
+        q_inside = (qx > x_min) & (qx < x_max) & (qy > y_min) & (qy < y_max)
+        return touches & ~(p_inside & q_inside)
+
+    def segment_clear(self, start, end):
+        """
+        Checking if the path between start and end points is clear of obstacles.
+        :param start: tuple (x, y), start point
+        :param end: tuple (x, y), end point
+        :return: boolean, True if path is clear, False otherwise
+        """
+        if not len(self):
+            return True
+        return not self.hits(start[0], start[1], end[0], end[1], self.bounds).any()
+
+    def segments_clear(self, starts, ends):
+        """
+        Checking a batch of segments against every obstacle at once.
+        :param starts: array-like (K, 2), segment start points
+        :param ends: array-like (K, 2), segment end points
+        :return: boolean array (K,), True where the segment is clear
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        clear = np.ones(len(starts), dtype=bool)
+        if not len(self) or not len(starts):
+            return clear
+        px, py = starts[:, 0, None], starts[:, 1, None]
+        qx, qy = ends[:, 0, None], ends[:, 1, None]
+        step = max(1, self.chunk // len(starts))
+        for i in range(0, len(self), step):
+            clear &= ~self.hits(px, py, qx, qy, self.bounds[:, None, i:i + step]).any(axis=1)
+        return clear
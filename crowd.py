@@ -0,0 +1,208 @@
+import sys
+import time
+
+import numpy as np
+
+from obstacle_tree import ObstacleTree
+
+# The four diagonal directions an agent can pick after a bounce, the same choices Person.move and
+# DynamicObstacle.move make with random.choice([-1, 1]) on each axis
+directions = np.array([(1, 1), (1, -1), (-1, 1), (-1, -1)], dtype=np.float64)
+
+class Crowd:
+    """
+    Structure-of-arrays crowd: positions, velocities and footprints of every agent live in NumPy
+    arrays and the whole crowd advances in one vectorized step.
+
+    An agent occupies the box [x, x + w] x [y, y + h]; people are points (w = h = 0) and the
+    footprint test then reduces to is_inside_obstacle. An agent whose next position would leave
+    the map or touch a static obstacle stays put this tick and bounces: it picks, in a random
+    order drawn from the crowd's seeded generator, the first diagonal direction (same speed)
+    that is free from where it stands, or reverses if none is. That is at most four vectorized
+    tests per tick, never an open-ended retry loop, and identical across runs with the same seed.
+    :param x, y: array-like (N,), positions
+    :param vx, vy: array-like (N,), velocities per tick
+    :param obstacles: list of tuples (x, y, width, height), the static obstacles, or an
+        obstacle_tree.ObstacleTree over them
+    :param width: float, map width
+    :param height: float, map height
+    :param w, h: float or array-like (N,), agent footprints (0 for people)
+    :param size: float or array-like (N,), drawing radius
+    :param seed: int or None, seeds the bounce generator
+    """
+    def __init__(self, x, y, vx, vy, obstacles, width, height, w=0.0, h=0.0, size=5.0, seed=None):
+        self.x = np.array(x, dtype=np.float64)
+        n = len(self.x)
+        self.y = np.array(y, dtype=np.float64)
+        self.vx = np.array(vx, dtype=np.float64)
+        self.vy = np.array(vy, dtype=np.float64)
+        self.w = np.broadcast_to(np.asarray(w, dtype=np.float64), (n,)).copy()
+        self.h = np.broadcast_to(np.asarray(h, dtype=np.float64), (n,)).copy()
+        self.size = np.broadcast_to(np.asarray(size, dtype=np.float64), (n,)).copy()
+        self.width = width
+        self.height = height
+        # Broad phase for the bounce test, so an agent only meets the obstacles near it
+        self.tree = obstacles if isinstance(obstacles, ObstacleTree) else ObstacleTree(obstacles)
+        self.rng = np.random.default_rng(seed)
+        self.ticks = 0
+
+    @classmethod
+    def random_people(cls, n, obstacles, width, height, speed=2, size=5, margin=20, seed=None):
+        """
+        Placing n people at random free positions at least margin away from the map edges,
+        each heading in a random diagonal direction, like Person() does one at a time.
+        """
+        rng = np.random.default_rng(seed)
+        crowd = cls(np.empty(0), np.empty(0), np.empty(0), np.empty(0), obstacles, width, height, seed=rng)
+        xs, ys = [], []
+        placed = 0
+        while placed < n:
+            k = max(2 * (n - placed), 64)
+            x = rng.integers(margin, width - margin, endpoint=True, size=k).astype(np.float64)
+            y = rng.integers(margin, height - margin, endpoint=True, size=k).astype(np.float64)
+            free = ~crowd.blocked(x, y, np.zeros(k), np.zeros(k))
+            xs.append(x[free][:n - placed])
+            ys.append(y[free][:n - placed])
+            placed += len(xs[-1])
+        d = directions[rng.integers(0, 4, size=n)] * speed
+        return cls(np.concatenate(xs), np.concatenate(ys), d[:, 0], d[:, 1], crowd.tree, width, height,
+                   size=size, seed=rng)
+
+    @classmethod
+    def from_people(cls, people, obstacles, width, height, seed=None):
+        return cls([p.x for p in people], [p.y for p in people], [p.dx * p.speed for p in people],
+                   [p.dy * p.speed for p in people], obstacles, width, height,
+                   size=[p.size for p in people], seed=seed)
+
+    @classmethod
+    def from_dynamic_obstacles(cls, dynamic_obstacles, obstacles, width, height, seed=None):
+        return cls([d.x for d in dynamic_obstacles], [d.y for d in dynamic_obstacles],
+                   [d.vel_x for d in dynamic_obstacles], [d.vel_y for d in dynamic_obstacles], obstacles,
+                   width, height, w=[d.w for d in dynamic_obstacles], h=[d.h for d in dynamic_obstacles],
+                   seed=seed)
+
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, i):
+        return AgentView(self, i)
+
+    def __iter__(self):
+        return (AgentView(self, i) for i in range(len(self)))
+
+    def blocked(self, x, y, w, h):
+        """
+        Boxes that leave the map or hit a static obstacle. Boxes with area hit an obstacle they
+        overlap with positive area, like DynamicObstacle.check_collision; points (w = h = 0) hit one
+        they lie in or on the edge of, like is_inside_obstacle.
+        :return: boolean array
+        """
+        hit = (x < 0) | (y < 0) | (x + w > self.width) | (y + h > self.height)
+        if not len(self.tree):
+            return hit
+        x1, y1 = x + w, y + h
+        point = (w == 0) & (h == 0)
+        points = point.all()
+
+        def overlaps(q, b):
+            return (x[q] <= b[2]) & (x1[q] >= b[0]) & (y[q] <= b[3]) & (y1[q] >= b[1])
+
+        def exact(q, b):
+            if points:
+                return overlaps(q, b)
+            strict = (x[q] < b[2]) & (x1[q] > b[0]) & (y[q] < b[3]) & (y1[q] > b[1])
+            return np.where(point[q], overlaps(q, b), strict)
+
+        if not self.tree.levels:
+            # A single leaf has nothing to prune: every agent against every rectangle
+            return hit | exact((slice(None), None), self.tree.bounds[:, None, :]).any(axis=1)
+        # The R-tree hands back the (agent, obstacle) pairs whose bounds meet; only those get the exact test
+        q, i = self.tree.traverse(len(x), overlaps)
+        hit[q[exact(q, self.tree.bounds[:, i])]] = True
+        return hit
+
+    def step(self):
+        """
+        Advancing every agent by one tick.
+        """
+        nx = self.x + self.vx
+        ny = self.y + self.vy
+        stuck = np.flatnonzero(self.blocked(nx, ny, self.w, self.h))
+        free = np.ones(len(self), dtype=bool)
+        free[stuck] = False
+        self.x[free] = nx[free]
+        self.y[free] = ny[free]
+        if len(stuck):
+            self.bounce(stuck)
+        self.ticks += 1
+
+    def bounce(self, idx):
+        x, y, w, h = self.x[idx], self.y[idx], self.w[idx], self.h[idx]
+        speed_x, speed_y = np.abs(self.vx[idx]), np.abs(self.vy[idx])
+        # A random order of the four directions per agent
+        order = np.argsort(self.rng.random((len(idx), 4)), axis=1)
+        vx, vy = -self.vx[idx], -self.vy[idx]
+        pending = np.ones(len(idx), dtype=bool)
+        for k in range(4):
+            d = directions[order[:, k]]
+            cx, cy = d[:, 0] * speed_x, d[:, 1] * speed_y
+            ok = pending & ~self.blocked(x + cx, y + cy, w, h)
+            vx[ok], vy[ok] = cx[ok], cy[ok]
+            pending &= ~ok
+        self.vx[idx], self.vy[idx] = vx, vy
+
+    def collides(self, rect):
+        """
+        Vectorized Person.collides: agents whose position lies strictly inside rect.
+        :return: boolean array
+        """
+        return ((self.x > rect[0]) & (self.x < rect[0] + rect[2]) &
+                (self.y > rect[1]) & (self.y < rect[1] + rect[3]))
+
+class AgentView:
+    """
+    Thin per-agent handle onto a Crowd, for drawing and for code written against Person or
+    DynamicObstacle. Reads and writes go straight to the crowd's arrays.
+    """
+    __slots__ = ("crowd", "i")
+
+    def __init__(self, crowd, i):
+        self.crowd = crowd
+        self.i = i
+
+    x = property(lambda self: float(self.crowd.x[self.i]), lambda self, v: self.crowd.x.__setitem__(self.i, v))
+    y = property(lambda self: float(self.crowd.y[self.i]), lambda self, v: self.crowd.y.__setitem__(self.i, v))
+    vel_x = property(lambda self: float(self.crowd.vx[self.i]), lambda self, v: self.crowd.vx.__setitem__(self.i, v))
+    vel_y = property(lambda self: float(self.crowd.vy[self.i]), lambda self, v: self.crowd.vy.__setitem__(self.i, v))
+    w = property(lambda self: float(self.crowd.w[self.i]))
+    h = property(lambda self: float(self.crowd.h[self.i]))
+    size = property(lambda self: float(self.crowd.size[self.i]))
+    dx = property(lambda self: float(np.sign(self.crowd.vx[self.i])))
+    dy = property(lambda self: float(np.sign(self.crowd.vy[self.i])))
+    speed = property(lambda self: float(max(abs(self.crowd.vx[self.i]), abs(self.crowd.vy[self.i]))))
+
+    def as_rect(self):
+        return (self.x, self.y, self.w, self.h)
+
+    def collides(self, rect):
+        if (self.x > rect[0] and self.x < rect[0] + rect[2] and
+            self.y > rect[1] and self.y < rect[1] + rect[3]):
+            return True
+        return False
+
+    def render(self, screen):
+        import pygame
+        pygame.draw.circle(screen, (255, 0, 0), (int(self.x), int(self.y)), int(self.size))
+
+if __name__ == "__main__":
+    # Time per tick at increasing crowd sizes on the station map
+    from rrt_pygame_dyn import obstacles, width, height
+
+    for n in [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]:
+        crowd = Crowd.random_people(n, obstacles, width, height, seed=0)
+        ticks = 100
+        start_time = time.perf_counter()
+        for _ in range(ticks):
+            crowd.step()
+        elapsed = (time.perf_counter() - start_time) / ticks
+        print("Agents : %7d   %.2f ms/tick   %.0f ticks/s" % (n, elapsed * 1e3, 1 / elapsed))
@@ -0,0 +1,305 @@
+import heapq
+import math
+import sys
+import time
+
+import numpy as np
+
+from occupancy import OccupancyGrid
+
+inf = float("inf")
+
+class DStarLite:
+    """
+    D* Lite (Koenig & Likhachev) on an 8-connected grid over the rasterized static obstacles.
+    The search runs backwards from the goal, so the first query is a plain A* towards the start;
+    after that, when people block or free cells, only the vertices whose cost-to-goal changed are
+    re-expanded, and the chair may have moved on along the path in between.
+    Cells are blocked for good where a static obstacle covers any part of them (see
+    occupancy.OccupancyGrid). People block the cells whose centres are within person size plus
+    radius of them, except the start and goal cells. Diagonal moves may not cut a blocked corner.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param width: float, map width
+    :param height: float, map height
+    :param cell_size: float, side of a planning cell in map units
+    :param radius: float, clearance kept from people on top of their size
+    """
+    def __init__(self, obstacles, width, height, cell_size=10.0, radius=5.0):
+        self.grid = OccupancyGrid(obstacles, width, height, resolution=cell_size)
+        self.cell_size = self.grid.resolution
+        self.radius = radius
+        self.rows, self.cols = self.grid.rows, self.grid.cols
+        static = self.grid.occupied.ravel().tolist()
+        self.static = static
+        self.blocked = bytearray(self.rows * self.cols)
+        self.people_cells = set()
+
+        # Static neighbour lists: (cell, cost, corner a, corner b), corners -1 for straight moves
+        cols, rows, size = self.cols, self.rows, self.cell_size
+        diagonal = size * math.sqrt(2)
+        self.neighbours = neighbours = [()] * (rows * cols)
+        for r in range(rows):
+            for c in range(cols):
+                u = r * cols + c
+                if static[u]:
+                    continue
+                links = []
+                for dr in (-1, 0, 1):
+                    for dc in (-1, 0, 1):
+                        if not (dr or dc) or not (0 <= r + dr < rows and 0 <= c + dc < cols):
+                            continue
+                        v = u + dr * cols + dc
+                        if static[v]:
+                            continue
+                        if dr and dc:
+                            a, b = u + dr * cols, u + dc
+                            if static[a] or static[b]:
+                                continue
+                            links.append((v, diagonal, a, b))
+                        else:
+                            links.append((v, size, -1, -1))
+                neighbours[u] = tuple(links)
+
+        self.start = self.goal = None
+        self.expanded = 0
+
+    def cell(self, point):
+        c = min(max(int(point[0] // self.cell_size), 0), self.cols - 1)
+        r = min(max(int(point[1] // self.cell_size), 0), self.rows - 1)
+        return r * self.cols + c
+
+    def centre(self, u):
+        r, c = divmod(u, self.cols)
+        return ((c + 0.5) * self.cell_size, (r + 0.5) * self.cell_size)
+
+    def heuristic(self, u, v):
+        # Octile distance, consistent with the 8-connected step costs
+        (ur, uc), (vr, vc) = divmod(u, self.cols), divmod(v, self.cols)
+        dr, dc = abs(ur - vr), abs(uc - vc)
+        return self.cell_size * (max(dr, dc) + (math.sqrt(2) - 1) * min(dr, dc))
+
+    def key(self, u):
+        m = min(self.g[u], self.rhs[u])
+        return (m + self.heuristic(self.start, u) + self.km, m)
+
+    def update_vertex(self, u):
+        if u != self.goal:
+            best = inf
+            g = self.g
+            blocked = self.blocked
+            if not blocked[u]:
+                for v, step, a, b in self.neighbours[u]:
+                    if blocked[v] or (a >= 0 and (blocked[a] or blocked[b])):
+                        continue
+                    if step + g[v] < best:
+                        best = step + g[v]
+            self.rhs[u] = best
+        if self.g[u] != self.rhs[u]:
+            k = self.key(u)
+            self.queued[u] = k
+            heapq.heappush(self.queue, (k, u))
+        else:
+            # Lazy removal: the heap entry stays but no longer matches
+            self.queued[u] = None
+
+    def compute(self):
+        """
+        Expanding vertices until the start's cost-to-goal is settled.
+        :return: int, vertices expanded
+        """
+        g, rhs, queue, queued = self.g, self.rhs, self.queue, self.queued
+        start = self.start
+        expanded = 0
+        while queue:
+            k_old, u = queue[0]
+            if queued[u] != k_old:
+                heapq.heappop(queue)
+                continue
+            if not (k_old < self.key(start) or rhs[start] != g[start]):
+                break
+            heapq.heappop(queue)
+            k_new = self.key(u)
+            if k_old < k_new:
+                queued[u] = k_new
+                heapq.heappush(queue, (k_new, u))
+                continue
+            queued[u] = None
+            expanded += 1
+            if g[u] > rhs[u]:
+                g[u] = rhs[u]
+            else:
+                g[u] = inf
+                self.update_vertex(u)
+            for v, _, _, _ in self.neighbours[u]:
+                self.update_vertex(v)
+        self.expanded += expanded
+        return expanded
+
+    def plan(self, start, goal):
+        """
+        First query between two points: A* from the goal towards the start.
+        :param start: tuple (x, y), start point
+        :param goal: tuple (x, y), goal point
+        :return: list of tuples (x, y) from start to goal, or None if the grid does not connect them
+        """
+        self.start, self.goal = self.cell(start), self.cell(goal)
+        for name, u, point in (("Start", self.start, start), ("Goal", self.goal, goal)):
+            if self.static[u]:
+                raise ValueError("%s %r is in a cell blocked by a static obstacle" % (name, tuple(point)))
+        self.start_point, self.goal_point = tuple(start), tuple(goal)
+        n = self.rows * self.cols
+        self.g = [inf] * n
+        self.rhs = [inf] * n
+        self.queued = [None] * n
+        self.queue = []
+        self.km = 0.0
+        self.last = self.start
+        self.rhs[self.goal] = 0.0
+        self.update_vertex(self.goal)
+        self.compute()
+        return self.path()
+
+    def people_blocking(self, xs, ys, sizes):
+        """
+        Cells blocked by people standing at the given positions.
+        :return: set of int, flat cell indices
+        """
+        cells = set()
+        s = self.cell_size
+        for x, y, size in zip(xs, ys, sizes):
+            reach = size + self.radius
+            c0, c1 = max(int((x - reach) // s), 0), min(int((x + reach) // s), self.cols - 1)
+            r0, r1 = max(int((y - reach) // s), 0), min(int((y + reach) // s), self.rows - 1)
+            for r in range(r0, r1 + 1):
+                dy = (r + 0.5) * s - y
+                for c in range(c0, c1 + 1):
+                    dx = (c + 0.5) * s - x
+                    if dx * dx + dy * dy <= reach * reach:
+                        cells.add(r * self.cols + c)
+        cells.discard(self.start)
+        cells.discard(self.goal)
+        return cells
+
+    def update(self, people, start=None):
+        """
+        Repairing the search after the people moved (and the chair, if start is given): the cells
+        they left are freed, the cells they entered are blocked, and only the vertices around those
+        cells are updated before the search resumes.
+        :param people: Person objects or a crowd.Crowd (anything with x, y and size)
+        :param start: tuple (x, y) or None, the chair's new position
+        :return: list of tuples (x, y) from start to goal, or None if the grid does not connect them
+        """
+        if isinstance(getattr(people, "x", None), np.ndarray):
+            xs, ys, sizes = people.x.tolist(), people.y.tolist(), people.size.tolist()
+        else:
+            xs, ys, sizes = [p.x for p in people], [p.y for p in people], [p.size for p in people]
+        if start is not None:
+            self.start_point = tuple(start)
+            self.start = self.cell(start)
+            # Keys stay comparable when the start moves by raising every new key by the distance moved
+            self.km += self.heuristic(self.last, self.start)
+            self.last = self.start
+        cells = self.people_blocking(xs, ys, sizes)
+        changed = cells ^ self.people_cells
+        self.people_cells = cells
+        if changed:
+            for u in changed:
+                self.blocked[u] = u in cells
+            # Every vertex with an edge through a changed cell, diagonals across its corners included
+            touched = set(changed)
+            for u in changed:
+                touched.update(v for v, _, _, _ in self.neighbours[u])
+            for u in touched:
+                if not self.static[u]:
+                    self.update_vertex(u)
+        self.changed = len(changed)
+        self.compute()
+        return self.path()
+
+    def path(self):
+        """
+        Following the cheapest neighbour from the start down to the goal.
+        :return: list of tuples (x, y), or None if the start has no route to the goal
+        """
+        u, g = self.start, self.g
+        if g[u] == inf:
+            return None
+        cells = [u]
+        blocked = self.blocked
+        while u != self.goal:
+            best, best_v = inf, None
+            for v, step, a, b in self.neighbours[u]:
+                if blocked[v] or (a >= 0 and (blocked[a] or blocked[b])):
+                    continue
+                if step + g[v] < best:
+                    best, best_v = step + g[v], v
+            if best_v is None or len(cells) > len(g):
+                return None
+            u = best_v
+            cells.append(u)
+        points = [self.centre(u) for u in cells]
+        points[0], points[-1] = self.start_point, self.goal_point
+        return points
+
+if __name__ == "__main__":
+    # Per-tick replanning latency as the crowd moves and the chair drives along its current path:
+    # D* Lite repairs against a fresh A* on the same grid and against a full RRT replan from scratch
+    from crowd import Crowd
+    from obstacle_tree import ObstacleTree
+    from rrt_planner import Node, RRTPlanner
+    from rrt_pygame import obstacles, width, height, station
+
+    ticks = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print("%7s %-9s %12s %12s %12s %14s %9s" % ("people", "planner", "mean (ms)", "p95 (ms)", "max (ms)",
+                                               "expanded/tick", "found"))
+    tree = ObstacleTree(obstacles)
+    for n in (15, 60, 200):
+        results = {"d*lite": [], "a*": [], "rrt": []}
+        found = {name: 0 for name in results}
+        expanded = {"d*lite": 0, "a*": 0}
+        crowd = Crowd.random_people(n, obstacles, width, height, seed=0)
+        start_time = time.perf_counter()
+        dstar = DStarLite(obstacles, width, height)
+        dstar.plan(station.start, station.goal)
+        path = dstar.update(crowd)
+        first = time.perf_counter() - start_time
+        astar = DStarLite(obstacles, width, height)
+        chair = tuple(station.start)
+        for tick in range(ticks):
+            crowd.step()
+            if path is not None and len(path) > 1:
+                # Two units per tick towards the next waypoint
+                (x, y), (nx, ny) = chair, path[1]
+                d = math.hypot(nx - x, ny - y)
+                chair = (nx, ny) if d <= 2.0 else (x + (nx - x) * 2.0 / d, y + (ny - y) * 2.0 / d)
+            start_time = time.perf_counter()
+            before = dstar.expanded
+            path = dstar.update(crowd, start=chair)
+            results["d*lite"].append(time.perf_counter() - start_time)
+            expanded["d*lite"] += dstar.expanded - before
+            found["d*lite"] += path is not None
+
+            # The same blocked cells, searched from nothing; both searches are optimal, so the costs agree
+            astar.blocked[:] = dstar.blocked
+            before = astar.expanded
+            start_time = time.perf_counter()
+            reference = astar.plan(chair, station.goal)
+            results["a*"].append(time.perf_counter() - start_time)
+            expanded["a*"] += astar.expanded - before
+            found["a*"] += reference is not None
+            assert (path is None) == (reference is None)
+            assert path is None or abs(dstar.g[dstar.start] - astar.g[astar.start]) < 1e-6
+
+            def node_valid(nn, newnode):
+                return not crowd.collides((newnode.x, newnode.y, 5, 5)).any()
+
+            start_time = time.perf_counter()
+            newnode = RRTPlanner(obstacles, width, height, collision=tree, seed=tick).plan(
+                Node(*chair), Node(*station.goal), max_iterations=20000, node_valid=node_valid)
+            results["rrt"].append(time.perf_counter() - start_time)
+            found["rrt"] += newnode is not None
+        for name, times in results.items():
+            print("%7d %-9s %12.2f %12.2f %12.2f %14s %8.0f%%" % (
+                n, name, np.mean(times) * 1e3, np.percentile(times, 95) * 1e3, max(times) * 1e3,
+                "%.0f" % (expanded[name] / ticks) if name in expanded else "-", found[name] / ticks * 100))
+        print("%7d first query (grid build + A*): %.1f ms" % (n, first * 1e3))
@@ -0,0 +1,231 @@
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from broadphase import CrowdGrid
+from rrt_planner import is_path_clear, make_checker
+
+class EdgeCache:
+    """
+    Bounded LRU cache of edge validity for replanning. The static obstacles never move, so the
+    static half of an edge check is computed once and kept, keyed on the segment's end points
+    snapped to a grid of side quantum (in either direction); end points closer than that share an
+    answer. The dynamic half is never cached: a cached edge is only rechecked against the people
+    near it in the current frame.
+    Works as a collision checker (segment_clear / segments_clear, static only) for the planners, and
+    edge_clear(start, end) adds the people given to the last begin_frame(). The cache empties itself
+    when the caller's map version changes, given to update_map() or begin_frame(); nothing is hashed
+    per frame, so a map edited in place needs its version bumped.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param width: float, map width
+    :param height: float, map height
+    :param collision: static obstacle backend for cache misses, see rrt_planner.make_checker
+    :param capacity: int, edges kept before the least recently used are evicted
+    :param quantum: float, end point snapping for the cache key
+    :param radius: float, distance from an edge at which a person blocks it
+    :param map_version: hashable, the caller's version of the map, e.g. a counter bumped on every edit
+    """
+    def __init__(self, obstacles, width, height, collision="rtree", capacity=65536, quantum=0.01, radius=5.0,
+                 map_version=0):
+        if capacity < 1 or quantum <= 0:
+            raise ValueError("EdgeCache needs capacity >= 1 and quantum > 0, got %r" % ((capacity, quantum),))
+        self.collision = collision
+        self.capacity = capacity
+        self.quantum = quantum
+        self.radius = radius
+        self.entries = OrderedDict()
+        self.crowd = CrowdGrid(width, height)
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self.dynamic_checks = self.dynamic_blocked = 0
+        self.version = None
+        self.loaded = False
+        self.update_map(obstacles, width, height, map_version)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def update_map(self, obstacles, width, height, map_version=None):
+        """
+        Pointing the cache at a (possibly changed) map. Every entry is dropped when map_version
+        differs from the one the entries were computed for; None always counts as a change.
+        :return: boolean, True if the cache was invalidated
+        """
+        self.obstacles, self.width, self.height = obstacles, width, height
+        if self.loaded and map_version is not None and map_version == self.version:
+            return False
+        if self.loaded:
+            self.invalidations += 1
+        self.loaded = True
+        self.version = map_version
+        self.checker = make_checker(self.collision, obstacles, width, height)
+        self.entries.clear()
+        self.crowd = CrowdGrid(width, height)
+        return True
+
+    def begin_frame(self, people, map_version=None):
+        """
+        Taking in this frame's people (Person objects, or a crowd.Crowd). When map_version is given
+        and differs from the cache's, the obstacle list was edited in place and the cache is dropped.
+        """
+        if map_version is not None and map_version != self.version:
+            self.update_map(self.obstacles, self.width, self.height, map_version)
+        if isinstance(getattr(people, "x", None), np.ndarray):
+            self.crowd.rebuild(people.x, people.y)
+        else:
+            self.crowd.rebuild_from(people)
+
+    def key(self, start, end):
+        q = self.quantum
+        a = (round(start[0] / q), round(start[1] / q))
+        b = (round(end[0] / q), round(end[1] / q))
+        return (a, b) if a <= b else (b, a)
+
+    def lookup(self, key):
+        clear = self.entries.get(key)
+        if clear is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return clear
+
+    def store(self, key, clear):
+        self.entries[key] = clear
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def segment_clear(self, start, end):
+        """
+        Checking an edge against the static obstacles, from the cache when it was checked before.
+        """
+        key = self.key(start, end)
+        clear = self.lookup(key)
+        if clear is None:
+            if self.checker is not None:
+                clear = self.checker.segment_clear(start, end)
+            else:
+                clear = is_path_clear(start, end, self.obstacles)
+            self.store(key, clear)
+        return clear
+
+    def segments_clear(self, starts, ends):
+        """
+        Checking a batch of edges against the static obstacles; the misses go to the backend as one batch.
+        :return: boolean array (K,), True where the edge is clear
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        keys = [self.key(a, b) for a, b in zip(starts.tolist(), ends.tolist())]
+        result = np.empty(len(keys), dtype=bool)
+        missing = []
+        for i, key in enumerate(keys):
+            clear = self.lookup(key)
+            if clear is None:
+                missing.append(i)
+            else:
+                result[i] = clear
+        if missing:
+            if hasattr(self.checker, "segments_clear"):
+                found = self.checker.segments_clear(starts[missing], ends[missing])
+            else:
+                found = [self.checker.segment_clear(starts[i], ends[i]) if self.checker is not None else
+                         is_path_clear(starts[i], ends[i], self.obstacles) for i in missing]
+            for i, clear in zip(missing, np.asarray(found).tolist()):
+                result[i] = clear
+                self.store(keys[i], clear)
+        return result
+
+    def edge_clear(self, start, end):
+        """
+        Checking an edge against the static obstacles (cached) and then against the people of the
+        current frame that come within radius of it.
+        """
+        if not self.segment_clear(start, end):
+            return False
+        self.dynamic_checks += 1
+        if len(self.crowd.near_segment(start, end, self.radius)):
+            self.dynamic_blocked += 1
+            return False
+        return True
+
+    def node_valid(self, parent, n):
+        """
+        edge_clear as a planner / DynamicReplanner node_valid callback.
+        """
+        return self.edge_clear((parent.x, parent.y), (n.x, n.y))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "dynamic_checks": self.dynamic_checks,
+            "dynamic_blocked": self.dynamic_blocked,
+        }
+
+if __name__ == "__main__":
+    # Frame-by-frame replanning in a moving crowd, edges checked with and without the cache. Both
+    # runs see the same crowd and the same samples, so they build the same trees. The planners get
+    # the plain R-tree for their own static check, so the cache only answers node_valid and every
+    # lookup it counts is one the uncached run pays for too
+    from crowd import Crowd
+    from obstacle_tree import ObstacleTree
+    from replan import DynamicReplanner
+    from rrt_planner import Node, RRTPlanner
+    from rrt_pygame import obstacles, width, height, station
+    from station_map import random_station
+
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    maps = [("platform", obstacles, width, height, station)]
+    big = random_station(20000, width=4000.0, height=3000.0)
+    maps.append(("20k obstacles", big.obstacle_list(), big.width, big.height, big))
+
+    class Uncached:
+        # Same checks as EdgeCache, nothing kept between them
+        def __init__(self, tree, width, height):
+            self.tree = tree
+            self.crowd = CrowdGrid(width, height)
+
+        def begin_frame(self, people):
+            self.crowd.rebuild(people.x, people.y)
+
+        def node_valid(self, parent, n):
+            return (self.tree.segment_clear((parent.x, parent.y), (n.x, n.y)) and
+                    not len(self.crowd.near_segment((parent.x, parent.y), (n.x, n.y), 5.0)))
+
+    print("%-14s %-12s %-9s %12s %10s %10s %10s" % ("map", "replanning", "edges", "ms/frame", "hit rate", "evictions",
+                                                  "entries"))
+    for name, obs, w, h, m in maps:
+        tree = ObstacleTree(obs)
+        for mode in ("incremental", "scratch"):
+            for kind in ("direct", "cached"):
+                checker = EdgeCache(obs, w, h, collision=tree) if kind == "cached" else Uncached(tree, w, h)
+                crowd = Crowd.random_people(60, obs, w, h, seed=0)
+                replanner = None
+                elapsed = 0.0
+                for frame in range(frames):
+                    crowd.step()
+                    start_time = time.perf_counter()
+                    checker.begin_frame(crowd)
+                    if mode == "incremental":
+                        if replanner is None:
+                            replanner = DynamicReplanner(RRTPlanner(obs, w, h, collision=tree, seed=0),
+                                                         Node(*m.start), Node(*m.goal), checker.node_valid,
+                                                         check_radius=15)
+                        replanner.replan(crowd, max_iterations=20000)
+                    else:
+                        # The same seed every frame, so most edges come back
+                        RRTPlanner(obs, w, h, collision=tree, seed=0).plan(
+                            Node(*m.start), Node(*m.goal), max_iterations=20000, node_valid=checker.node_valid)
+                    elapsed += time.perf_counter() - start_time
+                s = checker.stats() if kind == "cached" else None
+                print("%-14s %-12s %-9s %12.2f %10s %10s %10s" % (
+                    name, mode, kind, elapsed / frames * 1e3, "%.1f%%" % (s["hit_rate"] * 100) if s else "-",
+                    s["evictions"] if s else "-", s["entries"] if s else "-"))
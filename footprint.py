@@ -0,0 +1,137 @@
+import math
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import map_cache
+from collision import ObstacleArray
+from obstacle_tree import ObstacleTree
+
+class Footprint:
+    """
+    Wheelchair footprint plus the safety margin to keep from every obstacle. The chair turns to
+    follow the path, so clearance is planned for the circle that contains it at any heading.
+    :param length: float, front-to-back size of the chair
+    :param width: float, side-to-side size of the chair
+    :param margin: float, extra clearance kept on top of the footprint
+    """
+    def __init__(self, length=24.0, width=16.0, margin=4.0):
+        if length < 0 or width < 0 or margin < 0:
+            raise ValueError("Footprint sizes must not be negative, got %r" % ((length, width, margin),))
+        self.length = float(length)
+        self.width = float(width)
+        self.margin = float(margin)
+
+    @property
+    def radius(self):
+        return math.hypot(self.length, self.width) / 2 + self.margin
+
+    def key(self):
+        return (self.length, self.width, self.margin)
+
+    def __repr__(self):
+        return "Footprint(length=%r, width=%r, margin=%r)" % self.key()
+
+def inflate(obstacles, radius):
+    """
+    Growing every rectangle by radius on each side. This is the Minkowski sum with a disc of that
+    radius, with square corners where the exact sum has rounded ones, so it errs on the safe side.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param radius: float
+    :return: list of tuples (x, y, width, height)
+    """
+    x_min, y_min, x_max, y_max = ObstacleArray(obstacles).bounds
+    grown = np.column_stack([x_min - radius, y_min - radius, x_max - x_min + 2 * radius, y_max - y_min + 2 * radius])
+    return [tuple(o) for o in grown.tolist()]
+
+def walls(width, height, thickness=1.0):
+    """
+    Thin rectangles just outside the map edges, so the station walls get the same clearance as obstacles.
+    """
+    t = thickness
+    return [(-t, -t, width + 2 * t, t), (-t, height, width + 2 * t, t), (-t, 0, t, height), (width, 0, t, height)]
+
+class InflatedMap:
+    """
+    The static obstacles (and walls) inflated for one footprint. Edge checks against these are checks
+    of the footprint's centre line, so clearance costs no more than today's point checks. The R-tree
+    over them is built on first use.
+    """
+    def __init__(self, obstacles, width, height, footprint, with_walls=True):
+        self.footprint = footprint
+        base = list(obstacles) + (walls(width, height) if with_walls else [])
+        self.obstacles = inflate(base, footprint.radius)
+        self._tree = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = ObstacleTree(self.obstacles)
+        return self._tree
+
+# Inflated maps by map contents and footprint, most recently used last
+inflated_maps = OrderedDict()
+inflated_cache_size = 16
+
+def inflated_map(obstacles, width, height, footprint, with_walls=True):
+    """
+    The InflatedMap for this map and footprint, built once and then shared by every planner that
+    asks for the same pair.
+    """
+    key = map_cache.map_key(obstacles, width, height, "inflated", footprint.key(), with_walls)
+    inflated = inflated_maps.get(key)
+    if inflated is None:
+        inflated = inflated_maps[key] = InflatedMap(obstacles, width, height, footprint, with_walls)
+        if len(inflated_maps) > inflated_cache_size:
+            inflated_maps.popitem(last=False)
+    else:
+        inflated_maps.move_to_end(key)
+    return inflated
+
+def clearance(path, obstacles, step=1.0):
+    """
+    Smallest distance between a path and the obstacles, measured at points spaced step apart.
+    :param path: list of tuples (x, y)
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :return: float, 0 where the path touches an obstacle
+    """
+    points = [np.asarray(path[:1], dtype=np.float64)]
+    for (ax, ay), (bx, by) in zip(path, path[1:]):
+        n = max(1, int(math.ceil(math.hypot(bx - ax, by - ay) / step)))
+        t = np.linspace(0.0, 1.0, n + 1)[1:, None]
+        points.append(np.array([ax, ay]) + t * (bx - ax, by - ay))
+    p = np.concatenate(points)
+    x_min, y_min, x_max, y_max = ObstacleArray(obstacles).bounds
+    dx = np.maximum(np.maximum(x_min[None] - p[:, :1], 0.0), p[:, :1] - x_max[None])
+    dy = np.maximum(np.maximum(y_min[None] - p[:, 1:], 0.0), p[:, 1:] - y_max[None])
+    return float(np.hypot(dx, dy).min())
+
+if __name__ == "__main__":
+    # Path clearance and planning cost with and without the wheelchair footprint
+    from rrt_planner import Node, RRTPlanner, extract_path
+    from rrt_pygame import obstacles, width, height, station
+
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    chair = Footprint()
+    start_time = time.perf_counter()
+    inflated_map(obstacles, width, height, chair).tree
+    build = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    inflated_map(obstacles, width, height, chair).tree
+    print("Inflated map for %r, radius %.1f: built in %.2f ms, cached lookup %.3f ms" % (
+        chair, chair.radius, build * 1e3, (time.perf_counter() - start_time) * 1e3))
+
+    print("%-10s %14s %14s %12s" % ("footprint", "min clearance", "mean clearance", "time (ms)"))
+    for footprint in (None, chair):
+        found, elapsed = [], []
+        for seed in range(seeds):
+            planner = RRTPlanner(obstacles, width, height, seed=seed, footprint=footprint)
+            start_time = time.perf_counter()
+            newnode = planner.plan(Node(*station.start), Node(*station.goal), max_iterations=50000)
+            elapsed.append(time.perf_counter() - start_time)
+            if newnode is not None:
+                found.append(clearance(extract_path(newnode), obstacles))
+        print("%-10s %14.1f %14.1f %12.2f   (%d/%d found)" % (
+            "chair" if footprint else "point", min(found), np.mean(found), np.mean(elapsed) * 1e3, len(found), seeds))
@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+class Instrumentation:
+    """
+    Opt-in per-stage timers and counters for the planning loop. Attaching it to a planner swaps the
+    planner's hot-path methods for timed wrappers on that instance only, so a planner without
+    instrumentation runs exactly the code it always did.
+
+    Stages: nearest (NN lookup), static_collision (obstacle edge checks), people_collision
+    (node_valid), on_edge and on_iteration (drawing, moving people, ...).
+    Counters: samples, rejected_static, rejected_people, tree_size.
+    :param trace: bool, also record every call as a Chrome trace event (chrome://tracing, Perfetto,
+        speedscope), capped at max_events
+    :param max_events: int, events kept before recording stops
+    """
+    def __init__(self, trace=False, max_events=1000000):
+        self.trace = trace
+        self.max_events = max_events
+        self.stages = {}
+        self.counters = {}
+        self.events = []
+        self.pid = os.getpid()
+        self.origin = time.perf_counter_ns()
+
+    def record(self, name, start, end):
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = [0, 0]
+        stage[0] += 1
+        stage[1] += end - start
+        if self.trace and len(self.events) < self.max_events:
+            self.events.append((name, start, end, threading.get_ident()))
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def wrap(self, name, fn, reject_counter=None):
+        """
+        Timing every call of fn under stage name. With reject_counter, falsy results (or False
+        entries of an array result) are counted under it.
+        """
+        clock = time.perf_counter_ns
+        record = self.record
+        count = self.count
+
+        def timed(*args, **kwargs):
+            start = clock()
+            result = fn(*args, **kwargs)
+            record(name, start, clock())
+            if reject_counter is not None:
+                if isinstance(result, np.ndarray):
+                    rejected = int(result.size - np.count_nonzero(result))
+                    if rejected:
+                        count(reject_counter, rejected)
+                elif not result:
+                    count(reject_counter)
+            return result
+        return timed
+
+    def attach(self, planner):
+        """
+        Installing timed wrappers for the planner's nearest-neighbour and collision methods.
+        """
+        planner.nearest = self.wrap("nearest", planner.nearest)
+        planner.nearest_batch = self.wrap("nearest", planner.nearest_batch)
+        planner.near = self.wrap("near", planner.near)
+        planner.path_clear = self.wrap("static_collision", planner.path_clear, "rejected_static")
+        planner.paths_clear = self.wrap("static_collision", planner.paths_clear, "rejected_static")
+        return planner
+
+    def callbacks(self, node_valid, on_edge, on_iteration):
+        """
+        Wrapping the planner callbacks, None stays None.
+        """
+        return (node_valid and self.wrap("people_collision", node_valid, "rejected_people"),
+                on_edge and self.wrap("on_edge", on_edge),
+                on_iteration and self.wrap("on_iteration", on_iteration))
+
+    def finish(self, planner, iterations):
+        self.count("samples", iterations)
+        self.counters["tree_size"] = len(planner.nodes)
+
+    def summary(self):
+        """
+        Per-run summary: calls, total and mean time per stage, plus the counters.
+        """
+        stages = {}
+        for name, (calls, total) in sorted(self.stages.items(), key=lambda s: -s[1][1]):
+            stages[name] = {"calls": calls, "total_s": total / 1e9, "mean_us": total / calls / 1e3}
+        return {"stages": stages, "counters": dict(self.counters)}
+
+    def write_summary(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def chrome_trace(self):
+        """
+        Recorded calls as Chrome trace "complete" events, timestamps in microseconds.
+        """
+        events = [{"name": name, "cat": "planner", "ph": "X", "pid": self.pid, "tid": tid,
+                   "ts": (start - self.origin) / 1e3, "dur": (end - start) / 1e3}
+                  for name, start, end, tid in self.events]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def report(self):
+        s = self.summary()
+        lines = ["%-18s %10s %12s %12s" % ("stage", "calls", "total (s)", "mean (us)")]
+        for name, st in s["stages"].items():
+            lines.append("%-18s %10d %12.4f %12.2f" % (name, st["calls"], st["total_s"], st["mean_us"]))
+        for name, value in sorted(s["counters"].items()):
+            lines.append("%-18s %10d" % (name, value))
+        return "\n".join(lines)
@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+import numpy as np
+
+# Bumping this invalidates every cached artefact built from a map (grids, roadmaps, ...)
+cache_version = 1
+
+def cache_dir():
+    """
+    Directory for artefacts derived from a map. RRT_CACHE_DIR overrides the default.
+    """
+    path = os.environ.get("RRT_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "rrt_planner")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def map_key(obstacles, width, height, *extra):
+    """
+    Hashing map contents so cached artefacts are rebuilt whenever the map changes.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param width: float, map width
+    :param height: float, map height
+    :param extra: anything else the artefact depends on (resolution, footprint, ...)
+    :return: str, hex digest
+    """
+    h = hashlib.sha256()
+    h.update(repr((cache_version, float(width), float(height), extra)).encode())
+    h.update(np.ascontiguousarray(np.asarray(obstacles, dtype=np.float64).reshape(-1, 4)).tobytes())
+    return h.hexdigest()[:32]
+
+def cache_path(kind, key, ext=".npz"):
+    return os.path.join(cache_dir(), "%s-%s%s" % (kind, key, ext))
+
+def save_npz(path, **arrays):
+    """
+    Writing arrays to path atomically, so a half-written file is never picked up by another process.
+    """
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+def load_npz(path):
+    """
+    Loading cached arrays, None if the file is missing or unreadable.
+    """
+    try:
+        with np.load(path) as data:
+            return {name: data[name] for name in data.files}
+    except (OSError, ValueError, KeyError):
+        return None
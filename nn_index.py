@@ -0,0 +1,227 @@
+import math
+
+import numpy as np
+
+# Nearest-neighbour indexes for the RRT tree. They all share the same small interface:
+#   insert(x, y, item)      adding a point, item is what queries hand back (usually a Node)
+#   nearest(x, y)           item closest to (x, y), None if the index is empty
+#   radius(x, y, r)         list of items within distance r of (x, y)
+#   nearest_batch(points)   list with the nearest item for each row of a (K, 2) array
+# Ties in nearest() are resolved towards the item inserted first, same as the original scan.
+
+class Index:
+    """
+    Shared part of the indexes: batched queries default to one tree walk per point, so a batch
+    costs the same per query as nearest() and keeps the index's sublinear scaling.
+    """
+    def nearest_batch(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        return [self.nearest(x, y) for x, y in points.tolist()]
+
+class LinearIndex(Index):
+    """
+    The original linear scan, kept as a reference and for very small trees. With nothing to prune,
+    a batch is answered by one vectorized scan over a growable coordinate array instead.
+    """
+    # Cap on the (queries x points) distance matrix built per chunk
+    batch_chunk = 1 << 21
+
+    def __init__(self):
+        self.points = []
+        self.coords = np.empty((64, 2))
+
+    def __len__(self):
+        return len(self.points)
+
+    def insert(self, x, y, item):
+        n = len(self.points)
+        if n == len(self.coords):
+            self.coords = np.concatenate([self.coords, np.empty_like(self.coords)])
+        self.coords[n] = (x, y)
+        self.points.append((x, y, item))
+
+    def nearest(self, x, y):
+        best = None
+        best_d = math.inf
+        for px, py, item in self.points:
+            d = (px - x) ** 2 + (py - y) ** 2
+            if d < best_d:
+                best_d = d
+                best = item
+        return best
+
+    def nearest_batch(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        n = len(self.points)
+        if not n:
+            return [None] * len(points)
+        coords = self.coords[:n]
+        step = max(1, self.batch_chunk // n)
+        found = []
+        for i in range(0, len(points), step):
+            chunk = points[i:i + step]
+            d = (chunk[:, None, 0] - coords[None, :, 0]) ** 2 + (chunk[:, None, 1] - coords[None, :, 1]) ** 2
+            found.extend(self.points[j][2] for j in d.argmin(axis=1))
+        return found
+
+    def radius(self, x, y, r):
+        r2 = r * r
+        return [item for px, py, item in self.points if (px - x) ** 2 + (py - y) ** 2 <= r2]
+
+class GridIndex(Index):
+    """
+    Uniform-grid spatial hash. Nearest queries search rings of cells outwards from the query
+    cell and stop as soon as no unsearched ring can hold anything closer than the best so far.
+    :param cell_size: float, side of a grid cell, something close to the RRT step size works well
+    """
+    def __init__(self, cell_size=20):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.count = 0
+        self.min_cx = self.min_cy = math.inf
+        self.max_cx = self.max_cy = -math.inf
+
+    def __len__(self):
+        return self.count
+
+    def cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def insert(self, x, y, item):
+        cx, cy = self.cell(x, y)
+        self.cells.setdefault((cx, cy), []).append((x, y, self.count, item))
+        self.count += 1
+        self.min_cx = min(self.min_cx, cx)
+        self.min_cy = min(self.min_cy, cy)
+        self.max_cx = max(self.max_cx, cx)
+        self.max_cy = max(self.max_cy, cy)
+
+    def ring(self, cx, cy, r):
+        if r == 0:
+            yield cx, cy
+            return
+        for i in range(cx - r, cx + r + 1):
+            yield i, cy - r
+            yield i, cy + r
+        for j in range(cy - r + 1, cy + r):
+            yield cx - r, j
+            yield cx + r, j
+
+    def nearest(self, x, y):
+        if not self.count:
+            return None
+        cx, cy = self.cell(x, y)
+        # Rings beyond this one only hold empty cells
+        max_r = max(abs(cx - self.min_cx), abs(cx - self.max_cx), abs(cy - self.min_cy), abs(cy - self.max_cy))
+        best = None
+        best_key = (math.inf, 0)
+        r = 0
+        while r <= max_r:
+            for key in self.ring(cx, cy, r):
+                for px, py, order, item in self.cells.get(key, ()):
+                    k = ((px - x) ** 2 + (py - y) ** 2, order)
+                    if k < best_key:
+                        best_key = k
+                        best = item
+            # Anything in ring r+1 is further than r cells away
+            if best is not None and best_key[0] <= (r * self.cell_size) ** 2:
+                break
+            r += 1
+        return best
+
+    def radius(self, x, y, r):
+        r2 = r * r
+        cx0, cy0 = self.cell(x - r, y - r)
+        cx1, cy1 = self.cell(x + r, y + r)
+        found = []
+        for i in range(max(cx0, self.min_cx), min(cx1, self.max_cx) + 1):
+            for j in range(max(cy0, self.min_cy), min(cy1, self.max_cy) + 1):
+                for px, py, order, item in self.cells.get((i, j), ()):
+                    if (px - x) ** 2 + (py - y) ** 2 <= r2:
+                        found.append((order, item))
+        found.sort(key=lambda f: f[0])
+        return [item for order, item in found]
+
+class KDTree(Index):
+    """
+    Incremental 2-d tree. Points are inserted as leaves without rebalancing, which stays
+    shallow for the random insertion order RRT produces.
+    """
+    # Node layout: [x, y, item, order, left, right], split axis alternates with depth
+    def __init__(self):
+        self.root = None
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def insert(self, x, y, item):
+        new = [x, y, item, self.count, None, None]
+        self.count += 1
+        if self.root is None:
+            self.root = new
+            return
+        n = self.root
+        axis = 0
+        while True:
+            side = 4 if (x if axis == 0 else y) < n[axis] else 5
+            if n[side] is None:
+                n[side] = new
+                return
+            n = n[side]
+            axis ^= 1
+
+    def nearest(self, x, y):
+        if self.root is None:
+            return None
+        q = (x, y)
+        best = [math.inf, 0, None]
+        stack = [(self.root, 0, 0.0)]
+        while stack:
+            n, axis, bound = stack.pop()
+            if n is None or bound > best[0]:
+                continue
+            d = (n[0] - x) ** 2 + (n[1] - y) ** 2
+            if d < best[0] or (d == best[0] and n[3] < best[1]):
+                best[0], best[1], best[2] = d, n[3], n[2]
+            diff = q[axis] - n[axis]
+            near, far = (n[4], n[5]) if diff < 0 else (n[5], n[4])
+            # Far side first so the near side is popped (and searched) first
+            stack.append((far, axis ^ 1, diff * diff))
+            stack.append((near, axis ^ 1, 0.0))
+        return best[2]
+
+    def radius(self, x, y, r):
+        r2 = r * r
+        q = (x, y)
+        found = []
+        stack = [(self.root, 0)]
+        while stack:
+            n, axis = stack.pop()
+            if n is None:
+                continue
+            if (n[0] - x) ** 2 + (n[1] - y) ** 2 <= r2:
+                found.append((n[3], n[2]))
+            diff = q[axis] - n[axis]
+            if diff < r:
+                stack.append((n[4], axis ^ 1))
+            if diff >= -r:
+                stack.append((n[5], axis ^ 1))
+        found.sort(key=lambda f: f[0])
+        return [item for order, item in found]
+
+indexes = {
+    "linear": LinearIndex,
+    "grid": GridIndex,
+    "kdtree": KDTree,
+}
+
+def make_index(kind="kdtree", **kwargs):
+    """
+    Building an empty nearest-neighbour index by name.
+    :param kind: str, one of "linear", "grid" or "kdtree"
+    :return: index instance
+    """
+    if kind not in indexes:
+        raise ValueError("Unknown nearest-neighbour index: %r (expected one of %s)" % (kind, ", ".join(indexes)))
+    return indexes[kind](**kwargs)
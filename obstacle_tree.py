@@ -0,0 +1,247 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+from collision import ObstacleArray, segment_box_overlap
+
+class ObstacleTree:
+    """
+    Packed STR (sort-tile-recursive) R-tree over the static rectangles, built once per map.
+    Every level is a (4, M) bounds array whose nodes own a contiguous range of the level below,
+    so a query walks the tree breadth-first for a whole batch at once: (query, node) pairs whose
+    boxes overlap survive to the next level and are expanded into their children. Only the
+    rectangles left at the bottom get the exact test, so answers are the same as the linear scans
+    (is_path_clear, is_inside_obstacle, DynamicObstacle.check_collision) at a fraction of the work
+    on large maps.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param leaf_size: int, rectangles per leaf and children per inner node
+    """
+    def __init__(self, obstacles, leaf_size=16):
+        if leaf_size < 2:
+            raise ValueError("leaf_size must be at least 2, got %r" % (leaf_size,))
+        self.leaf_size = leaf_size
+        bounds = ObstacleArray(obstacles).bounds
+        # Rectangles are stored in leaf order; order maps back to the caller's obstacle indices
+        self.order = self.pack(bounds)
+        self.rects = ObstacleArray.from_bounds(np.ascontiguousarray(bounds[:, self.order]))
+        self.bounds = self.rects.bounds
+
+        # Inner levels, bottom up: (bounds, first child, child count) per node
+        self.levels = []
+        below = self.bounds
+        while below.shape[1] > leaf_size:
+            if self.levels:
+                # Nodes carry their child ranges with them, so inner levels can be re-tiled as well
+                boxes, first, count = self.levels[-1]
+                order = self.pack(boxes)
+                self.levels[-1] = (boxes[:, order], first[order], count[order])
+                below = self.levels[-1][0]
+            first = np.arange(0, below.shape[1], leaf_size)
+            count = np.minimum(leaf_size, below.shape[1] - first)
+            boxes = np.stack([np.minimum.reduceat(below[0], first), np.minimum.reduceat(below[1], first),
+                              np.maximum.reduceat(below[2], first), np.maximum.reduceat(below[3], first)])
+            self.levels.append((boxes, first, count))
+            below = boxes
+
+        # The same tree as nested lists of (x_min, y_min, x_max, y_max, payload) entries for single
+        # queries, which are cheaper walked in plain Python than paying NumPy's per-call overhead
+        entries = [tuple(b) + (i,) for b, i in zip(self.bounds.T.tolist(), self.order.tolist())]
+        for boxes, first, count in self.levels:
+            entries = [tuple(b) + (entries[f:f + c],)
+                       for b, f, c in zip(boxes.T.tolist(), first.tolist(), count.tolist())]
+        self.root = entries
+        self.depth = len(self.levels)
+
+    def pack(self, bounds):
+        """
+        Sort-tile-recursive order: rectangles are cut into vertical slices by centre x, and every
+        slice is sorted by centre y, so consecutive runs of leaf_size rectangles are compact tiles.
+        """
+        n = bounds.shape[1]
+        if n <= self.leaf_size:
+            return np.arange(n)
+        cx = bounds[0] + bounds[2]
+        cy = bounds[1] + bounds[3]
+        leaves = math.ceil(n / self.leaf_size)
+        per_slice = math.ceil(leaves / math.ceil(math.sqrt(leaves))) * self.leaf_size
+        by_x = np.argsort(cx, kind="stable")
+        slices = np.arange(n) // per_slice
+        return by_x[np.lexsort((cy[by_x], slices))]
+
+    def __len__(self):
+        return self.bounds.shape[1]
+
+    def traverse(self, count, overlaps):
+        """
+        Pruning (query, rectangle) pairs level by level.
+        :param count: int, number of queries
+        :param overlaps: callable (query indices, bounds (4, P)) -> boolean array (P,), box test
+        :return: (query indices, rectangle indices in leaf order) that reached the bottom
+        """
+        top = self.levels[-1][0] if self.levels else self.bounds
+        queries = np.repeat(np.arange(count), top.shape[1])
+        nodes = np.tile(np.arange(top.shape[1]), count)
+        for boxes, first, num in reversed(self.levels):
+            keep = overlaps(queries, boxes[:, nodes])
+            queries, nodes = queries[keep], nodes[keep]
+            # Expanding every surviving node into its contiguous run of children
+            num = num[nodes]
+            starts = np.repeat(first[nodes] - np.cumsum(num) + num, num)
+            queries = np.repeat(queries, num)
+            nodes = starts + np.arange(len(starts))
+        return queries, nodes
+
+    def points_inside(self, points):
+        """
+        Checking a batch of points against the rectangles, edges included.
+        :param points: array-like (K, 2)
+        :return: boolean array (K,), True where the point is inside an obstacle
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        x, y = points[:, 0], points[:, 1]
+
+        def overlaps(q, b):
+            return (x[q] >= b[0]) & (x[q] <= b[2]) & (y[q] >= b[1]) & (y[q] <= b[3])
+
+        inside = np.zeros(len(points), dtype=bool)
+        if not len(self):
+            return inside
+        q, i = self.traverse(len(points), overlaps)
+        inside[q[overlaps(q, self.bounds[:, i])]] = True
+        return inside
+
+    def candidates(self, x_min, y_min, x_max, y_max):
+        """
+        Rectangles whose bounds meet the closed box, as (x_min, y_min, x_max, y_max, obstacle index).
+        """
+        found = []
+        stack = [(self.root, self.depth)]
+        while stack:
+            entries, depth = stack.pop()
+            for e in entries:
+                if e[0] <= x_max and e[2] >= x_min and e[1] <= y_max and e[3] >= y_min:
+                    if depth:
+                        stack.append((e[4], depth - 1))
+                    else:
+                        found.append(e)
+        return found
+
+    def point_inside(self, point):
+        """
+        Same answer as any(is_inside_obstacle(point, obstacle) for obstacle in obstacles).
+        """
+        x, y = point
+        return len(self.candidates(x, y, x, y)) > 0
+
+    def query_rect(self, rect):
+        """
+        Indices (into the original obstacle list) of the obstacles rect overlaps with positive area.
+        """
+        x, y, w, h = rect
+        return [e[4] for e in self.candidates(x, y, x + w, y + h)
+                if x < e[2] and x + w > e[0] and y < e[3] and y + h > e[1]]
+
+    def rect_hits(self, rect):
+        """
+        Same answer as any(DynamicObstacle.check_collision(rect, obstacle) for obstacle in obstacles):
+        True when rect overlaps an obstacle with positive area.
+        :param rect: tuple (x, y, width, height)
+        """
+        return len(self.query_rect(rect)) > 0
+
+    def segments_clear(self, starts, ends):
+        """
+        Checking a batch of segments, same answers as collision.ObstacleArray.segments_clear.
+        :param starts: array-like (K, 2), segment start points
+        :param ends: array-like (K, 2), segment end points
+        :return: boolean array (K,), True where the segment is clear
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        px, py = starts[:, 0], starts[:, 1]
+        qx, qy = ends[:, 0], ends[:, 1]
+
+        def overlaps(q, b):
+            return segment_box_overlap(px[q], py[q], qx[q], qy[q], b)
+
+        clear = np.ones(len(starts), dtype=bool)
+        if not len(self) or not len(starts):
+            return clear
+        q, i = self.traverse(len(starts), overlaps)
+        clear[q[self.rects.hits(px[q], py[q], qx[q], qy[q], self.bounds[:, i])]] = False
+        return clear
+
+    def segment_clear(self, start, end):
+        """
+        Checking if the path between start and end points is clear of obstacles. The segment's own
+        bounding box picks the candidates, which then get the exact slab test.
+        :param start: tuple (x, y), start point
+        :param end: tuple (x, y), end point
+        :return: boolean, True if path is clear, False otherwise
+        """
+        (px, py), (qx, qy) = start, end
+        found = self.candidates(min(px, qx), min(py, qy), max(px, qx), max(py, qy))
+        if not found:
+            return True
+        bounds = np.array(found, dtype=np.float64).T[:4]
+        return not self.rects.hits(px, py, qx, qy, bounds).any()
+
+if __name__ == "__main__":
+    # Linear scans against the tree for edge, point and rectangle queries at increasing map sizes
+    from rrt_planner import is_path_clear, is_inside_obstacle
+    from rrt_pygame_dyn import DynamicObstacle, obstacles as station
+
+    sizes = [int(a) for a in sys.argv[1:]] or [len(station), 1000, 100000]
+    rng = np.random.default_rng(0)
+    queries = 2000
+    check = DynamicObstacle(0, 0, 0, 0, 0, 0).check_collision
+    print("%8s %-10s %14s %14s %14s %9s" % ("obstacles", "query", "python (us)", "numpy (us)", "tree (us)", "build (ms)"))
+    for n in sizes:
+        # The station map itself, then uniformly scattered benches over a map scaled to keep the density
+        side = math.sqrt(n / len(station))
+        width, height = 800 * side, 600 * side
+        if n == len(station):
+            obstacles = station
+        else:
+            obstacles = [tuple(o) for o in np.column_stack([rng.random(n) * width, rng.random(n) * height,
+                                                            rng.uniform(5, 50, n), rng.uniform(5, 50, n)]).tolist()]
+        start_time = time.perf_counter()
+        tree = ObstacleTree(obstacles)
+        build = time.perf_counter() - start_time
+        array = ObstacleArray(obstacles)
+        # RRT-sized edges, points and person-sized rectangles
+        a = rng.random((queries, 2)) * (width, height)
+        b = a + rng.uniform(-20, 20, (queries, 2))
+        edges = list(zip(map(tuple, a.tolist()), map(tuple, b.tolist())))
+        points = edges
+        rects = [(x, y, 10, 10) for x, y in a.tolist()]
+        # The Python scans are sampled on large maps, they take seconds otherwise
+        sample = max(1, queries * 13 // max(n, 13))
+
+        def timed(fn, items):
+            start_time = time.perf_counter()
+            result = [fn(*item) for item in items]
+            return (time.perf_counter() - start_time) / len(items) * 1e6, result
+
+        t_py, ref = timed(lambda p, q: is_path_clear(p, q, obstacles), edges[:sample])
+        t_np, res_np = timed(array.segment_clear, edges)
+        t_tree, res = timed(tree.segment_clear, edges)
+        assert res[:sample] == ref and res == res_np
+        start_time = time.perf_counter()
+        batched = tree.segments_clear(a, b)
+        t_batch = (time.perf_counter() - start_time) / queries * 1e6
+        assert batched.tolist() == res
+        print("%8d %-10s %14.1f %14.1f %14.1f %9.1f" % (n, "edge", t_py, t_np, t_tree, build * 1e3))
+        print("%8d %-10s %14s %14s %14.2f" % (n, "edge batch", "-", "-", t_batch))
+
+        t_py, ref = timed(lambda p, q: any(is_inside_obstacle(p, o) for o in obstacles), points[:sample])
+        t_tree, res = timed(lambda p, q: tree.point_inside(p), points)
+        assert res[:sample] == ref
+        print("%8d %-10s %14.1f %14s %14.1f" % (n, "point", t_py, "-", t_tree))
+
+        t_py, ref = timed(lambda r: any(check(r, o) for o in obstacles), [(r,) for r in rects[:sample]])
+        t_tree, res = timed(tree.rect_hits, [(r,) for r in rects])
+        assert res[:sample] == ref
+        print("%8d %-10s %14.1f %14s %14.1f" % (n, "rect", t_py, "-", t_tree))
@@ -0,0 +1,162 @@
+import math
+
+import numpy as np
+
+import map_cache
+
+# Squared distance standing in for "no obstacle on this line", finite so the envelope maths never sees inf - inf
+far = 1e12
+
+def distance_transform_1d(f):
+    """
+    Squared Euclidean distance transform along the last axis (Felzenszwalb & Huttenlocher),
+    vectorized over the leading axis.
+    :param f: array (R, n), squared distances to an obstacle, 0 on obstacle cells
+    :return: array (R, n), min over k of (q - k)^2 + f[k]
+    """
+    rows, n = f.shape
+    r = np.arange(rows)
+    q_all = np.arange(n, dtype=np.float64)
+    k = np.zeros(rows, dtype=np.int64)
+    v = np.zeros((rows, n), dtype=np.int64)
+    z = np.empty((rows, n + 1))
+    z[:, 0] = -np.inf
+    z[:, 1] = np.inf
+
+    def intersection(q, vk):
+        return ((f[:, q] + q * q) - (f[r, vk] + vk * vk)) / (2.0 * q - 2.0 * vk)
+
+    # Building the lower envelope of the parabolas
+    for q in range(1, n):
+        s = intersection(q, v[r, k])
+        pop = s <= z[r, k]
+        while pop.any():
+            k[pop] -= 1
+            s = np.where(pop, intersection(q, v[r, k]), s)
+            pop = s <= z[r, k]
+        k += 1
+        v[r, k] = q
+        z[r, k] = s
+        z[r, k + 1] = np.inf
+
+    # Reading the envelope back
+    d = np.empty_like(f)
+    k[:] = 0
+    for q in range(n):
+        adv = z[r, k + 1] < q
+        while adv.any():
+            k[adv] += 1
+            adv = z[r, k + 1] < q
+        vk = v[r, k]
+        d[:, q] = (q_all[q] - vk) ** 2 + f[r, vk]
+    return d
+
+def distance_transform(occupied):
+    """
+    Euclidean distance, in cells, from every cell centre to the nearest occupied cell centre.
+    :param occupied: boolean array (rows, cols)
+    :return: float array (rows, cols)
+    """
+    f = np.where(occupied, 0.0, far)
+    f = distance_transform_1d(f.T).T
+    f = distance_transform_1d(f)
+    return np.sqrt(f)
+
+class OccupancyGrid:
+    """
+    Static obstacles rasterized once into an occupancy bitmap plus its Euclidean distance field.
+    Edge checks then only look up the distance field at points along the segment.
+
+    Checks are conservative: a cell is occupied if the obstacle covers any part of it, and a sample
+    only counts as clear when its distance beats margin plus the worst-case error from the cell size
+    and the spacing between samples. Unlike is_path_clear, segments inside an obstacle are blocked.
+
+    The distance field is cached on disk keyed by the map contents and resolution, so restarting a
+    planner on an unchanged station map skips the rebuild.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param width: float, map width
+    :param height: float, map height
+    :param resolution: float, side of a grid cell in map units
+    :param margin: float, clearance that must be kept from every obstacle
+    :param cache: bool, reading and writing the disk cache
+    """
+    def __init__(self, obstacles, width, height, resolution=1.0, margin=0.0, cache=True):
+        self.width = width
+        self.height = height
+        self.resolution = float(resolution)
+        self.margin = float(margin)
+        self.cols = int(math.ceil(width / self.resolution)) + 1
+        self.rows = int(math.ceil(height / self.resolution)) + 1
+        # Samples are spaced half a cell apart along every segment
+        self.sample_step = self.resolution / 2
+        self.threshold = self.margin + self.resolution * math.sqrt(2) + self.sample_step / 2
+        self.built = False
+
+        key = map_cache.map_key(obstacles, width, height, "occupancy", self.resolution)
+        path = map_cache.cache_path("occupancy", key)
+        data = map_cache.load_npz(path) if cache else None
+        if data is not None and data["distance"].shape == (self.rows, self.cols):
+            self.occupied = data["occupied"]
+            self.distance = data["distance"]
+        else:
+            self.occupied = self.rasterize(obstacles)
+            self.distance = (distance_transform(self.occupied) * self.resolution).astype(np.float32)
+            self.built = True
+            if cache:
+                map_cache.save_npz(path, occupied=self.occupied, distance=self.distance)
+
+    def rasterize(self, obstacles):
+        occupied = np.zeros((self.rows, self.cols), dtype=bool)
+        for x, y, w, h in obstacles:
+            x0, x1 = sorted((x, x + w))
+            y0, y1 = sorted((y, y + h))
+            c0 = max(int(math.floor(x0 / self.resolution)), 0)
+            c1 = min(int(math.floor(x1 / self.resolution)), self.cols - 1)
+            r0 = max(int(math.floor(y0 / self.resolution)), 0)
+            r1 = min(int(math.floor(y1 / self.resolution)), self.rows - 1)
+            if c0 <= c1 and r0 <= r1:
+                occupied[r0:r1 + 1, c0:c1 + 1] = True
+        return occupied
+
+    def clearance(self, xs, ys):
+        """
+        Looking up the distance field, in map units, at arrays of points.
+        """
+        c = np.clip((np.asarray(xs) / self.resolution).astype(np.int64), 0, self.cols - 1)
+        r = np.clip((np.asarray(ys) / self.resolution).astype(np.int64), 0, self.rows - 1)
+        return self.distance[r, c]
+
+    def point_clear(self, point):
+        return bool(self.clearance(point[0], point[1]) > self.threshold - self.sample_step / 2)
+
+    def segment_clear(self, start, end):
+        """
+        Checking if the path between start and end points keeps margin away from every obstacle.
+        :param start: tuple (x, y), start point
+        :param end: tuple (x, y), end point
+        :return: boolean, True if path is clear, False otherwise
+        """
+        length = math.hypot(end[0] - start[0], end[1] - start[1])
+        n = int(math.ceil(length / self.sample_step)) + 1
+        t = np.linspace(0.0, 1.0, n)
+        xs = start[0] + t * (end[0] - start[0])
+        ys = start[1] + t * (end[1] - start[1])
+        return bool((self.clearance(xs, ys) > self.threshold).all())
+
+    def segments_clear(self, starts, ends):
+        """
+        Checking a batch of segments at once.
+        :param starts: array-like (K, 2), segment start points
+        :param ends: array-like (K, 2), segment end points
+        :return: boolean array (K,), True where the segment is clear
+        """
+        starts = np.asarray(starts, dtype=np.float64).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=np.float64).reshape(-1, 2)
+        if not len(starts):
+            return np.ones(0, dtype=bool)
+        d = ends - starts
+        n = int(math.ceil(np.hypot(d[:, 0], d[:, 1]).max() / self.sample_step)) + 1
+        t = np.linspace(0.0, 1.0, n)
+        xs = starts[:, 0, None] + t * d[:, 0, None]
+        ys = starts[:, 1, None] + t * d[:, 1, None]
+        return (self.clearance(xs, ys) > self.threshold).all(axis=1)
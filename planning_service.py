@@ -0,0 +1,317 @@
+import argparse
+import asyncio
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from obstacle_tree import ObstacleTree
+from routing import RoutePlanner, timeout
+from station_map import load_map, maps_dir
+
+# Local route planning service for many wheelchair users at once, newline-delimited JSON over TCP
+# or a Unix socket. Requests on one connection may be pipelined; replies come back as they finish.
+#   request   {"id": 7, "start": [x, y], "goal": [x, y], "deadline": 0.5}     deadline in seconds, optional
+#   reply     {"id": 7, "status": "ok", "path": [[x, y], ...], "length": 812.4, "latency": 0.0031}
+# status is one of ok, no_path, timeout, invalid (an end point outside the free space) or error (a
+# malformed request, with a message).
+
+default_map = os.path.join(maps_dir, "platform.json")
+
+# Per-worker state, set once by init_worker when the process starts
+worker = {}
+
+def init_worker(map_path, samples):
+    # The roadmap comes from the map cache, which the service filled before starting the pool
+    worker["planner"] = RoutePlanner(load_map(map_path), samples=samples)
+
+def run_batch(queries, seed, planner=None):
+    # The worker's own planner unless one is handed in (in-process services). The roadmap query cache
+    # lives with the planner, so its hits travel back with the results
+    if planner is None:
+        planner = worker["planner"]
+    roadmap = planner.roadmap
+    hits = roadmap.hits
+    results = planner.plan_batch(queries, seed)
+    return results, roadmap.hits - hits
+
+class PlanningService:
+    """
+    asyncio front end over a pool of planning workers that each hold the station map, its R-tree and
+    its roadmap, loaded once. Requests arriving close together are coalesced into one batch (queued
+    requests are picked up together while every worker is busy, and the first request of a batch
+    waits up to batch_window for company), and each batch is one call to RoutePlanner.plan_batch on
+    a worker, so the hand-off cost is paid per batch rather than per request.
+    Call close() when done.
+    :param map_path: str, station map file, see station_map.load_map
+    :param workers: int, planning processes (defaults to the CPU count); 0 plans on one thread of
+        this process, sharing its planner
+    :param batch_window: float, seconds the first request of a batch waits for more
+    :param max_batch: int, most requests planned in one batch
+    :param samples: int, roadmap vertices
+    """
+    def __init__(self, map_path=default_map, workers=None, batch_window=0.002, max_batch=64, samples=1000):
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        # Built here first so the roadmap is on disk before any worker looks for it
+        self.planner = RoutePlanner(load_map(map_path), samples=samples)
+        if workers == 0:
+            # Handed to every batch, so in-process services never share a planner
+            self.local = self.planner
+            self.pool = ThreadPoolExecutor(max_workers=1)
+            self.workers = 1
+        else:
+            self.local = None
+            self.workers = workers or os.cpu_count() or 1
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=init_worker, initargs=(map_path, samples))
+        self.queue = None
+        self.slots = None
+        self.server = None
+        self.tasks = []
+        self.seed = 0
+        self.requests = self.batches = self.timeouts = self.roadmap_hits = 0
+
+    async def start(self, host="127.0.0.1", port=0, path=None):
+        """
+        Listening on a Unix socket at path, or on host and port (0 picks a free port).
+        :return: (host, port) or the socket path
+        """
+        self.queue = asyncio.Queue()
+        self.slots = asyncio.Semaphore(self.workers)
+        # Starting every worker now, so the first requests do not pay for it
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, run_batch, [], 0, self.local) for _ in range(self.workers)])
+        self.tasks.append(asyncio.create_task(self.batcher()))
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, path=path)
+            return path
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def plan(self, start, goal, deadline=None):
+        """
+        Queueing one query and waiting for its batch.
+        :param start: tuple (x, y), start point
+        :param goal: tuple (x, y), goal point
+        :param deadline: float or None, seconds the caller is willing to wait
+        :return: dict with status, path and length
+        """
+        self.requests += 1
+        stop_at = None if deadline is None else time.time() + deadline
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait(((tuple(start), tuple(goal), stop_at), future))
+        try:
+            # Shielded, so the batch still delivers to the other requests that share the route
+            return await asyncio.wait_for(asyncio.shield(future), deadline)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return {"status": timeout, "path": None, "length": None}
+
+    async def batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self.slots.acquire()
+            batch = [await self.queue.get()]
+            close_at = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                if self.queue.empty():
+                    remaining = close_at - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    batch.append(self.queue.get_nowait())
+            self.batches += 1
+            self.seed += 1
+            job = loop.run_in_executor(self.pool, run_batch, [query for query, _ in batch], self.seed,
+                                       self.local)
+            job.add_done_callback(lambda job, batch=batch: self.deliver(job, batch))
+
+    def deliver(self, job, batch):
+        self.slots.release()
+        error = "service shutting down" if job.cancelled() else job.exception()
+        if error is None:
+            results, hits = job.result()
+            self.roadmap_hits += hits
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                # A failed batch answers each of its requests with the error, the service keeps running
+                future.set_result({"status": "error", "message": str(error), "path": None, "length": None})
+            else:
+                future.set_result(results[i])
+
+    async def handle(self, reader, writer):
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                task = asyncio.create_task(self.reply(line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.wait(pending)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def reply(self, line, writer):
+        received = time.perf_counter()
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get("id")
+            start, goal = request["start"], request["goal"]
+            if len(start) != 2 or len(goal) != 2:
+                raise ValueError("start and goal must be [x, y]")
+            deadline = request.get("deadline")
+            result = await self.plan((float(start[0]), float(start[1])), (float(goal[0]), float(goal[1])),
+                                     None if deadline is None else float(deadline))
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            result = {"status": "error", "message": str(e), "path": None, "length": None}
+        result = dict(result, id=request_id, latency=time.perf_counter() - received)
+        if not writer.is_closing():
+            writer.write((json.dumps(result) + "\n").encode())
+
+    def stats(self):
+        return {"requests": self.requests, "batches": self.batches,
+                "mean_batch": self.requests / self.batches if self.batches else 0.0, "timeouts": self.timeouts,
+                "roadmap_hits": self.roadmap_hits}
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        for task in self.tasks:
+            task.cancel()
+        # Waiting for running batches off the event loop, so other services on it keep serving
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.pool.shutdown, wait=True, cancel_futures=True))
+
+def random_queries(station, n, destinations=8, seed=0):
+    """
+    Query mix for load tests: starts anywhere in the free space, goals among a few destinations
+    (exits, lifts, ...), the station's own goal first.
+    """
+    tree = ObstacleTree(station.obstacle_list())
+    rng = np.random.default_rng(seed)
+    points = []
+    while len(points) < n + destinations:
+        p = (float(rng.uniform(0, station.width)), float(rng.uniform(0, station.height)))
+        if not tree.point_inside(p):
+            points.append(p)
+    goals = [tuple(station.goal)] + points[n:n + destinations - 1]
+    return [(points[i], goals[int(rng.integers(len(goals)))]) for i in range(n)]
+
+async def load_test(queries, clients, host="127.0.0.1", port=None, path=None, deadline=None):
+    """
+    Closed-loop load: each client keeps one request in flight on its own connection.
+    :return: dict with throughput (requests per second), latency percentiles in seconds and status counts
+    """
+    latencies = []
+    statuses = {}
+
+    async def client(mine):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        for i, (start, goal) in mine:
+            request = {"id": i, "start": start, "goal": goal}
+            if deadline is not None:
+                request["deadline"] = deadline
+            sent = time.perf_counter()
+            writer.write((json.dumps(request) + "\n").encode())
+            reply = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - sent)
+            statuses[reply["status"]] = statuses.get(reply["status"], 0) + 1
+        writer.close()
+
+    numbered = list(enumerate(queries))
+    start_time = time.perf_counter()
+    await asyncio.gather(*[client(numbered[c::clients]) for c in range(clients)])
+    elapsed = time.perf_counter() - start_time
+    p = np.percentile(latencies, [50, 95, 99]) if latencies else [0.0] * 3
+    return {"requests": len(latencies), "seconds": elapsed, "throughput": len(latencies) / elapsed,
+            "p50": p[0], "p95": p[1], "p99": p[2], "max": max(latencies, default=0.0), "statuses": statuses}
+
+def print_load(name, result, stats=None):
+    print("%-12s %8d %10.0f %9.2f %9.2f %9.2f %9.2f %8s  %s" % (
+        name, result["requests"], result["throughput"], result["p50"] * 1e3, result["p95"] * 1e3,
+        result["p99"] * 1e3, result["max"] * 1e3, "%.1f" % stats["mean_batch"] if stats else "-",
+        " ".join("%s=%d" % kv for kv in sorted(result["statuses"].items()))))
+
+load_header = "%-12s %8s %10s %9s %9s %9s %9s %8s  %s" % ("run", "requests", "req/s", "p50 (ms)", "p95 (ms)",
+                                                          "p99 (ms)", "max (ms)", "batch", "statuses")
+
+async def serve(args):
+    service = PlanningService(args.map, workers=args.workers, batch_window=args.batch_window / 1e3,
+                              max_batch=args.max_batch, samples=args.samples)
+    address = await service.start(args.host, args.port, args.unix)
+    print("Planning service on", address, "with", service.workers, "workers")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await service.close()
+
+async def load(args):
+    queries = random_queries(load_map(args.map), args.requests, seed=args.seed)
+    result = await load_test(queries, args.clients, args.host, args.port, args.unix, args.deadline)
+    print(load_header)
+    print_load("load", result)
+
+async def bench(args):
+    # Batched service against one request per batch, same workers and query mix, over a Unix socket
+    queries = random_queries(load_map(args.map), args.requests, seed=args.seed)
+    print(load_header)
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, window, max_batch in (("unbatched", 0.0, 1), ("batched", args.batch_window / 1e3, args.max_batch)):
+            service = PlanningService(args.map, workers=args.workers, batch_window=window, max_batch=max_batch,
+                                      samples=args.samples)
+            path = await service.start(path=os.path.join(tmp, "%s.sock" % name))
+            try:
+                await load_test(queries[:args.clients], args.clients, path=path)  # warm up
+                service.requests = service.batches = 0
+                result = await load_test(queries, args.clients, path=path, deadline=args.deadline)
+                print_load(name, result, service.stats())
+            finally:
+                await service.close()
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Route planning service for many concurrent users")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "load", "bench"):
+        command = commands.add_parser(name)
+        command.add_argument("--map", default=os.environ.get("STATION_MAP") or default_map, help="station map file")
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=8765)
+        command.add_argument("--unix", default=None, help="Unix socket path, instead of TCP")
+        if name in ("serve", "bench"):
+            command.add_argument("--workers", type=int, default=None, help="planning processes, 0 for in-process")
+            command.add_argument("--batch-window", type=float, default=2.0, help="ms a batch waits to fill up")
+            command.add_argument("--max-batch", type=int, default=64)
+            command.add_argument("--samples", type=int, default=1000, help="roadmap vertices")
+        if name in ("load", "bench"):
+            command.add_argument("--clients", type=int, default=64, help="concurrent connections")
+            command.add_argument("--requests", type=int, default=5000)
+            command.add_argument("--deadline", type=float, default=None, help="per-request deadline in seconds")
+            command.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    asyncio.run({"serve": serve, "load": load, "bench": bench}[args.command](args))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,177 @@
+import math
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from collision import ObstacleArray
+from rrt_connect import RRTConnectPlanner
+from rrt_planner import Node, RRTPlanner, extract_path
+from rrt_star import RRTStarPlanner
+
+planner_classes = {
+    "rrt": RRTPlanner,
+    "rrt-connect": RRTConnectPlanner,
+    "rrt-star": RRTStarPlanner,
+}
+
+# Per-worker state, set once by init_worker when the process starts
+worker = {}
+
+def init_worker(shm_name, shape, width, height, generation):
+    # Attaching to the parent's obstacle bounds: every worker reads the same pages, nothing is copied
+    shm = shared_memory.SharedMemory(name=shm_name)
+    bounds = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    bounds.flags.writeable = False
+    worker.update(shm=shm, obstacles=ObstacleArray.from_bounds(bounds), width=width, height=height,
+                  generation=generation)
+
+def obstacle_list():
+    # Rectangles rebuilt from the shared bounds, once per worker and only for the options that need them
+    if "obstacle_list" not in worker:
+        x_min, y_min, x_max, y_max = worker["obstacles"].bounds.tolist()
+        worker["obstacle_list"] = [(x, y, x1 - x, y1 - y) for x, y, x1, y1 in zip(x_min, y_min, x_max, y_max)]
+    return worker["obstacle_list"]
+
+def path_length(path):
+    return sum(math.dist(a, b) for a, b in zip(path, path[1:]))
+
+def run_worker(kind, start, goal, seed, generation, deadline, options):
+    """
+    Running one seeded planner until it finds a path, the deadline passes or the portfolio moves on
+    to another query (the shared generation counter changes).
+    """
+    shared = worker["generation"]
+
+    def on_iteration(planner):
+        return shared.value == generation and time.time() < deadline
+
+    # Planners only check edges, which the shared bounds answer. Footprints and samplers built by
+    # name work on the obstacle rectangles themselves, and a footprint brings its own inflated R-tree
+    obstacles = collision = worker["obstacles"]
+    if options.get("footprint") is not None:
+        obstacles, collision = obstacle_list(), "rtree"
+    elif isinstance(options.get("sampler"), str):
+        obstacles = obstacle_list()
+    planner = planner_classes[kind](obstacles, worker["width"], worker["height"], collision=collision,
+                                    seed=seed, **options)
+    start_time = time.perf_counter()
+    if kind == "rrt-star":
+        newnode = planner.plan(Node(*start), Node(*goal), time_budget=max(0.0, deadline - time.time()),
+                               on_iteration=on_iteration)
+    else:
+        newnode = planner.plan(Node(*start), Node(*goal), on_iteration=on_iteration)
+    path = extract_path(newnode) if newnode is not None else None
+    return {
+        "seed": seed,
+        "pid": os.getpid(),
+        "path": path,
+        "length": path_length(path) if path else None,
+        "time": time.perf_counter() - start_time,
+        "iterations": planner.iterations,
+    }
+
+class Portfolio:
+    """
+    Portfolio planning over a process pool: N independently seeded planners race on the same query
+    and the first solution (or the shortest one found before the deadline) wins, after which the
+    rest are told to stop. The obstacle bounds are placed once in shared memory and every worker
+    maps the same buffer, so the map is not copied per worker or per query.
+    Use as a context manager, or call close() when done.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param width: float, map width
+    :param height: float, map height
+    :param workers: int, processes in the pool (defaults to the CPU count)
+    """
+    def __init__(self, obstacles, width, height, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        bounds = ObstacleArray(obstacles).bounds
+        self.shm = shared_memory.SharedMemory(create=True, size=max(bounds.nbytes, 1))
+        np.ndarray(bounds.shape, dtype=np.float64, buffer=self.shm.buf)[:] = bounds
+        ctx = multiprocessing.get_context("spawn")
+        self.generation = ctx.Value("q", 0, lock=False)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=init_worker,
+                                        initargs=(self.shm.name, bounds.shape, width, height, self.generation))
+        self.seed = 0
+
+    def plan(self, start, goal, kind="rrt", mode="first", deadline=5.0, seeds=None, **options):
+        """
+        Racing one planner per worker on a query.
+        :param start: tuple (x, y), start point
+        :param goal: tuple (x, y), goal point
+        :param kind: str, planner to run, one of planner_classes
+        :param mode: str, "first" returns the first path found, "best" the shortest found before the deadline
+        :param deadline: float, seconds before every worker is stopped
+        :param seeds: list of int or None, one seed per planner (defaults to fresh seeds)
+        :param options: extra planner arguments (stepSize, FinalProx, batch_size, ...)
+        :return: dict with the winning path, its length and seed, or None if no worker found a path
+        """
+        if mode not in ("first", "best"):
+            raise ValueError("Unknown portfolio mode: %r (expected 'first' or 'best')" % (mode,))
+        if seeds is None:
+            seeds = list(range(self.seed, self.seed + self.workers))
+            self.seed += self.workers
+        self.generation.value += 1
+        generation = self.generation.value
+        stop_at = time.time() + deadline
+
+        futures = [self.pool.submit(run_worker, kind, tuple(start), tuple(goal), seed, generation, stop_at, options)
+                   for seed in seeds]
+        best = None
+        pending = set(futures)
+        try:
+            while pending:
+                done, pending = wait(pending, timeout=max(0.0, stop_at - time.time()) + 0.5,
+                                     return_when=FIRST_COMPLETED)
+                for f in done:
+                    result = f.result()
+                    if result["path"] is not None and (best is None or result["length"] < best["length"]):
+                        best = result
+                if best is not None and mode == "first":
+                    break
+                if not done:
+                    break
+        finally:
+            # Cancelling the rest, also when a worker failed: queued planners never start, running
+            # ones stop at their next iteration
+            self.generation.value += 1
+            for f in pending:
+                f.cancel()
+        return best
+
+    def close(self):
+        self.generation.value += 1
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+if __name__ == "__main__":
+    # Time-to-first-path percentiles against worker count on the bench-and-pillar map
+    from rrt_pygame import obstacles, width, height, station
+
+    queries = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    cpus = os.cpu_count() or 1
+    counts = sorted({n for n in (1, 2, 4, 8, 16, 32, 64) if n <= cpus} | {cpus})
+    print("%8s %10s %10s %10s %10s" % ("workers", "p50 (s)", "p95 (s)", "p99 (s)", "success"))
+    for n in counts:
+        with Portfolio(obstacles, width, height, workers=n) as portfolio:
+            portfolio.plan(station.start, station.goal)  # warm the pool up
+            latencies = []
+            found = 0
+            for q in range(queries):
+                start_time = time.perf_counter()
+                result = portfolio.plan(station.start, station.goal, seeds=[q * 1000 + i for i in range(n)])
+                latencies.append(time.perf_counter() - start_time)
+                found += result is not None
+        p = np.percentile(latencies, [50, 95, 99])
+        print("%8d %10.4f %10.4f %10.4f %9.0f%%" % (n, p[0], p[1], p[2], found / queries * 100))
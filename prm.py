@@ -0,0 +1,260 @@
+import heapq
+import math
+import sys
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import map_cache
+from obstacle_tree import ObstacleTree
+from rrt_planner import is_path_clear, make_checker
+
+class Roadmap:
+    """
+    Multi-query probabilistic roadmap (PRM) over the static map. Free-space samples are linked to
+    their nearest neighbours by collision-free straight edges once; every start/goal query then only
+    links its two end points into the graph and runs A* over it. The graph is saved to the map cache
+    keyed by the map contents and the roadmap settings, so it is rebuilt only when the map changes,
+    and answered queries are kept in a bounded LRU cache.
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param width: float, map width
+    :param height: float, map height
+    :param samples: int, roadmap vertices
+    :param neighbours: int, nearest vertices each vertex (and each query end point) tries to link to
+    :param radius: float, longest roadmap edge
+    :param seed: int, seeds the sampling so the same settings always give the same roadmap
+    :param collision: static obstacle backend for edge checks, see rrt_planner.make_checker
+    :param cache: bool, reading and writing the disk cache (never used with a checker object)
+    :param query_cache: int, answered queries kept in memory
+    """
+    def __init__(self, obstacles, width, height, samples=1000, neighbours=10, radius=100, seed=0,
+                 collision="rtree", cache=True, query_cache=1024):
+        self.obstacles = obstacles
+        self.width = width
+        self.height = height
+        self.neighbours = neighbours
+        self.radius = radius
+        self.tree = ObstacleTree(obstacles)
+        self.checker = self.tree if collision == "rtree" else make_checker(collision, obstacles, width, height)
+        self.queries = OrderedDict()
+        self.query_cache = query_cache
+        self.hits = self.misses = 0
+        self.built = False
+
+        # Edges depend on the backend too (a grid is conservative), and a checker object could have
+        # been built over anything, so only named backends go to the disk cache
+        if not isinstance(collision, str):
+            cache = False
+        key = map_cache.map_key(obstacles, width, height, "prm", samples, neighbours, radius, seed, collision)
+        path = map_cache.cache_path("prm", key)
+        data = map_cache.load_npz(path) if cache else None
+        if data is None:
+            data = self.build(samples, seed)
+            self.built = True
+            if cache:
+                map_cache.save_npz(path, **data)
+        self.points = data["points"]
+        self.offsets = data["offsets"]
+        self.targets = data["targets"]
+        self.weights = data["weights"]
+
+        # Adjacency as plain lists for the search loop, which walks it one vertex at a time
+        offsets = self.offsets.tolist()
+        targets = self.targets.tolist()
+        weights = self.weights.tolist()
+        self.adjacency = [list(zip(targets[a:b], weights[a:b])) for a, b in zip(offsets, offsets[1:])]
+        self.coords = [tuple(p) for p in self.points.tolist()]
+
+    def __len__(self):
+        return len(self.points)
+
+    def path_clear(self, start, end):
+        if self.checker is not None:
+            return self.checker.segment_clear(start, end)
+        return is_path_clear(start, end, self.obstacles)
+
+    def paths_clear(self, starts, ends):
+        if hasattr(self.checker, "segments_clear"):
+            return self.checker.segments_clear(starts, ends)
+        return np.array([self.path_clear(a, b) for a, b in zip(starts.tolist(), ends.tolist())], dtype=bool)
+
+    def nearest_vertices(self, points, k):
+        """
+        Indices of the k nearest roadmap vertices of every point, closest first, and their distances.
+        """
+        n = len(self.points)
+        k = min(k, n)
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        order = np.empty((len(points), k), dtype=np.int64)
+        dist = np.empty((len(points), k))
+        step = max(1, (1 << 21) // max(n, 1))
+        for i in range(0, len(points), step):
+            d = np.hypot(points[i:i + step, None, 0] - self.points[None, :, 0],
+                         points[i:i + step, None, 1] - self.points[None, :, 1])
+            part = np.argpartition(d, k - 1, axis=1)[:, :k] if k < n else np.broadcast_to(np.arange(n), d.shape)
+            part_d = np.take_along_axis(d, part, axis=1)
+            by_dist = np.argsort(part_d, axis=1, kind="stable")
+            order[i:i + step] = np.take_along_axis(part, by_dist, axis=1)
+            dist[i:i + step] = np.take_along_axis(part_d, by_dist, axis=1)
+        return order, dist
+
+    def build(self, samples, seed):
+        """
+        Sampling free space and linking every vertex to its nearest neighbours with clear edges.
+        :return: dict of arrays, vertices and the edges in compressed sparse row form
+        """
+        rng = np.random.default_rng(seed)
+        blocks = []
+        found = 0
+        while found < samples:
+            block = rng.random((samples, 2)) * (self.width, self.height)
+            block = block[~self.tree.points_inside(block)]
+            blocks.append(block)
+            found += len(block)
+        self.points = np.concatenate(blocks)[:samples]
+
+        # Candidate edges: each vertex to its nearest neighbours within radius, both directions merged
+        order, dist = self.nearest_vertices(self.points, self.neighbours + 1)
+        src = np.repeat(np.arange(samples), order.shape[1])
+        dst = order.ravel()
+        length = dist.ravel()
+        keep = (src != dst) & (length <= self.radius)
+        src, dst, length = src[keep], dst[keep], length[keep]
+        pairs = np.unique(np.stack([np.minimum(src, dst), np.maximum(src, dst)], axis=1), axis=0)
+        a, b = pairs[:, 0], pairs[:, 1]
+        clear = self.paths_clear(self.points[a], self.points[b])
+        a, b = a[clear], b[clear]
+
+        # Compressed sparse row adjacency, every edge stored in both directions
+        src = np.concatenate([a, b])
+        dst = np.concatenate([b, a])
+        by_src = np.argsort(src, kind="stable")
+        src, dst = src[by_src], dst[by_src]
+        offsets = np.zeros(samples + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=samples), out=offsets[1:])
+        weights = np.hypot(*(self.points[dst] - self.points[src]).T)
+        return {"points": self.points, "offsets": offsets, "targets": dst, "weights": weights}
+
+    def links(self, point):
+        """
+        Roadmap vertices a query end point can reach in a straight line, as (vertex, distance) pairs.
+        Tries the nearest neighbours within radius first and widens to the whole roadmap only when
+        none of them is reachable.
+        """
+        order, dist = self.nearest_vertices([point], len(self.points))
+        order, dist = order[0], dist[0]
+        near = min(self.neighbours, max(1, int(np.searchsorted(dist, self.radius, side="right"))))
+        for tried in (slice(0, near), slice(near, None)):
+            targets = order[tried]
+            if not len(targets):
+                continue
+            clear = self.paths_clear(np.tile(np.asarray(point, dtype=np.float64), (len(targets), 1)),
+                                     self.points[targets])
+            if clear.any():
+                return list(zip(targets[clear].tolist(), dist[tried][clear].tolist()))
+        return []
+
+    def search(self, start_links, goal_links, goal):
+        """
+        A* from the start links to the goal links over the roadmap.
+        :return: list of vertex indices from a start link to a goal link, or None
+        """
+        coords = self.coords
+        gx, gy = goal
+        finish = dict(goal_links)
+        cost = {}
+        parent = {}
+        heap = []
+        for v, d in start_links:
+            if d < cost.get(v, math.inf):
+                cost[v] = d
+                parent[v] = None
+                heapq.heappush(heap, (d + math.hypot(coords[v][0] - gx, coords[v][1] - gy), d, v))
+        best, best_v = math.inf, None
+        while heap:
+            f, g, v = heapq.heappop(heap)
+            if f >= best:
+                break
+            if g > cost[v]:
+                continue
+            if v in finish and g + finish[v] < best:
+                best, best_v = g + finish[v], v
+            for u, w in self.adjacency[v]:
+                c = g + w
+                if c < cost.get(u, math.inf):
+                    cost[u] = c
+                    parent[u] = v
+                    heapq.heappush(heap, (c + math.hypot(coords[u][0] - gx, coords[u][1] - gy), c, u))
+        if best_v is None:
+            return None
+        route = []
+        v = best_v
+        while v is not None:
+            route.append(v)
+            v = parent[v]
+        route.reverse()
+        return route
+
+    def query(self, start, goal):
+        """
+        Shortest roadmap path between two points, served from the query cache when it was asked before.
+        :param start: tuple (x, y), start point
+        :param goal: tuple (x, y), goal point
+        :return: list of tuples (x, y) from start to goal, or None if the roadmap does not connect them
+        """
+        key = (tuple(start), tuple(goal))
+        if key in self.queries:
+            self.hits += 1
+            self.queries.move_to_end(key)
+            path = self.queries[key]
+            return list(path) if path is not None else None
+        self.misses += 1
+
+        if self.path_clear(start, goal):
+            path = [key[0], key[1]]
+        else:
+            route = self.search(self.links(start), self.links(goal), goal) if len(self.points) else None
+            path = None if route is None else [key[0]] + [self.coords[v] for v in route] + [key[1]]
+
+        self.queries[key] = path
+        if len(self.queries) > self.query_cache:
+            self.queries.popitem(last=False)
+        return list(path) if path is not None else None
+
+    def edges(self):
+        """
+        Every roadmap edge once, as an (E, 2, 2) array of end points, for drawing.
+        """
+        src = np.repeat(np.arange(len(self.points)), np.diff(self.offsets))
+        once = src < self.targets
+        return np.stack([self.points[src[once]], self.points[self.targets[once]]], axis=1)
+
+if __name__ == "__main__":
+    # Roadmap build (cold and from the disk cache) and query latency against RRT from scratch
+    from rrt_pygame import obstacles, width, height, station
+    from rrt_planner import Node, RRTPlanner
+
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    start_time = time.perf_counter()
+    roadmap = Roadmap(obstacles, width, height, samples=samples, cache=False)
+    print("Roadmap build      : %8.1f ms, %d vertices, %d edges" % (
+        (time.perf_counter() - start_time) * 1e3, len(roadmap), len(roadmap.targets) // 2))
+    Roadmap(obstacles, width, height, samples=samples)
+    start_time = time.perf_counter()
+    roadmap = Roadmap(obstacles, width, height, samples=samples)
+    print("Roadmap from cache : %8.1f ms (rebuilt: %s)" % ((time.perf_counter() - start_time) * 1e3, roadmap.built))
+
+    rng = np.random.default_rng(1)
+    free = roadmap.points[rng.choice(len(roadmap), 100, replace=False)]
+    queries = [(station.start, station.goal)] + [(tuple(a), tuple(b)) for a, b in zip(free[:50].tolist(), free[50:].tolist())]
+    for label in ("first query", "repeated query"):
+        start_time = time.perf_counter()
+        found = sum(roadmap.query(s, g) is not None for s, g in queries)
+        elapsed = (time.perf_counter() - start_time) / len(queries)
+        print("PRM %-14s : %8.3f ms/query, %d/%d found" % (label, elapsed * 1e3, found, len(queries)))
+
+    start_time = time.perf_counter()
+    for seed in range(10):
+        RRTPlanner(obstacles, width, height, seed=seed).plan(Node(*station.start), Node(*station.goal))
+    print("RRT from scratch   : %8.3f ms/query" % ((time.perf_counter() - start_time) / 10 * 1e3))
@@ -0,0 +1,181 @@
+import random
+import sys
+import time
+
+from nn_index import make_index
+from rrt_planner import Node, RRTPlanner, distance
+from tree_store import TreeStore
+
+class DynamicReplanner:
+    """
+    DRRT-style incremental replanning. The tree is kept between frames; on every replan only the
+    nodes near a moving person are re-validated, the ones that now collide are removed, and each
+    subtree cut off by a removal tries to reattach to a surviving neighbour before it is given up.
+    The planner then regrows only as much as it needs to reach the goal again.
+    :param planner: RRTPlanner, supplies the collision backend, index kind, stepSize and FinalProx
+    :param start: Node, root of the tree
+    :param goal: Node, goal position
+    :param node_valid: callable (parent, node) -> bool, the dynamic check, e.g. no person collides with node
+    :param check_radius: float, nodes within this distance of a person are re-validated every frame;
+        must cover everything node_valid can reject (add stepSize / 2 if node_valid also checks the edge)
+    :param repair_radius: float, how far a cut-off subtree looks for a new parent (defaults to 2 * stepSize)
+    """
+    def __init__(self, planner, start, goal, node_valid, check_radius=10, repair_radius=None):
+        self.planner = planner
+        self.start = start
+        self.goal = goal
+        self.node_valid = node_valid
+        self.check_radius = check_radius
+        self.repair_radius = repair_radius if repair_radius is not None else 2 * planner.stepSize
+        self.stats = {}
+        planner.reset(start)
+
+    def invalidate(self, people):
+        """
+        Finding tree nodes that collide with people right now.
+        :return: set of Nodes (TreeNode handles with tree="array")
+        """
+        invalid = set()
+        for person in people:
+            # planner.near hands out TreeNode handles with tree="array", so both storages look alike here
+            for n in self.planner.near(person, self.check_radius):
+                if n.parent is not None and n not in invalid and not self.node_valid(n.parent, n):
+                    invalid.add(n)
+        return invalid
+
+    def repair(self, invalid):
+        """
+        Removing invalid nodes and reattaching or dropping the subtrees below them.
+        :return: tuple (orphaned, repaired, dropped) node counts
+        """
+        planner = self.planner
+        children = {}
+        for n in planner.nodes:
+            if n.parent is not None:
+                children.setdefault(n.parent, []).append(n)
+
+        # Everything below an invalid node, parents before children
+        orphans = []
+        cut = set(invalid)
+        queue = [c for n in invalid for c in children.get(n, ()) if c not in invalid]
+        while queue:
+            n = queue.pop(0)
+            if n in cut:
+                continue
+            cut.add(n)
+            orphans.append(n)
+            queue.extend(c for c in children.get(n, ()) if c not in invalid)
+
+        # Rebuilding the storage from the survivors, parents before children. With tree="array" the
+        # vertices move to a fresh TreeStore, so moved maps every old vertex to its new handle
+        kept = [n for n in planner.nodes if n not in cut]
+        array = isinstance(planner.nodes, TreeStore)
+        planner.nodes = TreeStore() if array else []
+        planner.index = make_index(planner.index_kind)
+        moved = {}
+
+        def store(n, parent):
+            if array:
+                v = Node(n.x, n.y)
+                v.parent = parent
+                moved[n] = planner.add_node(v)
+            else:
+                n.parent = parent
+                moved[n] = planner.add_node(n)
+
+        for n in kept:
+            store(n, None if n.parent is None else moved[n.parent])
+
+        repaired = dropped = 0
+        connected = set()
+        for n in orphans:
+            if n.parent in connected:
+                # Its parent was reattached and the edge between them has not changed
+                store(n, moved[n.parent])
+                connected.add(n)
+                continue
+            parent = None
+            candidates = planner.near(n, self.repair_radius)
+            candidates.sort(key=lambda c: distance(c, n))
+            for c in candidates:
+                if planner.path_clear((c.x, c.y), (n.x, n.y)) and self.node_valid(c, n):
+                    parent = c
+                    break
+            if parent is None:
+                if not array:
+                    n.parent = None
+                dropped += 1
+                continue
+            store(n, parent)
+            connected.add(n)
+            repaired += 1
+        return len(orphans), repaired, dropped
+
+    def replan(self, people, max_iterations=None, on_edge=None, on_iteration=None):
+        """
+        Bringing the tree up to date with the current positions of people and reaching the goal again.
+        Per-replan counters are left in self.stats.
+        :param people: iterable of objects with x and y, the moving obstacles
+        :return: Node within FinalProx of goal, or None if the goal was not reached
+        """
+        planner = self.planner
+        before = len(planner.nodes)
+        invalid = self.invalidate(people)
+        orphaned = repaired = dropped = 0
+        if invalid:
+            orphaned, repaired, dropped = self.repair(invalid)
+        reused = len(planner.nodes)
+
+        newnode = None
+        for n in planner.nodes:
+            if distance(n, self.goal) < planner.FinalProx:
+                newnode = n
+                break
+        iterations = planner.iterations
+        if newnode is None:
+            newnode = planner.grow(self.goal, max_iterations, self.node_valid, on_edge, on_iteration)
+
+        self.stats = {
+            "nodes_before": before,
+            "invalidated": len(invalid),
+            "orphaned": orphaned,
+            "repaired": repaired,
+            "dropped": dropped,
+            "reused": reused,
+            "grown": len(planner.nodes) - reused,
+            "iterations": planner.iterations - iterations,
+            "reached": newnode is not None,
+        }
+        return newnode
+
+if __name__ == "__main__":
+    # Replanning every frame on the dynamic station map, headless: reused tree against planning from scratch
+    import rrt_pygame_dyn as m
+
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    random.seed(0)
+    people = [m.Person() for _ in range(int(sys.argv[2]) if len(sys.argv) > 2 else 60)]
+
+    def node_valid(parent, n):
+        return not any(person.collides((n.x, n.y, 5, 5)) for person in people)
+
+    replanner = DynamicReplanner(RRTPlanner(m.obstacles, m.width, m.height, seed=0), Node(*m.station.start), Node(*m.station.goal),
+                                 node_valid)
+    scratch = RRTPlanner(m.obstacles, m.width, m.height, seed=0)
+    incremental_time = scratch_time = 0.0
+    reused = 0
+    for frame in range(frames):
+        for person in people:
+            person.move()
+        start_time = time.perf_counter()
+        replanner.replan(people)
+        incremental_time += time.perf_counter() - start_time
+        reused += replanner.stats["reused"]
+
+        start_time = time.perf_counter()
+        scratch.plan(Node(*m.station.start), Node(*m.station.goal), node_valid=node_valid)
+        scratch_time += time.perf_counter() - start_time
+
+    print("Frames : ", frames, " people : ", len(people))
+    print("Incremental replan : %.2f ms/frame, %.0f nodes reused/frame" % (incremental_time / frames * 1e3, reused / frames))
+    print("Replan from scratch : %.2f ms/frame" % (scratch_time / frames * 1e3))
@@ -0,0 +1,104 @@
+import math
+import time
+
+from prm import Roadmap
+from rrt_planner import Node, RRTPlanner, extract_path
+
+# Outcome of a route query
+ok = "ok"
+no_path = "no_path"
+timeout = "timeout"
+invalid = "invalid"
+
+def path_length(path):
+    return sum(math.dist(a, b) for a, b in zip(path, path[1:]))
+
+class RoutePlanner:
+    """
+    Route queries against one loaded station map, for callers that are not the pygame scripts
+    (the planning service, batch jobs, ...). The obstacle R-tree and the roadmap are built once
+    and shared by every query: a query is answered by a straight line when that is clear, by the
+    roadmap otherwise, and by an RRT run as a last resort when the roadmap does not connect the
+    two points.
+    :param station: station_map.StationMap
+    :param samples: int, roadmap vertices, see prm.Roadmap
+    :param fallback: bool, running an RRT when the roadmap has no route
+    :param max_iterations: int, samples the fallback RRT draws before giving up
+    """
+    def __init__(self, station, samples=1000, fallback=True, max_iterations=20000):
+        self.station = station
+        self.obstacles = station.obstacle_list()
+        self.width, self.height = float(station.width), float(station.height)
+        self.roadmap = Roadmap(self.obstacles, self.width, self.height, samples=samples)
+        self.tree = self.roadmap.tree
+        self.fallback = fallback
+        self.max_iterations = max_iterations
+
+    def valid(self, point):
+        x, y = point
+        return 0 <= x <= self.width and 0 <= y <= self.height and not self.tree.point_inside((x, y))
+
+    def plan(self, start, goal, deadline=None, seed=0):
+        """
+        Answering one query, see plan_batch.
+        """
+        return self.plan_batch([(start, goal, deadline)], seed)[0]
+
+    def plan_batch(self, queries, seed=0):
+        """
+        Answering many queries at once. Queries asking for the same route are planned once, and the
+        straight-line test of every query is one vectorized R-tree check.
+        :param queries: list of tuples (start, goal, deadline), deadline a time.time() value or None
+        :param seed: int, seeds the fallback RRT
+        :return: list of dicts with status (ok, no_path, timeout or invalid), path and length, one per query
+        """
+        results = [None] * len(queries)
+        routes = {}
+        for i, (start, goal, deadline) in enumerate(queries):
+            if not (self.valid(start) and self.valid(goal)):
+                results[i] = {"status": invalid, "path": None, "length": None}
+            else:
+                key = ((float(start[0]), float(start[1])), (float(goal[0]), float(goal[1])))
+                routes.setdefault(key, []).append(i)
+        if not routes:
+            return results
+
+        keys = list(routes)
+        direct = self.tree.segments_clear([k[0] for k in keys], [k[1] for k in keys])
+        for key, clear in zip(keys, direct.tolist()):
+            waiting = routes[key]
+            # The route has to be ready by the most patient of the queries asking for it
+            deadlines = [queries[i][2] for i in waiting]
+            deadline = None if None in deadlines else max(deadlines)
+            if deadline is not None and time.time() >= deadline:
+                # Everyone asking has given up by now; the rest of the batch gets the time instead
+                path = None
+            elif clear:
+                path = [key[0], key[1]]
+            else:
+                path = self.roadmap.query(*key)
+                if path is None and self.fallback:
+                    path = self.plan_rrt(key[0], key[1], deadline, seed)
+            for i in waiting:
+                if path is not None:
+                    results[i] = {"status": ok, "path": list(path), "length": path_length(path)}
+                elif queries[i][2] is not None and time.time() >= queries[i][2]:
+                    results[i] = {"status": timeout, "path": None, "length": None}
+                else:
+                    results[i] = {"status": no_path, "path": None, "length": None}
+        return results
+
+    def plan_rrt(self, start, goal, deadline, seed):
+        def on_iteration(planner):
+            return deadline is None or time.time() < deadline
+
+        planner = RRTPlanner(self.obstacles, self.width, self.height, collision=self.tree, seed=seed)
+        newnode = planner.plan(Node(*start), Node(*goal), max_iterations=self.max_iterations,
+                               on_iteration=on_iteration)
+        if newnode is None:
+            return None
+        path = extract_path(newnode)
+        # The tree stops within FinalProx of the goal; finishing on the goal itself where that is clear
+        if path[-1] != tuple(goal) and self.tree.segment_clear(path[-1], goal):
+            path.append(tuple(goal))
+        return path
@@ -0,0 +1,112 @@
+from nn_index import make_index
+from rrt_planner import Node, RRTPlanner, step_from_to
+
+# Results of extending a tree towards a target
+TRAPPED, ADVANCED, REACHED = 0, 1, 2
+
+class Tree:
+    def __init__(self, root, index_kind):
+        self.root = root
+        self.nodes = []
+        self.index = make_index(index_kind)
+        self.add_node(root)
+
+    def add_node(self, n):
+        self.nodes.append(n)
+        self.index.insert(n.x, n.y, n)
+
+    def nearest(self, target):
+        return self.index.nearest(target.x, target.y)
+
+class RRTConnectPlanner(RRTPlanner):
+    """
+    Bidirectional RRT-Connect (Kuffner & LaValle). One tree grows from start and one from goal;
+    each iteration extends one tree a single step towards a random sample, then greedily steps the
+    other tree towards the new node until it is reached or blocked, and the trees swap roles.
+    Takes the same arguments as RRTPlanner.
+    """
+    def extend(self, tree, target, node_valid, on_edge):
+        nn = tree.nearest(target)
+        newnode = step_from_to(nn, target, self.stepSize)
+        reached = newnode is target
+        if reached:
+            # step_from_to hands back the target itself, which may belong to the other tree
+            newnode = Node(target.x, target.y)
+
+        # Checking if the path between the nearest node and the new node is clear
+        if not self.path_clear((nn.x, nn.y), (newnode.x, newnode.y)):
+            return TRAPPED, None
+        if node_valid is not None and not node_valid(nn, newnode):
+            return TRAPPED, None
+
+        newnode.parent = nn
+        tree.add_node(newnode)
+        self.nodes.append(newnode)
+        self.index.insert(newnode.x, newnode.y, newnode)
+        if on_edge is not None:
+            on_edge(nn, newnode)
+        return (REACHED if reached else ADVANCED), newnode
+
+    def connect(self, tree, target, node_valid, on_edge):
+        while True:
+            status, newnode = self.extend(tree, target, node_valid, on_edge)
+            if status != ADVANCED:
+                return status, newnode
+
+    def join(self, start_side, goal_side):
+        """
+        Building one parent chain from start to goal out of the two meeting branches. The goal
+        tree's branch is copied with its links reversed, so the returned Node walks back to start.
+        """
+        n = start_side
+        other = goal_side
+        while other is not None:
+            step = Node(other.x, other.y)
+            step.parent = n
+            n = step
+            other = other.parent
+        return n
+
+    def plan(self, start, goal, max_iterations=None, node_valid=None, on_edge=None, on_iteration=None):
+        """
+        Growing trees from start and goal until they connect.
+        :return: Node at goal whose parent chain leads back to start, or None if planning stopped first
+        """
+        if self.instrument is not None:
+            node_valid, on_edge, on_iteration = self.instrument.callbacks(node_valid, on_edge, on_iteration)
+            newnode = self.connect_trees(start, goal, max_iterations, node_valid, on_edge, on_iteration)
+            self.instrument.finish(self, self.iterations)
+            return newnode
+        return self.connect_trees(start, goal, max_iterations, node_valid, on_edge, on_iteration)
+
+    def connect_trees(self, start, goal, max_iterations, node_valid, on_edge, on_iteration):
+        start_tree = Tree(start, self.index_kind)
+        goal_tree = Tree(goal, self.index_kind)
+        self.trees = (start_tree, goal_tree)
+        # The planner's own list and index hold both trees, so the inherited nearest() and near() see them all
+        self.nodes = [start, goal]
+        self.index = make_index(self.index_kind)
+        for n in self.nodes:
+            self.index.insert(n.x, n.y, n)
+        self.iterations = 0
+        if self.sampler is not None:
+            self.sampler.set_goal(goal)
+        a, b = start_tree, goal_tree
+
+        while max_iterations is None or self.iterations < max_iterations:
+            self.iterations += 1
+            if on_iteration is not None and on_iteration(self) is False:
+                return None
+
+            rand = self.sample()
+            status, newnode = self.extend(a, rand, node_valid, on_edge)
+            if status != TRAPPED:
+                status, meet = self.connect(b, newnode, node_valid, on_edge)
+                if status == REACHED:
+                    # meet sits on top of newnode, so the two branches join there
+                    if a is start_tree:
+                        return self.join(newnode, meet.parent)
+                    return self.join(meet, newnode.parent)
+            a, b = b, a
+
+        return None
@@ -0,0 +1,376 @@
+import random
+import math
+
+import numpy as np
+
+from collision import ObstacleArray
+from footprint import inflated_map
+from nn_index import make_index
+from obstacle_tree import ObstacleTree
+from occupancy import OccupancyGrid
+from samplers import make_sampler
+from tree_store import TreeNode, TreeStore
+
+# RRT Algorithm
+class Node:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.parent = None
+
+def distance(a, b):
+    return math.sqrt((b.x - a.x) ** 2 + (b.y - a.y) ** 2)
+
+def step_from_to(node1, node2, stepSize):
+    if distance(node1, node2) < stepSize:
+        return node2
+    else:
+        theta = math.atan2(node2.y - node1.y, node2.x - node1.x)
+        return Node(node1.x + stepSize * math.cos(theta), node1.y + stepSize * math.sin(theta))
+
+def is_inside_obstacle(point, obstacle):
+    """
+    Check if the point is inside the obstacle rectangle.
+    """
+    x, y = point
+    x0, y0, w, h = obstacle
+    return x0 <= x <= x0 + w and y0 <= y <= y0 + h
+
+def is_path_clear(start, end, obstacles):
+    """
+    Checking if the path between start and end points is clear of obstacles.
+    :param start: tuple (x, y), start point
+    :param end: tuple (x, y), end point
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles, or an
+        obstacle_tree.ObstacleTree built from them
+    :return: boolean, True if path is clear, False otherwise
+    """
+    if isinstance(obstacles, ObstacleTree):
+        return obstacles.segment_clear(start, end)
+    for obstacle in obstacles:
+        # Calculating the rectangle's (obstacle's) vertices
+        top_left = (obstacle[0], obstacle[1])
+        top_right = (obstacle[0] + obstacle[2], obstacle[1])
+        bottom_left = (obstacle[0], obstacle[1] + obstacle[3])
+        bottom_right = (obstacle[0] + obstacle[2], obstacle[1] + obstacle[3])
+
+        # Checking all sides of the rectangle
+        if do_intersect(start, end, top_left, top_right):
+            return False
+        if do_intersect(start, end, top_right, bottom_right):
+            return False
+        if do_intersect(start, end, bottom_right, bottom_left):
+            return False
+        if do_intersect(start, end, bottom_left, top_left):
+            return False
+
+    # If we've not returned False yet, path is clear
+    return True
+
+def do_intersect(p1, q1, p2, q2):
+    """
+    Checking if two line segments intersect.
+    :param p1: tuple (x, y), start point of line segment 1
+    :param q1: tuple (x, y), end point of line segment 1
+    :param p2: tuple (x, y), start point of line segment 2
+    :param q2: tuple (x, y), end point of line segment 2
+    :return: boolean, True if lines intersect, False otherwise
+    """
+    def orientation(p, q, r):
+        """
+        Finding orientation of ordered triplet (p, q, r).
+        :param p: tuple (x, y), first point
+        :param q: tuple (x, y), second point
+        :param r: tuple (x, y), third point
+        :return: int, 0 --> p, q and r are colinear, 1 --> Clockwise, 2 --> Counterclockwise
+        """
+        val = (float(q[1] - p[1]) * (r[0] - q[0])) - (float(q[0] - p[0]) * (r[1] - q[1]))
+        if val == 0: return 0  # colinear
+        elif val > 0: return 1  # clockwise
+        else: return 2  # counterclockwise
+
+    def on_segment(p, q, r):
+        """
+        Checking if point q lies on line segment 'pr'
+        :param p: tuple (x, y), first point
+        :param q: tuple (x, y), second point
+        :param r: tuple (x, y), third point
+        :return: boolean, True if q lies on segment pr, False otherwise
+        """
+        if q[0] <= max(p[0], r[0]) and q[0] >= min(p[0], r[0]) and q[1] <= max(p[1], r[1]) and q[1] >= min(p[1], r[1]):
+            return True
+        return False
+
+    # Finding the four orientations needed for the general and special cases
+    o1 = orientation(p1, q1, p2)
+    o2 = orientation(p1, q1, q2)
+    o3 = orientation(p2, q2, p1)
+    o4 = orientation(p2, q2, q1)
+
+    # In general case
+    if o1 != o2 and o3 != o4:
+        return True
+
+    # Special cases: when any three points are colinear
+    if o1 == 0 and on_segment(p1, p2, q1): return True
+    if o2 == 0 and on_segment(p1, q2, q1): return True
+    if o3 == 0 and on_segment(p2, p1, q2): return True
+    if o4 == 0 and on_segment(p2, q1, q2): return True
+
+    return False  # Doesn't fall
+
+def extract_path(node):
+    """
+    Walking the parent chain back from node to the root of its tree.
+    :param node: Node, last node of the path
+    :return: list of tuples (x, y), ordered from the root to node
+    """
+    if isinstance(node, TreeNode):
+        return [tuple(p) for p in node.tree.path(node.index).tolist()]
+    path = []
+    while node:
+        path.append((node.x, node.y))
+        node = node.parent
+    path.reverse()
+    return path
+
+def make_checker(collision, obstacles, width, height):
+    """
+    Building the static obstacle checker named by collision, None means the plain is_path_clear.
+    """
+    if collision == "python":
+        return None
+    if collision == "numpy":
+        return ObstacleArray(obstacles)
+    if collision == "rtree":
+        return ObstacleTree(obstacles)
+    if collision == "grid":
+        return OccupancyGrid(obstacles, width, height)
+    if hasattr(collision, "segment_clear"):
+        return collision
+    raise ValueError("Unknown collision backend: %r (expected 'rtree', 'numpy', 'python', 'grid' or a checker)" % (collision,))
+
+class RRTPlanner:
+    """
+    Headless RRT planner. Nothing in here touches pygame, so it can be imported and run
+    on machines without a display; drawing is done by whoever listens to on_edge.
+    :param index: str, nearest-neighbour index used for the tree, see nn_index.make_index
+    :param collision: "rtree" for the obstacle_tree.ObstacleTree index, "numpy" for the vectorized
+        collision.ObstacleArray, "python" for is_path_clear, "grid" for a default occupancy.OccupancyGrid,
+        or any object with a segment_clear(start, end) method
+    :param batch_size: int, samples drawn per iteration; above 1 the K samples are extended, stepped and
+        collision-checked in bulk, and only the survivors are inserted
+    :param seed: int or None, seeds the planner's own generators so runs are reproducible
+    :param sampler: None for the original uniform sampling, a samplers.Sampler, or the name of one
+        (see samplers.make_sampler), seeded from seed
+    :param footprint: footprint.Footprint or None, plan for a wheelchair of that size by checking edges
+        against the obstacles (and map walls) inflated by its clearance radius, shared per map and footprint;
+        collision has to name a backend then, which is built over the inflated obstacles
+    :param tree: "nodes" keeps one Node object per vertex, "array" keeps the vertices in a
+        tree_store.TreeStore and hands out TreeNode handles (used by RRTPlanner's own growth loops;
+        RRT* and RRT-Connect keep Node objects)
+    :param instrument: instrument.Instrumentation or None, per-stage timers and counters
+    """
+    def __init__(self, obstacles, width, height, stepSize=20, FinalProx=20, index="kdtree", collision="rtree",
+                 batch_size=1, seed=None, sampler=None, footprint=None, tree="nodes", instrument=None):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1, got %r" % (batch_size,))
+        if tree not in ("nodes", "array"):
+            raise ValueError("Unknown tree storage: %r (expected 'nodes' or 'array')" % (tree,))
+        self.footprint = footprint
+        if footprint is not None:
+            if not isinstance(collision, str):
+                # A checker built outside knows nothing of the inflated obstacles
+                raise ValueError("A footprint needs a collision backend by name, got the checker %r" % (collision,))
+            inflated = inflated_map(obstacles, width, height, footprint)
+            obstacles = inflated.obstacles
+            if collision == "rtree":
+                collision = inflated.tree
+        self.obstacles = obstacles
+        self.checker = make_checker(collision, obstacles, width, height)
+        self.width = width
+        self.height = height
+        self.stepSize = stepSize
+        self.FinalProx = FinalProx
+        self.index_kind = index
+        self.tree_kind = tree
+        self.nodes = []
+        self.index = make_index(index)
+        self.iterations = 0
+        self.batch_size = batch_size
+        self.random = random if seed is None else random.Random(seed)
+        self.rng = np.random.default_rng(seed)
+        if isinstance(sampler, str):
+            sampler = make_sampler(sampler, self.checker if isinstance(self.checker, ObstacleTree) else obstacles,
+                                   width, height, seed)
+        self.sampler = sampler
+        self.instrument = instrument
+        if instrument is not None:
+            instrument.attach(self)
+
+    def add_node(self, n):
+        """
+        Adding n to the tree and the nearest-neighbour index.
+        :return: the stored vertex, n itself or its TreeNode handle with tree="array"
+        """
+        if isinstance(self.nodes, TreeStore):
+            # The index holds plain vertex numbers, handles are only made for the vertices queries return
+            n = self.nodes.add_node(n)
+            self.index.insert(n.x, n.y, n.index)
+            return n
+        self.nodes.append(n)
+        self.index.insert(n.x, n.y, n)
+        return n
+
+    def path_clear(self, start, end):
+        if self.checker is not None:
+            return self.checker.segment_clear(start, end)
+        return is_path_clear(start, end, self.obstacles)
+
+    def paths_clear(self, starts, ends):
+        if hasattr(self.checker, "segments_clear"):
+            return self.checker.segments_clear(starts, ends)
+        return np.array([self.path_clear(a, b) for a, b in zip(starts.tolist(), ends.tolist())], dtype=bool)
+
+    def sample(self):
+        if self.sampler is not None:
+            return Node(*self.sampler.next())
+        return Node(self.random.random()*self.width, self.random.random()*self.height)
+
+    def sample_batch(self, k):
+        if self.sampler is not None:
+            return self.sampler.draw(k)
+        return self.rng.random((k, 2)) * (self.width, self.height)
+
+    def steer_batch(self, near, rand):
+        """
+        Vectorized step_from_to: moving stepSize from each near point towards its sample.
+        :param near: array (K, 2), points the tree grows from
+        :param rand: array (K, 2), samples
+        :return: array (K, 2), new points
+        """
+        d = rand - near
+        dist = np.hypot(d[:, 0], d[:, 1])
+        close = dist < self.stepSize
+        scale = np.where(close, 1.0, self.stepSize / np.where(close, 1.0, dist))
+        return np.where(close[:, None], rand, near + d * scale[:, None])
+
+    def nearest(self, rand):
+        found = self.index.nearest(rand.x, rand.y)
+        if isinstance(self.nodes, TreeStore):
+            return TreeNode(self.nodes, found)
+        return found
+
+    def nearest_batch(self, points):
+        found = self.index.nearest_batch(points)
+        if isinstance(self.nodes, TreeStore):
+            return [TreeNode(self.nodes, i) for i in found]
+        return found
+
+    def near(self, n, r):
+        found = self.index.radius(n.x, n.y, r)
+        if isinstance(self.nodes, TreeStore):
+            return [TreeNode(self.nodes, i) for i in found]
+        return found
+
+    def reset(self, start):
+        self.nodes = TreeStore() if self.tree_kind == "array" else []
+        self.index = make_index(self.index_kind)
+        self.add_node(start)
+        self.iterations = 0
+
+    def plan(self, start, goal, max_iterations=None, node_valid=None, on_edge=None, on_iteration=None):
+        """
+        Growing a tree from start until a node lands within FinalProx of goal.
+        :param start: Node, root of the tree
+        :param goal: Node, goal position
+        :param max_iterations: int or None, number of samples to draw before giving up
+        :param node_valid: callable (nn, newnode) -> bool, extra check run after the static obstacle check
+        :param on_edge: callable (parent, child), called for every edge added to the tree
+        :param on_iteration: callable (planner) -> bool, called once per iteration, returning False stops planning
+        :return: Node within FinalProx of goal, or None if planning stopped before reaching it
+        """
+        self.reset(start)
+        return self.grow(goal, max_iterations, node_valid, on_edge, on_iteration)
+
+    def grow(self, goal, max_iterations=None, node_valid=None, on_edge=None, on_iteration=None):
+        """
+        Growing the current tree, whatever it holds, until a node lands within FinalProx of goal.
+        Takes the same arguments as plan; max_iterations counts the samples drawn by this call.
+        """
+        limit = None if max_iterations is None else self.iterations + max_iterations
+        if self.sampler is not None:
+            self.sampler.set_goal(goal)
+        inst = self.instrument
+        if inst is not None:
+            node_valid, on_edge, on_iteration = inst.callbacks(node_valid, on_edge, on_iteration)
+            iterations = self.iterations
+        grow = self.grow_batched if self.batch_size > 1 else self.grow_single
+        newnode = grow(goal, limit, node_valid, on_edge, on_iteration)
+        if inst is not None:
+            inst.finish(self, self.iterations - iterations)
+        return newnode
+
+    def grow_single(self, goal, limit, node_valid, on_edge, on_iteration):
+        while limit is None or self.iterations < limit:
+            self.iterations += 1
+            if on_iteration is not None and on_iteration(self) is False:
+                return None
+
+            rand = self.sample()
+            nn = self.nearest(rand)
+            newnode = step_from_to(nn, rand, self.stepSize)
+
+            # Checking if the path between the nearest node and the new node is clear
+            if not self.path_clear((nn.x, nn.y), (newnode.x, newnode.y)):
+                continue
+            if node_valid is not None and not node_valid(nn, newnode):
+                continue
+
+            newnode.parent = nn
+            newnode = self.add_node(newnode)
+            if on_edge is not None:
+                on_edge(nn, newnode)
+
+            # Checking for completion
+            if distance(newnode, goal) < self.FinalProx:
+                return newnode
+
+        return None
+
+    def grow_batched(self, goal, limit, node_valid, on_edge, on_iteration):
+        """
+        Batched growth: every iteration draws batch_size samples, resolves their nearest nodes in
+        one query, steps and checks all candidate edges in bulk and inserts the survivors in order.
+        Survivors of a batch do not see each other as nearest nodes.
+        """
+        while limit is None or self.iterations < limit:
+            k = self.batch_size
+            if limit is not None:
+                k = min(k, limit - self.iterations)
+            self.iterations += k
+            if on_iteration is not None and on_iteration(self) is False:
+                return None
+
+            rand = self.sample_batch(k)
+            nns = self.nearest_batch(rand)
+            near = np.array([(n.x, n.y) for n in nns], dtype=np.float64)
+            new = self.steer_batch(near, rand)
+
+            # Checking all candidate edges against the static obstacles at once
+            clear = self.paths_clear(near, new)
+            for nn, (x, y) in zip([n for n, c in zip(nns, clear) if c], new[clear].tolist()):
+                newnode = Node(x, y)
+                if node_valid is not None and not node_valid(nn, newnode):
+                    continue
+
+                newnode.parent = nn
+                newnode = self.add_node(newnode)
+                if on_edge is not None:
+                    on_edge(nn, newnode)
+
+                # Checking for completion
+                if distance(newnode, goal) < self.FinalProx:
+                    return newnode
+
+        return None
@@ -2,6 +2,8 @@ import pygame
 import random
 import math
 
+from nn_index import make_index
+
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
@@ -24,23 +26,21 @@ def distance(p1, p2):
 # def is_path_clear(p1, p2):
 #     return True
 
-def rrt(start, goal):
+def rrt(start, goal, index="kdtree"):
     tree = []
-    nodes = [start]
+    nodes = make_index(index)
+    nodes.insert(start[0], start[1], start)
 
     while True:
         rand_point = (random.randint(0, win_size[0]), random.randint(0, win_size[1]))
 
-        closest_point = nodes[0]
-        for p in nodes:
-            if distance(p, rand_point) < distance(closest_point, rand_point):
-                closest_point = p
+        closest_point = nodes.nearest(rand_point[0], rand_point[1])
 
         angle = math.atan2(rand_point[1]-closest_point[1], rand_point[0]-closest_point[0])
         new_point = (closest_point[0]+int(math.cos(angle)*scale_factor), closest_point[1]+int(math.sin(angle)*scale_factor))
 
         if True:
-            nodes.append(new_point)
+            nodes.insert(new_point[0], new_point[1], new_point)
             tree.append((closest_point, new_point))
 
             win.fill(WHITE)
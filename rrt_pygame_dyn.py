@@ -1,44 +1,29 @@
+import os
 import pygame
 import random
-import math
+import sys
 import time
 
-# Initializing pygame and the screen
-pygame.init()
-width, height = 800, 600
-screen = pygame.display.set_mode((width, height))
-pygame.display.set_caption("RRT with Obstacles")
-
-# Colors
-white = (255, 255, 255)
-black = (0, 0, 0)
-red = (255, 0, 0)
-green = (0, 255, 0)
-blue = (0, 0, 255)
-
-# Static Obstacles
-obstacles = [
-    # Benches on the platform
-    (120, 430, 50, 15),
-    (190, 430, 50, 15),
-    (260, 430, 50, 15),
-    (330, 430, 50, 15),
-    (400, 430, 50, 15),
-    (470, 430, 50, 15),
-    (540, 430, 50, 15),
-    (610, 430, 50, 15),
-
-    # Pillars/supports 
-    (200, 50, 15, 350),
-    (300, 50, 15, 350),
-    (400, 50, 15, 350),
-    (500, 50, 15, 350),
-    (600, 50, 15, 350)
-]
-
-def draw_obstacles(screen, obstacles):
-    for obstacle in obstacles:
-        pygame.draw.rect(screen, black, pygame.Rect(obstacle[0], obstacle[1], obstacle[2], obstacle[3]))
+from rrt_planner import Node, RRTPlanner
+from broadphase import CrowdGrid
+from instrument import Instrumentation
+from obstacle_tree import ObstacleTree
+from occupancy import OccupancyGrid
+from crowd import Crowd
+from simulation import RenderThread, Simulation
+from spacetime import CrowdForecast, SpaceTimeChecker
+from station_map import load_map, maps_dir
+from rrt_render import TreeRenderer, red
+
+
+# Station map: bounds, start, goal and the static obstacles (benches, pillars, ...).
+# STATION_MAP points at another map file (.json, .yaml or .stmap), see station_map.py
+station = load_map(os.environ.get("STATION_MAP") or os.path.join(maps_dir, "platform.json"))
+obstacles = station.obstacle_list()
+width, height = int(station.width), int(station.height)
+
+# R-tree over the static obstacles for point, rectangle and edge tests, built once since they never move
+static_tree = ObstacleTree(obstacles)
 
 # New DynamicObstacle Class
 class DynamicObstacle:
@@ -56,14 +41,17 @@ class DynamicObstacle:
         new_y = self.y + self.vel_y
         new_rect = (new_x, new_y, self.w, self.h)
 
-        # Checking if the new rectangle will collide with any static obstacles
-        for obs in static_obstacles:
-            if self.check_collision(new_rect, obs):
-                # Randomize new direction
-                self.vel_x = random.choice([-1, 1]) * abs(self.vel_x)
-                self.vel_y = random.choice([-1, 1]) * abs(self.vel_y)
-                return
-        
+        # Checking if the new rectangle will collide with any static obstacles (through the R-tree when given one)
+        if isinstance(static_obstacles, ObstacleTree):
+            blocked = static_obstacles.rect_hits(new_rect)
+        else:
+            blocked = any(self.check_collision(new_rect, obs) for obs in static_obstacles)
+        if blocked:
+            # Randomize new direction
+            self.vel_x = random.choice([-1, 1]) * abs(self.vel_x)
+            self.vel_y = random.choice([-1, 1]) * abs(self.vel_y)
+            return
+
         # Applying movement if no collision
         self.x = new_x
         self.y = new_y
@@ -75,112 +63,6 @@ class DynamicObstacle:
         return (rect1[0] < rect2[0] + rect2[2] and rect1[0] + rect1[2] > rect2[0] and
                 rect1[1] < rect2[1] + rect2[3] and rect1[1] + rect1[3] > rect2[1])
 
-# RRT Algorithm
-class Node:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.parent = None
-
-def distance(a, b):
-    return math.sqrt((b.x - a.x) ** 2 + (b.y - a.y) ** 2)
-
-def step_from_to(node1, node2, stepSize):
-    if distance(node1, node2) < stepSize:
-        return node2
-    else:
-        theta = math.atan2(node2.y - node1.y, node2.x - node1.x)
-        return Node(node1.x + stepSize * math.cos(theta), node1.y + stepSize * math.sin(theta))
-
-def is_inside_obstacle(point, obstacle):
-    """
-    Check if the point is inside the obstacle rectangle.
-    """
-    x, y = point
-    x0, y0, w, h = obstacle
-    return x0 <= x <= x0 + w and y0 <= y <= y0 + h
-
-
-def is_path_clear(start, end, obstacles):
-    """
-    Checking if the path between start and end points is clear of obstacles.
-    :param start: tuple (x, y), start point
-    :param end: tuple (x, y), end point
-    :param obstacles: list of tuples (x, y, width, height), representing obstacles
-    :return: boolean, True if path is clear, False otherwise
-    """
-    for obstacle in obstacles:
-        # Calculating the rectangle's (obstacle's) vertices
-        top_left = (obstacle[0], obstacle[1])
-        top_right = (obstacle[0] + obstacle[2], obstacle[1])
-        bottom_left = (obstacle[0], obstacle[1] + obstacle[3])
-        bottom_right = (obstacle[0] + obstacle[2], obstacle[1] + obstacle[3])
-
-        # Checking all sides of the rectangle
-        if do_intersect(start, end, top_left, top_right):
-            return False
-        if do_intersect(start, end, top_right, bottom_right):
-            return False
-        if do_intersect(start, end, bottom_right, bottom_left):
-            return False
-        if do_intersect(start, end, bottom_left, top_left):
-            return False
-
-    # If we've not returned False yet, path is clear
-    return True
-
-def do_intersect(p1, q1, p2, q2):
-    """
-    Checking if two line segments intersect.
-    :param p1: tuple (x, y), start point of line segment 1
-    :param q1: tuple (x, y), end point of line segment 1
-    :param p2: tuple (x, y), start point of line segment 2
-    :param q2: tuple (x, y), end point of line segment 2
-    :return: boolean, True if lines intersect, False otherwise
-    """
-    def orientation(p, q, r):
-        """
-        Finding orientation of ordered triplet (p, q, r).
-        :param p: tuple (x, y), first point
-        :param q: tuple (x, y), second point
-        :param r: tuple (x, y), third point
-        :return: int, 0 --> p, q and r are colinear, 1 --> Clockwise, 2 --> Counterclockwise
-        """
-        val = (float(q[1] - p[1]) * (r[0] - q[0])) - (float(q[0] - p[0]) * (r[1] - q[1]))
-        if val == 0: return 0  # colinear
-        elif val > 0: return 1  # clockwise
-        else: return 2  # counterclockwise
-
-    def on_segment(p, q, r):
-        """
-        Checking if point q lies on line segment 'pr'
-        :param p: tuple (x, y), first point
-        :param q: tuple (x, y), second point
-        :param r: tuple (x, y), third point
-        :return: boolean, True if q lies on segment pr, False otherwise
-        """
-        if q[0] <= max(p[0], r[0]) and q[0] >= min(p[0], r[0]) and q[1] <= max(p[1], r[1]) and q[1] >= min(p[1], r[1]):
-            return True
-        return False
-
-    # Finding the four orientations needed for the general and special cases
-    o1 = orientation(p1, q1, p2)
-    o2 = orientation(p1, q1, q2)
-    o3 = orientation(p2, q2, p1)
-    o4 = orientation(p2, q2, q1)
-
-    # In general case
-    if o1 != o2 and o3 != o4:
-        return True
-
-    # Special cases: when any three points are colinear
-    if o1 == 0 and on_segment(p1, p2, q1): return True
-    if o2 == 0 and on_segment(p1, q2, q1): return True
-    if o3 == 0 and on_segment(p2, p1, q2): return True
-    if o4 == 0 and on_segment(p2, q1, q2): return True
-
-    return False  # Doesn't fall
-
 class Person:
     def __init__(self):
         self.width = 10
@@ -196,7 +78,7 @@ class Person:
         while True:
             x = random.randint(self.width + self.buffer_distance, width - self.width - self.buffer_distance)
             y = random.randint(self.height + self.buffer_distance, height - self.height - self.buffer_distance)
-            if not any(is_inside_obstacle((x, y), obstacle) for obstacle in obstacles):
+            if not static_tree.point_inside((x, y)):
                 return x, y
 
     def in_obstacle(self, pos, include_buffer=False):
@@ -211,13 +93,13 @@ class Person:
         self.x += self.dx * self.speed
         self.y += self.dy * self.speed
 
-        if self.x < 0 or self.x > width or self.y < 0 or self.y > height or any(is_inside_obstacle((self.x, self.y), obstacle) for obstacle in obstacles):
+        if self.x < 0 or self.x > width or self.y < 0 or self.y > height or static_tree.point_inside((self.x, self.y)):
             while True:  # Keep generating new directions until a valid one is found
                 self.dx = random.choice([-1, 1])
                 self.dy = random.choice([-1, 1])
                 new_x = self.x + self.dx * self.speed
                 new_y = self.y + self.dy * self.speed
-                if not (new_x < 0 or new_x > width or new_y < 0 or new_y > height or any(is_inside_obstacle((new_x, new_y), obstacle) for obstacle in obstacles)):
+                if not (new_x < 0 or new_x > width or new_y < 0 or new_y > height or static_tree.point_inside((new_x, new_y))):
                     break
 
     def draw(self, screen):
@@ -235,80 +117,141 @@ class Person:
 # Lets reate some people to contribute towards dynamic obstacles
 people = [Person() for _ in range(15)]
 
-def main():
+def main(render=True, grid=False, profile=False, spacetime=False):
+    screen = None
+    if render:
+        # Initializing pygame and the screen
+        pygame.init()
+        screen = pygame.display.set_mode((width, height))
+        pygame.display.set_caption("RRT with Obstacles")
+
+    # The static obstacles never move, so they can be rasterized once up front (and cached on disk)
+    collision = OccupancyGrid(obstacles, width, height, resolution=1, margin=0) if grid else static_tree
+
+    # Broad phase for people, rebuilt every tick after they move
+    crowd = CrowdGrid(width, height)
+
     average_time = 0
     rrt_loops = 5
     for i in range(rrt_loops):
 
-        running = True
-        nodes = []
-        stepSize = 20
-        FinalProx = 20
-        start = Node(50, 50)
-        nodes.append(start)
-        goal = Node(550, 550)
+        start = Node(*station.start)
+        goal = Node(*station.goal)
+        inst = Instrumentation(trace=True) if profile else None
+        planner = RRTPlanner(obstacles, width, height, stepSize=20, FinalProx=20, collision=collision, instrument=inst)
+        renderer = TreeRenderer(screen, obstacles, goal) if render else None
+
+        def on_iteration(planner):
+            if render:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        return False
+                renderer.draw()
+
+            # Operations on dynamic obstacles; a forecast is taken before planning, so the people
+            # stand still until the plan is done rather than drift away from it
+            for person in people:
+                if not spacetime:
+                    person.move()
+                if render:
+                    pygame.draw.circle(screen, red, (int(person.x), int(person.y)), person.size)
+            if not spacetime:
+                crowd.rebuild_from(people)
+
+            if render:
+                renderer.present()
+            return True
 
-        start_time = time.time()
+        def node_valid(nn, newnode):
+            for j in crowd.near_rect(newnode.x, newnode.y, 5, 5):
+                if people[j].collides((newnode.x, newnode.y, 5, 5)):
+                    return False
+            return True
 
-        while running:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
+        if spacetime:
+            # Checking edges against where people will be when the chair gets there, forecast once per plan
+            node_valid = SpaceTimeChecker(CrowdForecast.from_people(people, width, height),
+                                          (start.x, start.y)).node_valid
 
-            screen.fill(white)
-            draw_obstacles(screen, obstacles)
+        start_time = time.time()
+        newnode = planner.plan(start, goal, node_valid=node_valid,
+                               on_edge=renderer.add_edge if render else None, on_iteration=on_iteration)
+        finish_time = time.time()
 
-            # Operations on dynamic obstacles
-            for person in people:
-                person.move()
-                pygame.draw.circle(screen, red, (int(person.x), int(person.y)), person.size)
-
-            # Drawing existing nodes and edges
-            for n in nodes:
-                pygame.draw.circle(screen, black, (int(n.x), int(n.y)), 3)
-                if n.parent:
-                    pygame.draw.line(screen, green, (n.x, n.y), (n.parent.x, n.parent.y))
-
-            # Drawing goal
-            pygame.draw.circle(screen, blue, (int(goal.x), int(goal.y)), 5)
-
-            # RRT Algorithm
-            rand = Node(random.random()*width, random.random()*height)
-            nn = nodes[0]
-            for p in nodes:
-                if distance(p, rand) < distance(nn, rand):
-                    nn = p
-
-            newnode = step_from_to(nn, rand, stepSize)
-
-            # Checking if the path between the nearest node and the new node is clear
-            if is_path_clear((nn.x, nn.y), (newnode.x, newnode.y), obstacles):
-                for person in people:
-                    if person.collides((newnode.x, newnode.y, 5, 5)):
-                        break
-                else:
-                    newnode.parent = nn
-                    nodes.append(newnode)
-
-            # Checking for completion
-            if distance(newnode, goal) < FinalProx:
+        if render:
+            if newnode:
                 # Drawing final path
-                while newnode.parent:
-                    pygame.draw.line(screen, blue, (newnode.x, newnode.y), (newnode.parent.x, newnode.parent.y), 3)
-                    newnode = newnode.parent
-                running = False
-
-            pygame.display.flip()
-            # pygame.time.wait(50)
-
-        finish_time = time.time()
+                renderer.draw_path(newnode)
+            renderer.draw()
+            renderer.present()
 
         print("Time taken for loop ", i+1, "/", rrt_loops, " : ", finish_time-start_time)
         average_time += finish_time-start_time 
-        pygame.time.wait(2000)
+        if profile:
+            print(inst.report())
+            inst.write_summary("profile_%d.json" % (i+1))
+            inst.write_chrome_trace("trace_%d.json" % (i+1))
+        if render:
+            pygame.time.wait(2000)
 
     print("Average time : ", average_time/rrt_loops)
-    pygame.quit()
+    if render:
+        pygame.quit()
+
+def main_clocked(render=True, tick_rate=30.0, fps=30):
+    """
+    Same planning loop with the people on their own fixed-timestep clock: they move tick_rate times a
+    second whatever the planner does, each planner iteration reads the latest snapshot of them, and
+    drawing happens on a separate thread capped at fps.
+    """
+    sim = Simulation(Crowd.from_people(people, obstacles, width, height, seed=0), tick_rate=tick_rate).start()
+    average_time = 0
+    rrt_loops = 5
+    for i in range(rrt_loops):
+
+        start = Node(*station.start)
+        goal = Node(*station.goal)
+        planner = RRTPlanner(obstacles, width, height, stepSize=20, FinalProx=20, collision=static_tree)
+        renderer = RenderThread(sim, obstacles, goal, width, height, fps) if render else None
+        if render:
+            renderer.start()
+            renderer.ready.wait()
+        current = [sim.snapshot()]
+
+        def on_iteration(planner):
+            if render and renderer.closed:
+                return False
+            # One snapshot per iteration, so every check in it sees the same world
+            current[0] = sim.snapshot()
+            return True
+
+        def node_valid(nn, newnode):
+            return not current[0].blocked((newnode.x, newnode.y, 5, 5))
+
+        start_time = time.time()
+        newnode = planner.plan(start, goal, node_valid=node_valid,
+                               on_edge=renderer.add_edge if render else None, on_iteration=on_iteration)
+        finish_time = time.time()
+
+        print("Time taken for loop ", i+1, "/", rrt_loops, " : ", finish_time-start_time,
+              " (world at tick ", current[0].tick, ")")
+        average_time += finish_time-start_time
+        if render:
+            if newnode:
+                renderer.show_path(newnode)
+            time.sleep(2)
+            renderer.stop()
+            if renderer.closed:
+                break
+
+    sim.stop()
+    print("Average time : ", average_time/(i+1))
+    if sim.dropped:
+        print("Simulation fell behind and dropped ", sim.dropped, " ticks")
 
 if __name__ == "__main__":
-    main()
+    if "--clock" in sys.argv:
+        main_clocked(render="--headless" not in sys.argv)
+    else:
+        main(render="--headless" not in sys.argv, grid="--grid" in sys.argv, profile="--profile" in sys.argv,
+             spacetime="--spacetime" in sys.argv)
@@ -0,0 +1,55 @@
+import pygame
+
+# Colors
+white = (255, 255, 255)
+black = (0, 0, 0)
+red = (255, 0, 0)
+green = (0, 255, 0)
+blue = (0, 0, 255)
+
+def draw_obstacles(screen, obstacles):
+    for obstacle in obstacles:
+        pygame.draw.rect(screen, black, pygame.Rect(obstacle[0], obstacle[1], obstacle[2], obstacle[3]))
+
+class TreeRenderer:
+    """
+    Incremental tree drawing. The background, obstacles and every edge drawn so far live on a
+    persistent surface, so adding a node costs one line and one circle instead of a full redraw.
+    """
+    def __init__(self, screen, obstacles, goal):
+        self.screen = screen
+        self.obstacles = obstacles
+        self.goal = goal
+        self.tree_surface = pygame.Surface(screen.get_size())
+        self.reset()
+
+    def reset(self):
+        self.tree_surface.fill(white)
+        draw_obstacles(self.tree_surface, self.obstacles)
+
+    def add_node(self, n):
+        pygame.draw.circle(self.tree_surface, black, (int(n.x), int(n.y)), 3)
+
+    def add_edge(self, parent, child):
+        pygame.draw.line(self.tree_surface, green, (child.x, child.y), (parent.x, parent.y))
+        self.add_node(parent)
+        self.add_node(child)
+
+    def draw_path(self, node):
+        while node.parent:
+            pygame.draw.line(self.tree_surface, blue, (node.x, node.y), (node.parent.x, node.parent.y), 3)
+            node = node.parent
+
+    def draw_waypoints(self, points, color=red):
+        pygame.draw.lines(self.tree_surface, color, False, [(float(x), float(y)) for x, y in points], 3)
+
+    def draw(self):
+        """
+        Copying the persistent surface to the screen and drawing the goal on top. Anything that
+        moves (people) should be drawn by the caller after this and before present().
+        """
+        self.screen.blit(self.tree_surface, (0, 0))
+        pygame.draw.circle(self.screen, blue, (int(self.goal.x), int(self.goal.y)), 5)
+
+    def present(self):
+        pygame.display.flip()
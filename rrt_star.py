@@ -0,0 +1,202 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+from nn_index import make_index
+from rrt_planner import Node, RRTPlanner, distance, extract_path, step_from_to
+
+class RRTStarPlanner(RRTPlanner):
+    """
+    Anytime RRT* with informed sampling. Keeps improving the tree until a wall-clock or iteration
+    budget runs out: new nodes pick the cheapest collision-free parent among their neighbours and
+    then rewire those neighbours through themselves. Once a path exists, samples are drawn from the
+    ellipse of points that could still shorten it. Takes the same arguments as RRTPlanner, plus:
+    :param rewire_radius: float, upper bound on the neighbourhood radius (defaults to 2 * stepSize)
+    """
+    def __init__(self, obstacles, width, height, stepSize=20, FinalProx=20, rewire_radius=None, **kwargs):
+        RRTPlanner.__init__(self, obstacles, width, height, stepSize=stepSize, FinalProx=FinalProx, **kwargs)
+        self.rewire_radius = rewire_radius if rewire_radius is not None else 2 * stepSize
+        # RRT* ball constant for the plane, (2 * (1 + 1/d))^(1/d) * (area / unit ball volume)^(1/d) with d = 2
+        self.gamma = math.sqrt(3.0) * math.sqrt(width * height / math.pi)
+        self.cost = {}
+        self.children = {}
+        self.goal_nodes = []
+        self.best = None
+        self.best_cost = math.inf
+
+    def radius(self):
+        n = len(self.nodes)
+        if n < 2:
+            return self.rewire_radius
+        return min(self.gamma * math.sqrt(math.log(n) / n), self.rewire_radius)
+
+    def sample_informed(self, start, goal):
+        """
+        Uniform sample from the ellipse with foci start and goal whose points could still lead to a
+        path shorter than best_cost, falling back to the whole map if the ellipse misses it.
+        """
+        c_min = distance(start, goal)
+        c_best = self.best_cost
+        if c_best <= c_min:
+            return self.sample()
+        a = c_best / 2
+        b = math.sqrt(c_best * c_best - c_min * c_min) / 2
+        theta = math.atan2(goal.y - start.y, goal.x - start.x)
+        cos_t, sin_t = math.cos(theta), math.sin(theta)
+        cx, cy = (start.x + goal.x) / 2, (start.y + goal.y) / 2
+        for _ in range(100):
+            r = math.sqrt(self.random.random())
+            phi = 2 * math.pi * self.random.random()
+            ex, ey = a * r * math.cos(phi), b * r * math.sin(phi)
+            x = cx + ex * cos_t - ey * sin_t
+            y = cy + ex * sin_t + ey * cos_t
+            if 0 <= x <= self.width and 0 <= y <= self.height:
+                return Node(x, y)
+        return self.sample()
+
+    def attach(self, parent, child):
+        child.parent = parent
+        self.cost[child] = self.cost[parent] + distance(parent, child)
+        self.children.setdefault(parent, []).append(child)
+
+    def reparent(self, child, parent):
+        self.children[child.parent].remove(child)
+        old_cost = self.cost[child]
+        self.attach(parent, child)
+
+        # Pushing the saving down the rewired subtree
+        delta = self.cost[child] - old_cost
+        stack = list(self.children.get(child, ()))
+        while stack:
+            n = stack.pop()
+            self.cost[n] += delta
+            stack.extend(self.children.get(n, ()))
+
+    def clear_from(self, n, others):
+        """
+        Checking the edges between n and each node of others in one batched collision query.
+        """
+        if not others:
+            return np.zeros(0, dtype=bool)
+        ends = np.array([(o.x, o.y) for o in others], dtype=np.float64)
+        starts = np.broadcast_to(np.array([n.x, n.y], dtype=np.float64), ends.shape)
+        return self.paths_clear(starts, ends)
+
+    def update_best(self, goal):
+        for n in self.goal_nodes:
+            c = self.cost[n] + distance(n, goal)
+            if c < self.best_cost:
+                self.best_cost = c
+                self.best = n
+
+    def plan(self, start, goal, max_iterations=None, time_budget=None, node_valid=None, on_edge=None,
+             on_iteration=None):
+        """
+        Growing and rewiring the tree until the budget runs out.
+        :param start: Node, root of the tree
+        :param goal: Node, goal position
+        :param max_iterations: int or None, number of samples to draw
+        :param time_budget: float or None, wall-clock seconds to plan for
+        :param node_valid: callable (parent, child) -> bool, extra check run after the static obstacle check on
+            every edge before it enters the tree, rewired edges included
+        :param on_edge: callable (parent, child), called for every edge added or rewired
+        :param on_iteration: callable (planner) -> bool, called once per iteration, returning False stops planning
+        :return: Node within FinalProx of goal on the cheapest path found, or None if no path was found
+        """
+        if max_iterations is None and time_budget is None:
+            raise ValueError("RRTStarPlanner.plan needs max_iterations or time_budget")
+        deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        if self.instrument is not None:
+            node_valid, on_edge, on_iteration = self.instrument.callbacks(node_valid, on_edge, on_iteration)
+
+        self.nodes = []
+        self.index = make_index(self.index_kind)
+        self.cost = {start: 0.0}
+        self.children = {}
+        self.goal_nodes = []
+        self.best = None
+        self.best_cost = math.inf
+        start.parent = None
+        self.add_node(start)
+        self.iterations = 0
+        if self.sampler is not None:
+            self.sampler.set_goal(goal)
+
+        while max_iterations is None or self.iterations < max_iterations:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            self.iterations += 1
+            if on_iteration is not None and on_iteration(self) is False:
+                break
+
+            rand = self.sample_informed(start, goal) if self.best is not None else self.sample()
+            nn = self.nearest(rand)
+            newnode = step_from_to(nn, rand, self.stepSize)
+            if newnode is rand:
+                newnode = Node(rand.x, rand.y)
+
+            # Checking if the path between the nearest node and the new node is clear
+            if not self.path_clear((nn.x, nn.y), (newnode.x, newnode.y)):
+                continue
+
+            # Choosing the cheapest parent in the neighbourhood whose edge passes both checks,
+            # nn being the fallback
+            near = self.near(newnode, self.radius())
+            if not any(p is nn for p in near):
+                near.append(nn)
+            parent = None
+            parent_cost = self.cost[nn] + distance(nn, newnode)
+            cheaper = [p for p in near if self.cost[p] + distance(p, newnode) < parent_cost]
+            if cheaper:
+                clear = self.clear_from(newnode, cheaper).tolist()
+                options = sorted((self.cost[p] + distance(p, newnode), i)
+                                 for i, (p, c) in enumerate(zip(cheaper, clear)) if c)
+                for c, i in options:
+                    if node_valid is None or node_valid(cheaper[i], newnode):
+                        parent, parent_cost = cheaper[i], c
+                        break
+            if parent is None:
+                if node_valid is not None and not node_valid(nn, newnode):
+                    continue
+                parent = nn
+
+            self.attach(parent, newnode)
+            self.add_node(newnode)
+            if on_edge is not None:
+                on_edge(parent, newnode)
+
+            # Rewiring neighbours that are cheaper to reach through the new node
+            new_cost = self.cost[newnode]
+            candidates = [p for p in near if p is not parent and new_cost + distance(newnode, p) < self.cost[p]]
+            if candidates:
+                for p, clear in zip(candidates, self.clear_from(newnode, candidates)):
+                    if clear and new_cost + distance(newnode, p) < self.cost[p]:
+                        if node_valid is not None and not node_valid(newnode, p):
+                            continue
+                        self.reparent(p, newnode)
+                        if on_edge is not None:
+                            on_edge(newnode, p)
+
+            if distance(newnode, goal) < self.FinalProx:
+                self.goal_nodes.append(newnode)
+            if self.goal_nodes:
+                self.update_best(goal)
+
+        if self.instrument is not None:
+            self.instrument.finish(self, self.iterations)
+        return self.best
+
+if __name__ == "__main__":
+    # Path cost against planning budget on the bench-and-pillar map, headless
+    from rrt_pygame import obstacles, width, height, station
+
+    for budget in [float(a) for a in sys.argv[1:]] or [0.25, 0.5, 1.0, 2.0]:
+        planner = RRTStarPlanner(obstacles, width, height, seed=0)
+        best = planner.plan(Node(*station.start), Node(*station.goal), time_budget=budget)
+        if best is None:
+            print("Budget %.2fs : no path, %d nodes" % (budget, len(planner.nodes)))
+        else:
+            print("Budget %.2fs : cost %.1f, %d waypoints, %d nodes" % (
+                budget, planner.best_cost, len(extract_path(best)), len(planner.nodes)))
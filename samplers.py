@@ -0,0 +1,256 @@
+import sys
+import time
+
+import numpy as np
+
+from obstacle_tree import ObstacleTree
+
+# Sampling strategies for the planners. They all share the same small interface:
+#   draw(k)          (k, 2) array with the next k samples, drawn as one vectorized block
+#   next()           one sample as an (x, y) tuple, served from a buffered block
+#   set_goal(goal)   called by the planner with the goal Node before it starts growing
+# Every sampler owns a seeded NumPy generator, so the same seed always gives the same samples.
+
+class Sampler:
+    """
+    Shared part of the samplers: the seeded generator and the block buffer behind next().
+    :param width: float, map width
+    :param height: float, map height
+    :param seed: int or None
+    """
+    # Samples drawn per refill of the next() buffer
+    block = 256
+
+    def __init__(self, width, height, seed=None):
+        self.width = width
+        self.height = height
+        self.rng = np.random.default_rng(seed)
+        self.goal = None
+        self.buffer = []
+        self.pos = 0
+
+    def set_goal(self, goal):
+        goal = (goal.x, goal.y)
+        if goal != self.goal:
+            # Buffered samples were drawn for the previous goal (goal bias), so they are dropped
+            self.buffer = []
+            self.pos = 0
+        self.goal = goal
+
+    def draw(self, k):
+        raise NotImplementedError
+
+    def next(self):
+        if self.pos == len(self.buffer):
+            self.buffer = self.draw(self.block).tolist()
+            self.pos = 0
+        self.pos += 1
+        return self.buffer[self.pos - 1]
+
+class UniformSampler(Sampler):
+    """
+    Uniform samples over the whole map, the planners' original behaviour.
+    """
+    def draw(self, k):
+        return self.rng.random((k, 2)) * (self.width, self.height)
+
+class HaltonSampler(Sampler):
+    """
+    Low-discrepancy Halton sequence (bases 2 and 3), which covers the map more evenly than uniform
+    samples do. The seed picks a random shift of the sequence (Cranley-Patterson rotation).
+    """
+    def __init__(self, width, height, seed=None):
+        Sampler.__init__(self, width, height, seed)
+        self.shift = self.rng.random(2)
+        self.count = 0
+
+    def radical_inverse(self, i, base):
+        result = np.zeros(len(i))
+        f = 1.0 / base
+        i = i.copy()
+        while i.any():
+            result += f * (i % base)
+            i //= base
+            f /= base
+        return result
+
+    def draw(self, k):
+        i = np.arange(self.count + 1, self.count + k + 1)
+        self.count += k
+        u = np.column_stack([self.radical_inverse(i, 2), self.radical_inverse(i, 3)])
+        return (u + self.shift) % 1.0 * (self.width, self.height)
+
+class SobolSampler(Sampler):
+    """
+    Two-dimensional Sobol sequence (the first dimension is van der Corput in base 2, the second uses
+    the primitive polynomial x + 1), randomly shifted by the seed like HaltonSampler.
+    """
+    bits = 32
+
+    def __init__(self, width, height, seed=None):
+        Sampler.__init__(self, width, height, seed)
+        self.shift = self.rng.random(2)
+        self.count = 0
+        # Direction numbers v_k = m_k / 2^k, scaled to integers of self.bits bits
+        m = [1]
+        for _ in range(self.bits - 1):
+            m.append((2 * m[-1]) ^ m[-1])
+        self.directions = np.array([[1 << (self.bits - 1 - k) for k in range(self.bits)],
+                                    [m[k] << (self.bits - 1 - k) for k in range(self.bits)]], dtype=np.uint64)
+
+    def draw(self, k):
+        i = np.arange(self.count, self.count + k, dtype=np.uint64)
+        self.count += k
+        gray = i ^ (i >> np.uint64(1))
+        points = np.zeros((k, 2), dtype=np.uint64)
+        for bit in range(self.bits):
+            on = ((gray >> np.uint64(bit)) & np.uint64(1)).astype(bool)
+            points[on] ^= self.directions[:, bit]
+        u = points / float(1 << self.bits)
+        return (u + self.shift) % 1.0 * (self.width, self.height)
+
+class FreeSpaceSampler(Sampler):
+    """
+    Rejection sampling: samples from base that land inside a static obstacle are dropped, so the
+    planner never spends an iteration on a point it cannot reach.
+    :param base: Sampler, source of candidate samples
+    :param obstacles: list of tuples (x, y, width, height), or an obstacle_tree.ObstacleTree
+    """
+    def __init__(self, base, obstacles):
+        Sampler.__init__(self, base.width, base.height)
+        self.base = base
+        self.tree = obstacles if isinstance(obstacles, ObstacleTree) else ObstacleTree(obstacles)
+        self.rng = base.rng
+        self.pending = np.empty((0, 2))
+
+    def set_goal(self, goal):
+        Sampler.set_goal(self, goal)
+        self.base.set_goal(goal)
+
+    def draw(self, k):
+        # Surplus free samples are kept for the next call rather than dropped, so low-discrepancy
+        # sequences are consumed in order
+        blocks = [self.pending]
+        found = len(self.pending)
+        while found < k:
+            block = self.base.draw(max(k - found, self.block))
+            block = block[~self.tree.points_inside(block)]
+            blocks.append(block)
+            found += len(block)
+        samples = np.concatenate(blocks)
+        self.pending = samples[k:]
+        return samples[:k]
+
+class GoalBiasedSampler(Sampler):
+    """
+    Replacing a fraction of base's samples with the goal itself, which pulls the tree towards the
+    goal once the space around it is explored.
+    :param base: Sampler, source of the other samples
+    :param bias: float, probability of sampling the goal
+    """
+    def __init__(self, base, bias=0.05):
+        if not 0.0 <= bias <= 1.0:
+            raise ValueError("bias must be between 0 and 1, got %r" % (bias,))
+        Sampler.__init__(self, base.width, base.height)
+        self.base = base
+        self.bias = bias
+        self.rng = base.rng
+
+    def set_goal(self, goal):
+        Sampler.set_goal(self, goal)
+        self.base.set_goal(goal)
+
+    def draw(self, k):
+        samples = self.base.draw(k)
+        if self.goal is not None:
+            samples[self.rng.random(k) < self.bias] = self.goal
+        return samples
+
+class BridgeSampler(Sampler):
+    """
+    Bridge test for narrow passages: two points a short, normally distributed hop apart that are both
+    inside obstacles, whose midpoint is free, mark a gap between obstacles (between a pillar and a
+    bench, say). A fraction mix of the samples come from the bridge test, the rest are uniform free
+    samples, since the test alone never samples open space.
+    :param obstacles: list of tuples (x, y, width, height), or an obstacle_tree.ObstacleTree
+    :param width: float, map width
+    :param height: float, map height
+    :param sigma: float, standard deviation of the hop between the two bridge ends
+    :param mix: float, fraction of samples from the bridge test
+    :param seed: int or None
+    """
+    # Candidate bridges tried per block before the shortfall is filled with free samples
+    attempts = 20
+
+    def __init__(self, obstacles, width, height, sigma=30.0, mix=0.5, seed=None):
+        Sampler.__init__(self, width, height, seed)
+        self.tree = obstacles if isinstance(obstacles, ObstacleTree) else ObstacleTree(obstacles)
+        self.sigma = sigma
+        self.mix = mix
+        self.free = FreeSpaceSampler(UniformSampler(width, height), self.tree)
+        self.free.rng = self.free.base.rng = self.rng
+
+    def draw(self, k):
+        wanted = int(self.rng.binomial(k, self.mix))
+        bridges = []
+        found = 0
+        for _ in range(self.attempts):
+            if found >= wanted:
+                break
+            a = self.rng.random((4 * k, 2)) * (self.width, self.height)
+            a = a[self.tree.points_inside(a)]
+            b = a + self.rng.normal(0.0, self.sigma, a.shape)
+            both = self.tree.points_inside(b)
+            mid = (a[both] + b[both]) / 2
+            mid = mid[~self.tree.points_inside(mid)]
+            bridges.append(mid)
+            found += len(mid)
+        bridges = np.concatenate(bridges)[:wanted] if bridges else np.empty((0, 2))
+        samples = np.concatenate([bridges, self.free.draw(k - len(bridges))])
+        return samples[self.rng.permutation(k)]
+
+samplers = {
+    "uniform": lambda obstacles, width, height, seed: UniformSampler(width, height, seed),
+    "free": lambda obstacles, width, height, seed: FreeSpaceSampler(UniformSampler(width, height, seed), obstacles),
+    "goal": lambda obstacles, width, height, seed: GoalBiasedSampler(
+        FreeSpaceSampler(UniformSampler(width, height, seed), obstacles)),
+    "halton": lambda obstacles, width, height, seed: FreeSpaceSampler(HaltonSampler(width, height, seed), obstacles),
+    "sobol": lambda obstacles, width, height, seed: FreeSpaceSampler(SobolSampler(width, height, seed), obstacles),
+    "bridge": lambda obstacles, width, height, seed: BridgeSampler(obstacles, width, height, seed=seed),
+}
+
+def make_sampler(kind, obstacles, width, height, seed=None):
+    """
+    Building a sampler by name. "free", "goal", "halton" and "sobol" only return free-space samples;
+    "goal" adds a 5% goal bias on top of "free".
+    :param kind: str, one of samplers
+    :param obstacles: list of tuples (x, y, width, height), or an obstacle_tree.ObstacleTree
+    :param width: float, map width
+    :param height: float, map height
+    :param seed: int or None
+    :return: Sampler
+    """
+    if kind not in samplers:
+        raise ValueError("Unknown sampler: %r (expected one of %s)" % (kind, ", ".join(samplers)))
+    return samplers[kind](obstacles, width, height, seed)
+
+if __name__ == "__main__":
+    # Iterations and time to first path per sampler on the bench-and-pillar map
+    from rrt_planner import Node, RRTPlanner
+    from rrt_pygame import obstacles, width, height, station
+
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    tree = ObstacleTree(obstacles)
+    print("%-10s %12s %12s %12s %10s" % ("sampler", "iters p50", "iters mean", "time (ms)", "nodes"))
+    for kind in [None] + list(samplers):
+        iterations, elapsed, nodes = [], [], []
+        for seed in range(seeds):
+            sampler = make_sampler(kind, tree, width, height, seed) if kind else None
+            planner = RRTPlanner(obstacles, width, height, collision=tree, seed=seed, sampler=sampler)
+            start_time = time.perf_counter()
+            planner.plan(Node(*station.start), Node(*station.goal))
+            elapsed.append(time.perf_counter() - start_time)
+            iterations.append(planner.iterations)
+            nodes.append(len(planner.nodes))
+        print("%-10s %12.0f %12.0f %12.2f %10.0f" % (kind or "default", np.median(iterations), np.mean(iterations),
+                                                    np.mean(elapsed) * 1e3, np.mean(nodes)))
@@ -0,0 +1,243 @@
+import collections
+import hashlib
+import sys
+import threading
+import time
+
+from broadphase import CrowdGrid
+
+class Snapshot:
+    """
+    Frozen state of the crowd after one simulation tick. The arrays are copies that are never
+    written again, so the planner and the renderer can read a snapshot while the simulation has
+    long moved on. The broad-phase grid is built on first use.
+    """
+    __slots__ = ("tick", "time", "x", "y", "vx", "vy", "size", "width", "height", "_grid")
+
+    def __init__(self, tick, time, x, y, vx, vy, size, width, height):
+        self.tick = tick
+        self.time = time
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+        self.size = size
+        self.width = width
+        self.height = height
+        self._grid = None
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def grid(self):
+        if self._grid is None:
+            grid = CrowdGrid(self.width, self.height)
+            grid.rebuild(self.x, self.y)
+            self._grid = grid
+        return self._grid
+
+    def blocked(self, rect):
+        """
+        Same answer as any(person.collides(rect) for person in people) at this tick.
+        """
+        x, y, w, h = rect
+        idx = self.grid.near_rect(x, y, w, h)
+        px, py = self.x[idx], self.y[idx]
+        return bool(((px > x) & (px < x + w) & (py > y) & (py < y + h)).any())
+
+    def digest(self):
+        """
+        Short hash of the positions, for checking that two runs saw the same world.
+        """
+        return hashlib.sha256(self.x.tobytes() + self.y.tobytes()).hexdigest()[:16]
+
+class Simulation:
+    """
+    Fixed-timestep clock for the crowd. A background thread advances the crowd by one tick every
+    1 / tick_rate seconds of wall time, however fast the planner or the renderer run, and publishes
+    a Snapshot after every tick. The crowd's own seeded generator makes tick N the same in every run.
+    When the thread falls behind it runs up to max_catchup ticks back to back, then lets the world
+    slow down rather than spiral. advance() steps the clock by hand instead, for headless runs.
+    :param crowd: crowd.Crowd, the agents to simulate (owned by the simulation from now on)
+    :param tick_rate: float, ticks per second
+    :param max_catchup: int, ticks run back to back when the thread is late
+    """
+    def __init__(self, crowd, tick_rate=30.0, max_catchup=5):
+        self.crowd = crowd
+        self.tick_rate = float(tick_rate)
+        self.dt = 1.0 / self.tick_rate
+        self.max_catchup = max_catchup
+        self.dropped = 0
+        self.latest = self.capture()
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def capture(self):
+        c = self.crowd
+        return Snapshot(c.ticks, c.ticks * self.dt, c.x.copy(), c.y.copy(), c.vx.copy(), c.vy.copy(),
+                        c.size.copy(), c.width, c.height)
+
+    def snapshot(self):
+        """
+        The most recent tick. Swapping the reference is atomic, so no lock is needed.
+        """
+        return self.latest
+
+    def step(self):
+        self.crowd.step()
+        self.latest = self.capture()
+
+    def advance(self, ticks=1):
+        for _ in range(ticks):
+            self.step()
+
+    def run(self):
+        next_time = time.perf_counter()
+        while not self.stopping.is_set():
+            now = time.perf_counter()
+            if now < next_time:
+                self.stopping.wait(next_time - now)
+                continue
+            steps = 0
+            while next_time <= now and steps < self.max_catchup:
+                self.step()
+                next_time += self.dt
+                steps += 1
+            if next_time <= now:
+                # Too far behind: drop the backlog instead of trying to catch up
+                self.dropped += int((now - next_time) / self.dt) + 1
+                next_time = now + self.dt
+
+    def start(self):
+        self.stopping.clear()
+        self.thread = threading.Thread(target=self.run, name="simulation", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+class RenderThread(threading.Thread):
+    """
+    Drawing on its own thread at a capped frame rate: the tree as the planner reports edges, and
+    the people from the latest snapshot. pygame is initialised (and its events pumped) on this
+    thread, so the planner never pays for a frame. closed is set when the window is closed.
+    :param simulation: Simulation
+    :param obstacles: list of tuples (x, y, width, height), representing obstacles
+    :param goal: Node, goal position
+    :param width: int, window width
+    :param height: int, window height
+    :param fps: float, frame rate cap
+    """
+    def __init__(self, simulation, obstacles, goal, width, height, fps=30):
+        threading.Thread.__init__(self, name="render", daemon=True)
+        self.simulation = simulation
+        self.obstacles = obstacles
+        self.goal = goal
+        self.size = (width, height)
+        self.fps = fps
+        self.edges = collections.deque()
+        self.path = None
+        self.frames = 0
+        self.closed = False
+        self.ready = threading.Event()
+        self.stopping = threading.Event()
+
+    def add_edge(self, parent, child):
+        # Called from the planner thread; deque appends are thread-safe
+        self.edges.append((parent, child))
+
+    def show_path(self, node):
+        self.path = node
+
+    def run(self):
+        import pygame
+        from rrt_render import TreeRenderer, red
+
+        pygame.init()
+        screen = pygame.display.set_mode(self.size)
+        pygame.display.set_caption("RRT with Obstacles")
+        renderer = TreeRenderer(screen, self.obstacles, self.goal)
+        clock = pygame.time.Clock()
+        self.ready.set()
+        while not self.stopping.is_set():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.closed = True
+            while self.edges:
+                renderer.add_edge(*self.edges.popleft())
+            if self.path is not None:
+                renderer.draw_path(self.path)
+                self.path = None
+            renderer.draw()
+            snap = self.simulation.snapshot()
+            for x, y, size in zip(snap.x.tolist(), snap.y.tolist(), snap.size.tolist()):
+                pygame.draw.circle(screen, red, (int(x), int(y)), int(size))
+            renderer.present()
+            self.frames += 1
+            clock.tick(self.fps)
+        pygame.quit()
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+
+if __name__ == "__main__":
+    # Planning against the clocked crowd while the planner is slowed down on purpose: the world
+    # steps at the same rate and goes through the same states whatever the planner does, while in
+    # the coupled loop (one crowd step per planner iteration, as rrt_pygame_dyn.py does) the crowd
+    # only moves as fast as the planner
+    from crowd import Crowd
+    from rrt_planner import Node, RRTPlanner
+    from rrt_pygame import obstacles, width, height, station
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    tick_rate = 60.0
+    print("%-9s %9s %9s %11s %10s %9s %9s %11s" % ("loop", "delay", "plan (s)", "iterations", "iter/s", "ticks/s",
+                                                  "dropped", "mismatches"))
+    for clocked in (False, True):
+        for delay in (0.0, 0.0005, 0.002):
+            crowd = Crowd.random_people(n, obstacles, width, height, seed=0)
+            sim = Simulation(crowd, tick_rate=tick_rate)
+            seen = {}
+            current = [sim.snapshot()]
+
+            def on_iteration(planner):
+                if not clocked:
+                    sim.step()
+                snap = current[0] = sim.snapshot()
+                seen.setdefault(snap.tick, snap.digest())
+                if delay:
+                    time.sleep(delay)
+
+            def node_valid(nn, newnode):
+                return not current[0].blocked((newnode.x, newnode.y, 5, 5))
+
+            planner = RRTPlanner(obstacles, width, height, seed=0)
+            if clocked:
+                sim.start()
+            start_time = time.perf_counter()
+            planner.plan(Node(*station.start), Node(*station.goal), max_iterations=20000, node_valid=node_valid,
+                         on_iteration=on_iteration)
+            elapsed = time.perf_counter() - start_time
+            sim.stop()
+
+            # Every tick the planner saw must match a headless replay of the same crowd
+            replay = Simulation(Crowd.random_people(n, obstacles, width, height, seed=0))
+            mismatches = 0
+            for tick in sorted(seen):
+                replay.advance(tick - replay.snapshot().tick)
+                mismatches += replay.snapshot().digest() != seen[tick]
+            print("%-9s %6.1f ms %9.3f %11d %10.0f %9.1f %9d %11d" % (
+                "clocked" if clocked else "coupled", delay * 1e3, elapsed, planner.iterations,
+                planner.iterations / elapsed, sim.snapshot().tick / elapsed, sim.dropped, mismatches))
@@ -0,0 +1,231 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+from obstacle_tree import ObstacleTree
+
+# Post-processing for planner output. extract_path gives one waypoint every stepSize, zig-zagging
+# the way the random tree grew; these shorten it to a few straight legs and optionally round the
+# corners so the chair never turns tighter than it can. Every candidate segment is checked against
+# the static obstacles in batches through segments_clear, so any checker the planners accept works
+# (pass planner.checker to keep a footprint's inflated obstacles).
+
+def as_checker(obstacles):
+    return obstacles if hasattr(obstacles, "segments_clear") else ObstacleTree(obstacles)
+
+def path_length(points):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    return float(np.hypot(*np.diff(points, axis=0).T).sum())
+
+def shortcut_greedy(path, obstacles):
+    """
+    From every kept waypoint, jumping straight to the farthest later waypoint it can see. The
+    candidates from one waypoint are checked as one batch.
+    :param path: list of tuples (x, y) or array (N, 2), a collision-free path
+    :param obstacles: list of tuples (x, y, width, height), or a checker with segments_clear
+    :return: array (K, 2), the kept waypoints, first and last included
+    """
+    checker = as_checker(obstacles)
+    points = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    keep = [0]
+    i = 0
+    while i < n - 1:
+        clear = checker.segments_clear(np.broadcast_to(points[i], (n - i - 1, 2)), points[i + 1:])
+        reachable = np.flatnonzero(clear)
+        # The next waypoint is always reachable, it is an edge of the original path
+        i = i + 1 + (int(reachable[-1]) if len(reachable) else 0)
+        keep.append(i)
+    return points[keep]
+
+def shortcut_random(path, obstacles, rounds=50, batch=64, seed=None):
+    """
+    Randomized shortcutting: every round draws batch pairs of points anywhere along the path
+    (between waypoints too), checks all the straight shortcuts between them at once, and applies
+    the clear ones that save the most length without overlapping each other.
+    :param path: list of tuples (x, y) or array (N, 2), a collision-free path
+    :param obstacles: list of tuples (x, y, width, height), or a checker with segments_clear
+    :param rounds: int, batches drawn
+    :param batch: int, shortcuts tried per round
+    :param seed: int or None
+    :return: array (K, 2)
+    """
+    checker = as_checker(obstacles)
+    rng = np.random.default_rng(seed)
+    points = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    for _ in range(rounds):
+        if len(points) < 3:
+            break
+        legs = np.hypot(*np.diff(points, axis=0).T)
+        along = np.concatenate([[0.0], np.cumsum(legs)])
+        total = along[-1]
+        if total <= 0:
+            break
+        s = np.sort(rng.random((batch, 2)) * total, axis=1)
+        a, b = s[:, 0], s[:, 1]
+        ia = np.clip(np.searchsorted(along, a, side="right") - 1, 0, len(legs) - 1)
+        ib = np.clip(np.searchsorted(along, b, side="right") - 1, 0, len(legs) - 1)
+        # Only pairs with at least one waypoint between them can save anything
+        useful = ib > ia
+        if not useful.any():
+            continue
+        a, b, ia, ib = a[useful], b[useful], ia[useful], ib[useful]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fa = np.where(legs[ia] > 0, (a - along[ia]) / legs[ia], 0.0)
+            fb = np.where(legs[ib] > 0, (b - along[ib]) / legs[ib], 0.0)
+        pa = points[ia] + (points[ia + 1] - points[ia]) * fa[:, None]
+        pb = points[ib] + (points[ib + 1] - points[ib]) * fb[:, None]
+        saving = (b - a) - np.hypot(*(pb - pa).T)
+        clear = checker.segments_clear(pa, pb) & (saving > 1e-9)
+
+        # Largest savings first, skipping any that overlaps one already taken
+        taken = []
+        for k in np.flatnonzero(clear)[np.argsort(-saving[clear])].tolist():
+            if all(ib[k] < ta or ia[k] > tb for ta, tb in ((t[1], t[2]) for t in taken)):
+                taken.append((k, ia[k], ib[k]))
+        if not taken:
+            continue
+        taken.sort(key=lambda t: t[1])
+        pieces = []
+        last = 0
+        for k, ta, tb in taken:
+            pieces.extend([points[last:ta + 1], pa[k:k + 1], pb[k:k + 1]])
+            last = tb + 1
+        pieces.append(points[last:])
+        points = np.concatenate(pieces)
+    return drop_collinear(points)
+
+def drop_collinear(points, tolerance=1e-9):
+    """
+    Removing repeated waypoints and waypoints that sit on the straight line between their neighbours.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3:
+        return points
+    points = points[np.concatenate([[True], np.hypot(*np.diff(points, axis=0).T) > tolerance])]
+    if len(points) < 3:
+        return points
+    d0 = points[1:-1] - points[:-2]
+    d1 = points[2:] - points[1:-1]
+    cross = d0[:, 0] * d1[:, 1] - d0[:, 1] * d1[:, 0]
+    dot = (d0 * d1).sum(axis=1)
+    straight = (np.abs(cross) <= tolerance * np.hypot(*d0.T) * np.hypot(*d1.T)) & (dot > 0)
+    return points[np.concatenate([[True], ~straight, [True]])]
+
+def round_corners(path, obstacles, turn_radius, step=5.0):
+    """
+    Replacing each corner with a circular arc of turn_radius, so the path's curvature never exceeds
+    1 / turn_radius where an arc was fitted. A corner keeps its sharp turn when the arc does not fit
+    on the legs either side (each leg is shared by the arcs at its two ends) or when the arc would
+    hit an obstacle; the arcs of all corners are checked as one batch.
+    :param path: array (K, 2), usually the output of a shortcut pass
+    :param obstacles: list of tuples (x, y, width, height), or a checker with segments_clear
+    :param turn_radius: float, tightest turn allowed
+    :param step: float, spacing of the points placed along every arc
+    :return: array (M, 2)
+    """
+    checker = as_checker(obstacles)
+    points = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if len(points) < 3:
+        return points
+    legs = np.diff(points, axis=0)
+    lengths = np.hypot(*legs.T)
+    arcs = {}
+    for i in range(1, len(points) - 1):
+        u = legs[i - 1] / lengths[i - 1]
+        v = legs[i] / lengths[i]
+        turn = math.acos(max(-1.0, min(1.0, float(u @ v))))
+        if turn < 1e-6 or turn > math.pi - 1e-6:
+            continue
+        tangent = turn_radius * math.tan(turn / 2)
+        if tangent > lengths[i - 1] / 2 or tangent > lengths[i] / 2:
+            continue
+        p0 = points[i] - u * tangent
+        # The centre lies on the inside of the turn, turn_radius from both tangent points
+        side = 1.0 if u[0] * v[1] - u[1] * v[0] > 0 else -1.0
+        normal = np.array([-u[1], u[0]]) * side
+        centre = p0 + normal * turn_radius
+        a0 = math.atan2(p0[1] - centre[1], p0[0] - centre[0])
+        count = max(2, int(math.ceil(turn_radius * turn / step)) + 1)
+        angles = a0 + side * np.linspace(0.0, turn, count)
+        arcs[i] = centre + turn_radius * np.column_stack([np.cos(angles), np.sin(angles)])
+
+    if arcs:
+        corners = list(arcs)
+        chords = np.concatenate([np.stack([arcs[i][:-1], arcs[i][1:]], axis=1) for i in corners])
+        clear = checker.segments_clear(chords[:, 0], chords[:, 1])
+        bounds = np.cumsum([0] + [len(arcs[i]) - 1 for i in corners])
+        for i, lo, hi in zip(corners, bounds[:-1], bounds[1:]):
+            if not clear[lo:hi].all():
+                del arcs[i]
+    pieces = [points[:1]]
+    for i in range(1, len(points) - 1):
+        pieces.append(arcs[i] if i in arcs else points[i:i + 1])
+    pieces.append(points[-1:])
+    return np.ascontiguousarray(np.concatenate(pieces))
+
+def smooth_path(path, obstacles, method="greedy", turn_radius=None, step=5.0, seed=None):
+    """
+    The whole post-processing stage: shortcutting, then optional corner rounding.
+    :param path: list of tuples (x, y) or array (N, 2), e.g. from rrt_planner.extract_path
+    :param obstacles: list of tuples (x, y, width, height), or a checker with segments_clear
+    :param method: str, "greedy", "random", or "both" (greedy, random, then greedy again)
+    :param turn_radius: float or None, round the corners to this radius
+    :param step: float, spacing of the points along rounded corners
+    :param seed: int or None, seeds the random shortcuts
+    :return: array (K, 2), waypoints from the start to the end of path
+    """
+    if method not in ("greedy", "random", "both"):
+        raise ValueError("Unknown shortcut method: %r (expected 'greedy', 'random' or 'both')" % (method,))
+    checker = as_checker(obstacles)
+    points = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if method in ("greedy", "both"):
+        points = shortcut_greedy(points, checker)
+    if method in ("random", "both"):
+        points = shortcut_random(points, checker, seed=seed)
+    if method == "both":
+        # The random pass leaves waypoints between waypoints; a second greedy pass drops the spare ones
+        points = shortcut_greedy(points, checker)
+    if turn_radius:
+        points = round_corners(points, checker, turn_radius, step)
+    return np.ascontiguousarray(points)
+
+def report(before, after):
+    """
+    Waypoint counts and lengths before and after post-processing, as a dict.
+    """
+    return {"waypoints_before": len(before), "waypoints_after": len(after),
+            "length_before": path_length(before), "length_after": path_length(after)}
+
+if __name__ == "__main__":
+    # Waypoints, length and cost of each post-processing method over seeded RRT paths
+    from rrt_planner import Node, RRTPlanner, extract_path
+    from rrt_pygame import obstacles, width, height, station
+
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    tree = ObstacleTree(obstacles)
+    paths = []
+    for seed in range(seeds):
+        newnode = RRTPlanner(obstacles, width, height, collision=tree, seed=seed).plan(
+            Node(*station.start), Node(*station.goal))
+        if newnode is not None:
+            paths.append(extract_path(newnode))
+
+    print("%-16s %11s %11s %12s %12s %10s %9s" % ("method", "waypoints", "-> after", "length", "-> after",
+                                                 "time (ms)", "clear"))
+    for method, turn_radius in (("greedy", None), ("random", None), ("both", None), ("both", 15.0)):
+        counts, lengths, elapsed, clear = [], [], [], 0
+        for seed, path in enumerate(paths):
+            start_time = time.perf_counter()
+            result = smooth_path(path, tree, method, turn_radius, seed=seed)
+            elapsed.append(time.perf_counter() - start_time)
+            r = report(path, result)
+            counts.append((r["waypoints_before"], r["waypoints_after"]))
+            lengths.append((r["length_before"], r["length_after"]))
+            clear += bool(tree.segments_clear(result[:-1], result[1:]).all())
+        counts, lengths = np.mean(counts, axis=0), np.mean(lengths, axis=0)
+        print("%-16s %11.1f %11.1f %12.1f %12.1f %10.2f %8d/%d" % (
+            method + (" r=%g" % turn_radius if turn_radius else ""), counts[0], counts[1], lengths[0], lengths[1],
+            np.mean(elapsed) * 1e3, clear, len(paths)))
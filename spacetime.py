@@ -0,0 +1,222 @@
+import math
+import sys
+import time
+
+import numpy as np
+
+from broadphase import CrowdGrid
+
+class CrowdForecast:
+    """
+    Short-horizon prediction of where the crowd will be: every agent keeps its current velocity
+    (bounces are not foreseen, which is what the horizon is for). The horizon is cut into time
+    slices, and each slice gets a CrowdGrid of the agents' positions at its midpoint, so an edge
+    traversed during a slice only looks at the agents bucketed near it. Candidates then get an exact
+    closest-approach test between the chair and the agent, both moving in straight lines.
+    Agents are discs whose radius grows by growth per tick, covering the drift from the straight-line
+    guess as people bounce and turn. Times are in ticks (one Person.move / Crowd.step) from the
+    moment of the forecast.
+    :param x, y: array-like (N,), agent centres
+    :param vx, vy: array-like (N,), agent velocities per tick
+    :param radius: float or array-like (N,), agent radii
+    :param width: float, map width
+    :param height: float, map height
+    :param growth: float, radius added per tick of look-ahead
+    :param horizon: float, ticks ahead that are predicted; edges traversed later are not checked
+    :param slice_ticks: float, length of a time slice
+    :param cell_size: float, grid cell side of every slice
+    """
+    def __init__(self, x, y, vx, vy, radius, width, height, growth=0.1, horizon=120, slice_ticks=10,
+                 cell_size=20):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.vx = np.asarray(vx, dtype=np.float64)
+        self.vy = np.asarray(vy, dtype=np.float64)
+        self.radius = np.broadcast_to(np.asarray(radius, dtype=np.float64), self.x.shape)
+        self.growth = float(growth)
+        self.horizon = float(horizon)
+        self.slice_ticks = float(slice_ticks)
+        speed = np.hypot(self.vx, self.vy).max() if len(self.x) else 0.0
+        # Within a slice an agent stays this close to where it is bucketed, its radius included
+        self.reach = ((self.radius.max() if len(self.x) else 0.0) + self.growth * self.horizon +
+                      speed * self.slice_ticks / 2)
+        self.grids = []
+        for k in range(int(math.ceil(self.horizon / self.slice_ticks))):
+            t = (k + 0.5) * self.slice_ticks
+            grid = CrowdGrid(width, height, cell_size)
+            grid.rebuild(self.x + self.vx * t, self.y + self.vy * t)
+            self.grids.append(grid)
+
+    @classmethod
+    def from_people(cls, people, width, height, **kwargs):
+        return cls([p.x for p in people], [p.y for p in people], [p.dx * p.speed for p in people],
+                   [p.dy * p.speed for p in people], [p.size for p in people], width, height, **kwargs)
+
+    @classmethod
+    def from_dynamic_obstacles(cls, dynamic_obstacles, width, height, **kwargs):
+        # Rectangles become the disc around them
+        return cls([o.x + o.w / 2 for o in dynamic_obstacles], [o.y + o.h / 2 for o in dynamic_obstacles],
+                   [o.vel_x for o in dynamic_obstacles], [o.vel_y for o in dynamic_obstacles],
+                   [math.hypot(o.w, o.h) / 2 for o in dynamic_obstacles], width, height, **kwargs)
+
+    @classmethod
+    def from_crowd(cls, crowd, **kwargs):
+        return cls(crowd.x + crowd.w / 2, crowd.y + crowd.h / 2, crowd.vx, crowd.vy,
+                   np.maximum(crowd.size, np.hypot(crowd.w, crowd.h) / 2), crowd.width, crowd.height, **kwargs)
+
+    def __len__(self):
+        return len(self.x)
+
+    def edge_clear(self, start, end, t0, t1, radius):
+        """
+        Checking if a chair of the given radius, moving steadily from start at time t0 to end at
+        time t1, keeps clear of every predicted agent.
+        :param start: tuple (x, y)
+        :param end: tuple (x, y)
+        :param t0: float, ticks from now at which the chair leaves start
+        :param t1: float, ticks from now at which it reaches end
+        :param radius: float, chair clearance radius
+        :return: boolean, True if no agent comes within reach during the traversal
+        """
+        if t0 >= self.horizon or not len(self.x):
+            return True
+        (sx, sy), (ex, ey) = start, end
+        duration = t1 - t0
+        ux, uy = ((ex - sx) / duration, (ey - sy) / duration) if duration > 0 else (0.0, 0.0)
+        stop = min(t1, self.horizon)
+        for k in range(int(t0 // self.slice_ticks), len(self.grids)):
+            ta = max(t0, k * self.slice_ticks)
+            tb = min(stop, (k + 1) * self.slice_ticks)
+            if ta > tb:
+                break
+            pa = (sx + ux * (ta - t0), sy + uy * (ta - t0))
+            pb = (sx + ux * (tb - t0), sy + uy * (tb - t0))
+            idx = self.grids[k].near_segment(pa, pb, radius + self.reach)
+            if not len(idx):
+                continue
+            # Closest approach of the chair and each agent over [ta, tb], relative motion d0 + w * s
+            vx, vy = self.vx[idx], self.vy[idx]
+            d0x = pa[0] - (self.x[idx] + vx * ta)
+            d0y = pa[1] - (self.y[idx] + vy * ta)
+            wx, wy = ux - vx, uy - vy
+            ww = wx * wx + wy * wy
+            with np.errstate(divide="ignore", invalid="ignore"):
+                s = np.where(ww > 0, np.clip(-(d0x * wx + d0y * wy) / ww, 0.0, tb - ta), 0.0)
+            # The radius the agent has grown to by the end of the slice, on the safe side
+            gap = radius + self.radius[idx] + self.growth * tb
+            if ((d0x + wx * s) ** 2 + (d0y + wy * s) ** 2 < gap * gap).any():
+                return False
+        return True
+
+class SpaceTimeChecker:
+    """
+    Time-aware node_valid callback for the planners: every tree vertex carries the time the chair
+    would reach it (its parent's time plus the edge length at the chair's speed), and an edge is
+    accepted only if the chair would pass the crowd forecast safely along it.
+    Pass checker.node_valid as the planner's node_valid.
+    :param forecast: CrowdForecast
+    :param root: tuple (x, y), the planner's start, which the chair leaves at start_time
+    :param speed: float, chair speed per tick
+    :param radius: float, chair clearance radius against people
+    :param start_time: float, ticks from the forecast at which the chair leaves the root
+    """
+    def __init__(self, forecast, root, speed=2.0, radius=5.0, start_time=0.0):
+        self.forecast = forecast
+        self.root = (float(root[0]), float(root[1]))
+        self.speed = speed
+        self.radius = radius
+        self.start_time = start_time
+        self.checks = 0
+
+    def arrival(self, node):
+        """
+        Time at which the chair reaches a tree vertex, summed along its parents up to the root.
+        Nothing is cached, since rewiring (RRT*) and repairs (replan.DynamicReplanner) change the
+        route to a vertex after it was first reached.
+        """
+        length = 0.0
+        while node.parent is not None:
+            parent = node.parent
+            length += math.hypot(node.x - parent.x, node.y - parent.y)
+            node = parent
+        if (node.x, node.y) != self.root:
+            raise ValueError("No arrival time for vertex (%r, %r): its tree is not rooted at the "
+                             "chair's start %r" % (node.x, node.y, self.root))
+        return self.start_time + length / self.speed
+
+    def node_valid(self, nn, newnode):
+        self.checks += 1
+        t0 = self.arrival(nn)
+        t1 = t0 + math.hypot(newnode.x - nn.x, newnode.y - nn.y) / self.speed
+        return self.forecast.edge_clear((nn.x, nn.y), (newnode.x, newnode.y), t0, t1, self.radius)
+
+def execute(path, crowd, speed, radius):
+    """
+    Driving the chair along path at speed while the crowd keeps stepping (bounces included).
+    :return: (int, int), tick of the first conflict (agent closer than radius plus its own radius),
+        or the tick the goal is reached if there is none, and whether there was a conflict
+    """
+    points = np.asarray(path, dtype=np.float64)
+    legs = np.hypot(*np.diff(points, axis=0).T)
+    along = np.concatenate([[0.0], np.cumsum(legs)])
+    tick = 0
+    while tick * speed < along[-1]:
+        d = tick * speed
+        leg = min(int(np.searchsorted(along, d, side="right")) - 1, len(legs) - 1)
+        f = (d - along[leg]) / legs[leg] if legs[leg] else 1.0
+        x, y = points[leg] + (points[leg + 1] - points[leg]) * f
+        if (np.hypot(crowd.x - x, crowd.y - y) < radius + crowd.size).any():
+            return tick, True
+        crowd.step()
+        tick += 1
+    return tick, False
+
+if __name__ == "__main__":
+    # Executing paths planned against the crowd as it is now (instantaneous check) and against its
+    # forecast (space-time check): how long the chair drives before the first conflict, which is
+    # when a replan would be forced, and what each check costs
+    from crowd import Crowd
+    from rrt_planner import Node, RRTPlanner, extract_path
+    from rrt_pygame import obstacles, width, height, station
+
+    seeds = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    speed, radius = 2.0, 5.0
+    print("%7s %-11s %7s %16s %16s %11s" % ("people", "check", "found", "conflict-free", "ticks to conflict",
+                                           "check (us)"))
+    for n in (15, 60, 200):
+        for mode in ("instant", "space-time"):
+            found = clean = checks = 0
+            ticks = []
+            elapsed = 0.0
+            for seed in range(seeds):
+                crowd = Crowd.random_people(n, obstacles, width, height, seed=seed)
+                if mode == "instant":
+                    def check(nn, newnode):
+                        return not (np.hypot(crowd.x - newnode.x, crowd.y - newnode.y) < radius + crowd.size).any()
+                else:
+                    check = SpaceTimeChecker(CrowdForecast.from_crowd(crowd), station.start, speed,
+                                             radius).node_valid
+                spent = [0, 0.0]
+
+                def node_valid(nn, newnode):
+                    start_time = time.perf_counter()
+                    valid = check(nn, newnode)
+                    spent[0] += 1
+                    spent[1] += time.perf_counter() - start_time
+                    return valid
+
+                planner = RRTPlanner(obstacles, width, height, seed=seed)
+                newnode = planner.plan(Node(*station.start), Node(*station.goal), max_iterations=20000,
+                                       node_valid=node_valid)
+                checks += spent[0]
+                elapsed += spent[1]
+                if newnode is None:
+                    continue
+                found += 1
+                tick, conflict = execute(extract_path(newnode), crowd, speed, radius)
+                clean += not conflict
+                if conflict:
+                    ticks.append(tick)
+            print("%7d %-11s %6d%% %15d%% %16s %11.1f" % (
+                n, mode, found / seeds * 100, clean / max(found, 1) * 100,
+                "%.0f" % np.median(ticks) if ticks else "-", elapsed / max(checks, 1) * 1e6))
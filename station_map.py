@@ -0,0 +1,248 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+
+import numpy as np
+
+import map_cache
+
+# Station maps come in two forms that carry the same content:
+#   JSON / YAML   human-editable, {"format": "station-map", "version": 1, ...}, see maps/platform.json
+#   .stmap        compact binary for large stations, memory-mapped on load so 100k obstacles open in
+#                 milliseconds. Layout, little-endian:
+#                   header (72 bytes)  magic, version, obstacle count, metadata length, bounds, start, goal
+#                   metadata           UTF-8 JSON (name, obstacle kind names, ...)
+#                   obstacles          float64 (N, 4) x, y, width, height, 64-byte aligned
+#                   levels             int32 (N,), 64-byte aligned
+#                   kinds              uint8 (N,) index into the metadata kind names, 64-byte aligned
+format_name = "station-map"
+format_version = 1
+magic = b"STMAP\0\0\0"
+header = struct.Struct("<8sIIQ6d")
+align = 64
+
+class StationMap:
+    """
+    A station map: bounds, start and goal, and the static obstacle rectangles with the level and
+    kind of each one. Obstacle data is held in NumPy arrays (memory-mapped when loaded from .stmap).
+    :param obstacles: array-like (N, 4), rectangles (x, y, width, height)
+    :param width: float, map width
+    :param height: float, map height
+    :param start: tuple (x, y), default start point
+    :param goal: tuple (x, y), default goal point
+    :param levels: array-like (N,) or None, level of each obstacle (0 for a single-level station)
+    :param kinds: array-like (N,) or None, index of each obstacle's kind in kind_names
+    :param kind_names: list of str, e.g. ["bench", "pillar"]
+    :param name: str
+    """
+    def __init__(self, obstacles, width, height, start, goal, levels=None, kinds=None, kind_names=(), name=""):
+        self.obstacles = np.asarray(obstacles, dtype=np.float64).reshape(-1, 4)
+        n = len(self.obstacles)
+        self.levels = np.zeros(n, dtype=np.int32) if levels is None else np.asarray(levels, dtype=np.int32)
+        self.kinds = np.zeros(n, dtype=np.uint8) if kinds is None else np.asarray(kinds, dtype=np.uint8)
+        self.kind_names = list(kind_names) or ["obstacle"]
+        self.width = float(width)
+        self.height = float(height)
+        self.start = (float(start[0]), float(start[1]))
+        self.goal = (float(goal[0]), float(goal[1]))
+        self.name = name
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def level(self, level=0):
+        """
+        Obstacles on one level as an (M, 4) array.
+        """
+        if not len(self.levels) or (self.levels == level).all():
+            return self.obstacles
+        return self.obstacles[self.levels == level]
+
+    def obstacle_list(self, level=0):
+        """
+        Obstacles on one level as the list of (x, y, width, height) tuples the planners and drawing code use.
+        """
+        return [tuple(o) for o in self.level(level).tolist()]
+
+    def key(self, level=0):
+        """
+        Content hash of one level, for keying caches built from this map.
+        """
+        return map_cache.map_key(self.level(level), self.width, self.height)
+
+    def to_dict(self):
+        named = self.kind_names != ["obstacle"]
+        obstacles = []
+        for (x, y, w, h), level, kind in zip(self.obstacles.tolist(), self.levels.tolist(), self.kinds.tolist()):
+            o = {"x": x, "y": y, "w": w, "h": h}
+            if level:
+                o["level"] = level
+            if named:
+                o["kind"] = self.kind_names[kind]
+            obstacles.append(o)
+        return {
+            "format": format_name,
+            "version": format_version,
+            "name": self.name,
+            "bounds": {"width": self.width, "height": self.height},
+            "start": list(self.start),
+            "goal": list(self.goal),
+            "obstacles": obstacles,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format") != format_name:
+            raise ValueError("Not a station map (format %r)" % (data.get("format"),))
+        if data.get("version") != format_version:
+            raise ValueError("Unsupported station map version %r (this loader reads %d)" % (
+                data.get("version"), format_version))
+        rects, levels, kinds, kind_names = [], [], [], []
+        for o in data.get("obstacles", ()):
+            if isinstance(o, dict):
+                rects.append((o["x"], o["y"], o["w"], o["h"]))
+                levels.append(o.get("level", 0))
+                kind = o.get("kind", "obstacle")
+            else:
+                # Compact form: [x, y, width, height] or [x, y, width, height, level]
+                rects.append(tuple(o[:4]))
+                levels.append(o[4] if len(o) > 4 else 0)
+                kind = "obstacle"
+            if kind not in kind_names:
+                kind_names.append(kind)
+            kinds.append(kind_names.index(kind))
+        bounds = data["bounds"]
+        return cls(rects, bounds["width"], bounds["height"], data["start"], data["goal"], levels=levels,
+                   kinds=kinds, kind_names=kind_names, name=data.get("name", ""))
+
+def aligned(offset):
+    return (offset + align - 1) // align * align
+
+def save_binary(station, path):
+    """
+    Writing a station map in the .stmap binary form.
+    """
+    meta = json.dumps({"name": station.name, "kinds": station.kind_names}).encode()
+    n = len(station)
+    obstacles_at = aligned(header.size + len(meta))
+    levels_at = aligned(obstacles_at + n * 32)
+    kinds_at = aligned(levels_at + n * 4)
+    tmp = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp, "wb") as f:
+        f.write(header.pack(magic, format_version, len(meta), n, station.width, station.height,
+                            *station.start, *station.goal))
+        f.write(meta)
+        for offset, array in ((obstacles_at, station.obstacles.astype("<f8")),
+                              (levels_at, station.levels.astype("<i4")),
+                              (kinds_at, station.kinds.astype("u1"))):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(np.ascontiguousarray(array).tobytes())
+    os.replace(tmp, path)
+
+def load_binary(path):
+    """
+    Memory-mapping a .stmap file. Obstacle arrays are read-only views onto the file; pages are only
+    read from disk when they are touched.
+    """
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(buf) < header.size:
+        raise ValueError("%s: truncated station map" % path)
+    tag, version, meta_len, n, width, height, sx, sy, gx, gy = header.unpack_from(buf)
+    if tag != magic:
+        raise ValueError("%s: not a binary station map" % path)
+    if version != format_version:
+        raise ValueError("%s: unsupported station map version %d (this loader reads %d)" % (path, version, format_version))
+    meta = json.loads(bytes(buf[header.size:header.size + meta_len]))
+    obstacles_at = aligned(header.size + meta_len)
+    levels_at = aligned(obstacles_at + n * 32)
+    kinds_at = aligned(levels_at + n * 4)
+    if len(buf) < kinds_at + n:
+        raise ValueError("%s: truncated station map" % path)
+    station = StationMap.__new__(StationMap)
+    station.obstacles = np.frombuffer(buf, dtype="<f8", count=n * 4, offset=obstacles_at).reshape(n, 4)
+    station.levels = np.frombuffer(buf, dtype="<i4", count=n, offset=levels_at)
+    station.kinds = np.frombuffer(buf, dtype="u1", count=n, offset=kinds_at)
+    station.kind_names = meta.get("kinds") or ["obstacle"]
+    station.width, station.height = width, height
+    station.start, station.goal = (sx, sy), (gx, gy)
+    station.name = meta.get("name", "")
+    return station
+
+def load_text(path):
+    with open(path) as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml  # only needed for YAML maps
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    return StationMap.from_dict(data)
+
+def save_text(station, path):
+    data = station.to_dict()
+    with open(path, "w") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            yaml.safe_dump(data, f, sort_keys=False)
+        else:
+            json.dump(data, f, indent=2)
+            f.write("\n")
+
+def load_map(path):
+    """
+    Loading a station map from .stmap, .json, .yaml or .yml.
+    """
+    if path.endswith(".stmap"):
+        return load_binary(path)
+    return load_text(path)
+
+def save_map(station, path):
+    if path.endswith(".stmap"):
+        save_binary(station, path)
+    else:
+        save_text(station, path)
+
+maps_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps")
+
+def builtin_map(name):
+    return load_map(os.path.join(maps_dir, name))
+
+def random_station(n, levels=1, width=8000.0, height=6000.0, seed=0):
+    """
+    A synthetic station with n small obstacles spread over the given number of levels, for benchmarks.
+    """
+    rng = np.random.default_rng(seed)
+    rects = np.column_stack([rng.random(n) * width, rng.random(n) * height,
+                             rng.uniform(5, 60, n), rng.uniform(5, 40, n)])
+    return StationMap(rects, width, height, (10, 10), (width - 10, height - 10), levels=rng.integers(0, levels, n),
+                      kinds=rng.integers(0, 4, n), kind_names=["bench", "pillar", "turnstile", "stairwell"],
+                      name="synthetic-%d" % n)
+
+def main(argv):
+    if len(argv) == 3 and argv[0] == "convert":
+        save_map(load_map(argv[1]), argv[2])
+        print("Converted", argv[1], "to", argv[2])
+    elif argv and argv[0] == "bench":
+        # Loading cost of a 100k-obstacle, 3-level station in each form
+        import tempfile
+        n = int(argv[1]) if len(argv) > 1 else 100000
+        station = random_station(n, levels=3)
+        with tempfile.TemporaryDirectory() as tmp:
+            for ext in (".stmap", ".json"):
+                path = os.path.join(tmp, "station" + ext)
+                save_map(station, path)
+                start_time = time.perf_counter()
+                loaded = load_map(path)
+                level = loaded.level(1)
+                elapsed = time.perf_counter() - start_time
+                assert np.array_equal(level, station.level(1))
+                print("%-6s %8d obstacles  %9.2f ms  %8.1f KiB" % (ext, n, elapsed * 1e3, os.path.getsize(path) / 1024))
+    else:
+        print("Usage: python station_map.py convert IN OUT   (formats by extension: .json .yaml .yml .stmap)")
+        print("       python station_map.py bench [obstacles]")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,184 @@
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+class TreeNode:
+    """
+    Lightweight handle to one vertex of a TreeStore, standing in for Node: x, y and parent read
+    from (and parent writes to) the store's arrays. Handles compare and hash by tree and index,
+    so a fresh handle for the same vertex works as a dict key or set member.
+    """
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def x(self):
+        return self.tree.xy[self.index, 0]
+
+    @property
+    def y(self):
+        return self.tree.xy[self.index, 1]
+
+    @property
+    def parent(self):
+        p = self.tree.parents[self.index]
+        return None if p < 0 else TreeNode(self.tree, int(p))
+
+    @parent.setter
+    def parent(self, node):
+        self.tree.parents[self.index] = -1 if node is None else self.tree.index_of(node)
+
+    def __eq__(self, other):
+        return isinstance(other, TreeNode) and other.tree is self.tree and other.index == self.index
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __repr__(self):
+        return "TreeNode(%d, %r, %r)" % (self.index, float(self.x), float(self.y))
+
+class TreeStore:
+    """
+    Tree vertices kept in preallocated coordinate and parent-index arrays that double in size when
+    full, instead of one Node object per vertex. Reads like the list of nodes the planner used to
+    keep: len(), indexing and iteration hand out TreeNode handles.
+    :param capacity: int, vertices allocated up front
+    """
+    def __init__(self, capacity=1024):
+        self.xy = np.empty((max(1, capacity), 2), dtype=np.float64)
+        self.parents = np.empty(max(1, capacity), dtype=np.int32)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("tree vertex %d out of range (%d vertices)" % (i, self.count))
+        return TreeNode(self, i)
+
+    def __iter__(self):
+        return (TreeNode(self, i) for i in range(self.count))
+
+    def add(self, x, y, parent=-1):
+        """
+        Appending a vertex.
+        :param x: float
+        :param y: float
+        :param parent: int, index of the parent vertex, -1 for a root
+        :return: int, index of the new vertex
+        """
+        i = self.count
+        if i == len(self.parents):
+            self.xy = np.concatenate([self.xy, np.empty_like(self.xy)])
+            self.parents = np.concatenate([self.parents, np.empty_like(self.parents)])
+        self.xy[i] = (x, y)
+        self.parents[i] = parent
+        self.count = i + 1
+        return i
+
+    def index_of(self, node):
+        if not isinstance(node, TreeNode) or node.tree is not self:
+            raise ValueError("Parent %r is not a vertex of this tree" % (node,))
+        return node.index
+
+    def add_node(self, n):
+        """
+        Storing a Node (or a handle from this store), linked to its parent if it has one.
+        :return: TreeNode, handle to the stored vertex
+        """
+        parent = n.parent
+        return TreeNode(self, self.add(n.x, n.y, -1 if parent is None else self.index_of(parent)))
+
+    def path(self, i):
+        """
+        Walking the parent indices from vertex i back to its root.
+        :param i: int, last vertex of the path
+        :return: array (depth, 2), coordinates ordered from the root to vertex i
+        """
+        parents = self.parents
+        chain = []
+        while i >= 0:
+            chain.append(i)
+            i = parents[i]
+        chain.reverse()
+        return self.xy[chain]
+
+    def edges(self):
+        """
+        Every parent-child edge at once, for drawing and analysis.
+        :return: array (E, 2, 2), parent and child coordinates of each edge
+        """
+        parents = self.parents[:self.count]
+        child = np.flatnonzero(parents >= 0)
+        return np.stack([self.xy[parents[child]], self.xy[child]], axis=1)
+
+    def nbytes(self):
+        return self.xy.nbytes + self.parents.nbytes
+
+if __name__ == "__main__":
+    # Memory per vertex and path / edge export cost for Node objects against the array store
+    from rrt_planner import Node, RRTPlanner, extract_path
+    from rrt_pygame import obstacles, width, height, station
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = np.random.default_rng(0)
+    coords = (rng.random((n, 2)) * (width, height)).tolist()
+    # Random parents drawn from the latest vertices give a tree a few thousand levels deep
+    parents = [-1] + [max(0, i - 1 - int(r)) for i, r in enumerate(rng.exponential(2.0, n - 1).tolist(), 1)]
+
+    def build_nodes():
+        nodes = []
+        for (x, y), p in zip(coords, parents):
+            node = Node(x, y)
+            node.parent = nodes[p] if p >= 0 else None
+            nodes.append(node)
+        return nodes
+
+    def build_store():
+        store = TreeStore()
+        for (x, y), p in zip(coords, parents):
+            store.add(x, y, p)
+        return store
+
+    print("%-8s %12s %12s %12s %12s" % ("tree", "build (ms)", "bytes/node", "path (ms)", "edges (ms)"))
+    for name, build in (("nodes", build_nodes), ("array", build_store)):
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        tree = build()
+        built = time.perf_counter() - start_time
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        start_time = time.perf_counter()
+        if name == "nodes":
+            path = np.array(extract_path(tree[-1]))
+        else:
+            path = tree.path(n - 1)
+        walked = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        if name == "nodes":
+            edges = np.array([((v.parent.x, v.parent.y), (v.x, v.y)) for v in tree if v.parent is not None])
+        else:
+            edges = tree.edges()
+        exported = time.perf_counter() - start_time
+        print("%-8s %12.1f %12.1f %12.2f %12.2f   (%d edges, path of %d)" % (
+            name, built * 1e3, size / n, walked * 1e3, exported * 1e3, len(edges), len(path)))
+
+    # The planner itself, vertices plus nearest-neighbour index
+    for kind in ("nodes", "array"):
+        tracemalloc.start()
+        planner = RRTPlanner(obstacles, width, height, seed=0, tree=kind)
+        planner.plan(Node(*station.start), Node(-100, -100), max_iterations=20000)
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print("RRT tree=%-6s %d nodes, %.1f bytes/node including the kd-tree" % (
+            kind, len(planner.nodes), size / len(planner.nodes)))